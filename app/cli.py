@@ -19,30 +19,195 @@ def _load_dotenv():
         pass
 
 
-async def cmd_enrich(force: bool, chapter: str | None) -> int:
+def _profiled(profile: str | None, run, report) -> int:
+    """
+    Run `run()`; with --profile print `report()` (the stage breakdown) afterwards, and
+    with --profile FILE also write a cProfile dump (covers worker threads too).
+    """
+    if profile is None:
+        return run()
+    import cProfile
+
+    from app.services import metrics
+
+    metrics.ENABLED = True
+
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        return run()
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        print("⏱️  Profile:")
+        print(report())
+        if profiler:
+            print(f"   cProfile written to {profile} (python -m pstats {profile})")
+
+
+def _build_report() -> str:
+    from app.services.metrics import BUILD_STAGE_SECONDS, stage_breakdown
+
+    return stage_breakdown(BUILD_STAGE_SECONDS)
+
+
+def _enrich_report() -> str:
+    from app.services.metrics import (
+        ENRICH_API_SECONDS,
+        ENRICH_QUEUE_SECONDS,
+        ENRICH_RETRIES,
+        ENRICH_TOKENS,
+    )
+
+    lines = []
+    for label, histogram in [("queue wait", ENRICH_QUEUE_SECONDS), ("api", ENRICH_API_SECONDS)]:
+        for key, (total, count) in sorted(histogram.totals().items()):
+            name = " ".join([label, *key])
+            lines.append(f"   {name:<24} {total:>9.3f}s  avg {total / count * 1000:>8.1f}ms  ×{count}")
+    lines.append(
+        f"   tokens                   {ENRICH_TOKENS.value(direction='prompt'):,.0f} in / "
+        f"{ENRICH_TOKENS.value(direction='completion'):,.0f} out"
+    )
+    retries = {reason: ENRICH_RETRIES.value(reason=reason) for reason in ("rate_limited", "server_error", "connection_error")}
+    lines.append("   retries                  " + ", ".join(f"{k} {v:.0f}" for k, v in retries.items()))
+    return "\n".join(lines)
+
+
+async def cmd_enrich(
+    force: bool, chapter: str | None, concurrency: int, rpm: int, tpm: int, plan: dict, changes=None
+) -> int:
+    from app.services.build_graph import build_graph
     from app.services.enrich import enrich_new_chapters
 
     _load_dotenv()
+    if changes is not None:
+        print(f"📝 Changed: {len(changes.chapters)} chapters in {len(changes.books)} books")
+        if not changes.books:
+            print("✅ Nothing under books/ changed")
+            return 0
+        plan = {**plan, "chapter_files": changes.chapters}
     if chapter:
         print(f"🤖 Enriching chapter: {chapter}")
     else:
         print("🤖 Enriching chapters..." + (" (force re-enrich)" if force else ""))
-    results = await enrich_new_chapters(force=force, chapter_id=chapter)
-    print(f"✅ Enriched: {results['enriched']} | Skipped: {results['skipped']} | Failed: {results['failed']}")
-    print(f"   Estimated cost: ${results['cost_estimate']:.4f}")
+    results = await enrich_new_chapters(
+        force=force, chapter_id=chapter, concurrency=concurrency, rpm=rpm, tpm=tpm, **plan
+    )
+    print(
+        f"✅ Enriched: {results['enriched']} | From cache: {results['cached']} | "
+        f"Skipped: {results['skipped']} | Failed: {results['failed']} | Deferred: {results['deferred']}"
+    )
+    print(
+        f"   Tokens: {results['prompt_tokens']:,} in / {results['completion_tokens']:,} out | "
+        f"Cost: ${results['cost']:.4f}"
+    )
+    if results["deferred"]:
+        print("   Deferred chapters did not fit the budget; run again to continue")
+    if changes is not None:
+        print("🔨 Rebuilding the changed books...")
+        stats = (await build_graph(changed_books=changes.books))["stats"]
+        print(
+            f"✅ Books: {stats['totalBooks']} | Chapters: {stats['totalChapters']} | "
+            f"Concepts: {stats['totalConcepts']} | Enriched: {stats['enrichedChapters']}"
+        )
     return 0 if results["failed"] == 0 else 1
 
 
-async def cmd_build() -> int:
-    from app.services.build_graph import build_graph
+async def cmd_batch(force: bool) -> int:
+    from app.services.batch import submit_batch
 
+    _load_dotenv()
+    print("📦 Submitting batch..." + (" (force re-enrich)" if force else ""))
+    results = await submit_batch(force=force)
+    if results["batch_id"]:
+        print(f"✅ Batch {results['batch_id']}: {results['submitted']} requests submitted")
+        print("   Run `readbrain enrich --collect` later to write the results")
+    else:
+        print("✅ Nothing to submit")
+    print(
+        f"   From cache: {results['cached']} | Already pending: {results['already_pending']} | "
+        f"Skipped: {results['skipped']} | Failed: {results['failed']}"
+    )
+    return 0
+
+
+async def cmd_collect() -> int:
+    from app.services.batch import collect_batches
+
+    _load_dotenv()
+    print("📥 Collecting batch results...")
+    results = await collect_batches()
+    print(
+        f"✅ Collected: {results['collected']} | Outdated: {results['outdated']} | "
+        f"Failed: {results['failed']} | Batches in progress: {results['in_progress']}"
+    )
+    return 0 if results["failed"] == 0 else 1
+
+
+def cmd_stale(force: bool, chapter: str | None, plan: dict, changes=None) -> int:
+    from app.services.enrich import find_stale_chapters
+
+    if changes is not None:
+        plan = {**plan, "chapter_files": changes.chapters}
+    stale = find_stale_chapters(force=force, chapter_id=chapter, **plan)
+    if not stale:
+        print("✅ All chapters are up to date")
+        return 0
+    for item in stale:
+        source = "cache" if item["cached"] else f"~{item['promptTokens']} tokens"
+        deferred = ", over budget" if item["deferred"] else ""
+        print(f"  {item['chapter']}  ({item['reason']}, {source}{deferred})")
+    planned = [item for item in stale if not item["deferred"]]
+    total = sum(item["cost_estimate"] for item in planned)
+    api_calls = sum(1 for item in planned if not item["cached"])
+    print(f"📋 {len(planned)} chapters would be enriched ({api_calls} API calls)")
+    if len(planned) < len(stale):
+        print(f"   {len(stale) - len(planned)} more deferred by the budget")
+    print(f"   Estimated cost: ${total:.4f}")
+    return 0
+
+
+async def cmd_build(
+    use_cache: bool, max_neighbors: int, output_format: str | None, workers: int | None, pool: str
+) -> int:
+    from app.services.build_cache import BuildCache
+    from app.services.build_graph import DEFAULT_OUTPUT_FORMAT, build_graph
+    from app.services.encoding import brotli
+
+    output_format = output_format or DEFAULT_OUTPUT_FORMAT
     print("🔨 Building graph...")
-    data = await build_graph()
+    if output_format == "compressed" and brotli is None:
+        print("⚠️  brotli not installed — writing .gz sidecars only")
+    cache = BuildCache.load() if use_cache else BuildCache.disabled()
+    data = await build_graph(
+        cache=cache,
+        max_neighbors=max_neighbors or None,
+        output_format=output_format,
+        workers=workers,
+        pool=pool,
+    )
     stats = data["stats"]
     print(
         f"✅ Books: {stats['totalBooks']} | Chapters: {stats['totalChapters']} | "
         f"Concepts: {stats['totalConcepts']} | Enriched: {stats['enrichedChapters']}"
     )
+    print(f"   Files reused: {cache.reused} | Re-parsed: {cache.reparsed} | Removed: {cache.removed}")
+    return 0
+
+
+async def cmd_export(out: Path | None, use_cache: bool) -> int:
+    from app.services.build_cache import BuildCache
+    from app.services.build_graph import build_graph
+    from app.services.export import EXPORT_DIR, export_site
+
+    out = out or EXPORT_DIR
+    print("🔨 Building graph...")
+    data = await build_graph(cache=BuildCache.load() if use_cache else BuildCache.disabled())
+    print(f"📦 Exporting static site to {out}...")
+    counts = await asyncio.to_thread(export_site, data, out)
+    print(f"✅ Written: {counts['written']} | Unchanged: {counts['unchanged']} | Removed: {counts['removed']}")
     return 0
 
 
@@ -77,7 +242,123 @@ async def cmd_scaffold(book: str, author: str | None) -> int:
         return 1
 
 
+async def cmd_scaffold_list(path: Path, concurrency: int, progress: Path | None) -> int:
+    from app.services.scaffold import read_reading_list, scaffold_books
+
+    _load_dotenv()
+    if not os.getenv("OPENAI_API_KEY"):
+        print("⚠️  OPENAI_API_KEY not set — required for scaffold")
+        return 1
+    try:
+        entries = read_reading_list(path)
+    except OSError as e:
+        print(f"Error: {e}")
+        return 1
+    progress = progress or path.with_suffix(".progress.json")
+    print(f"📚 Scaffolding {len(entries)} books from {path} (progress: {progress})")
+
+    def on_result(title: str, author: str | None, outcome: dict) -> None:
+        label = title + (f" by {author}" if author else "")
+        if outcome["status"] == "created":
+            print(f"  ✅ {label} → books/{outcome['bookId']} ({outcome['chapters']} chapters)")
+        elif outcome["status"] == "exists":
+            print(f"  ⏭️  {label} — already exists")
+        else:
+            print(f"  ❌ {label} — {outcome['error']}")
+
+    results = await scaffold_books(entries, concurrency=concurrency, progress_file=progress, on_result=on_result)
+    print(f"\n✅ Created: {len(results['created'])}")
+    print(f"   Already existed: {len(results['exists'])}")
+    if results["resumed"]:
+        print(f"   Done in an earlier run: {results['resumed']}")
+    if results["failed"]:
+        print(f"   Failed: {len(results['failed'])} (re-run the same command to retry)")
+        return 1
+    return 0
+
+
+async def cmd_bench(ns: argparse.Namespace) -> int:
+    import json
+
+    from benchmarks.run import BENCHMARKS, compare, format_comparison, run_benchmarks
+    from benchmarks.synth import LibrarySpec
+
+    only = [name for name in (ns.only or "").split(",") if name]
+    unknown = set(only) - set(BENCHMARKS)
+    if unknown:
+        print(f"Error: unknown benchmark(s): {', '.join(sorted(unknown))} (choose from {', '.join(BENCHMARKS)})")
+        return 2
+    spec = LibrarySpec(
+        books=ns.books,
+        chapters=ns.chapters,
+        note_words=ns.note_words,
+        concepts=ns.concepts,
+        concept_skew=ns.concept_skew,
+    )
+    report = await run_benchmarks(
+        spec,
+        only=only or None,
+        repeat=ns.repeat,
+        requests=ns.requests,
+        queries=ns.queries,
+        enrich_chapters=ns.enrich_chapters,
+        scaffold_books=ns.scaffold_books,
+        concurrency=ns.concurrency,
+        latency=ns.latency,
+        rate_429=ns.rate_429,
+        library=ns.library,
+    )
+    body = json.dumps(report, indent=2)
+    if ns.output:
+        ns.output.write_text(body + "\n")
+        print(f"✅ Results written to {ns.output}", file=sys.stderr)
+    else:
+        print(body)
+    if ns.compare:
+        baseline = json.loads(ns.compare.read_text())
+        print(f"\n📊 Compared with {baseline.get('commit') or ns.compare}:", file=sys.stderr)
+        print(format_comparison(compare(baseline, report)), file=sys.stderr)
+    return 0
+
+
+def _run_enrich(ns: argparse.Namespace) -> int:
+    plan = {"order": ns.order, "max_cost": ns.max_cost, "max_tokens": ns.max_tokens}
+    if ns.note_tokens:
+        plan["note_tokens"] = ns.note_tokens
+    changes = None
+    if ns.until and not ns.since:
+        print("Error: --until needs --since")
+        return 2
+    if ns.since or ns.stdin:
+        from app.services.changeset import changed_since, from_paths
+
+        if ns.batch or ns.collect:
+            print("Error: --since / --stdin cannot be combined with --batch or --collect")
+            return 2
+        try:
+            if ns.since:
+                changes = changed_since(ns.since, ns.until)
+            else:
+                changes = from_paths(line.strip() for line in sys.stdin if line.strip())
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+    if ns.stale:
+        return cmd_stale(ns.force, ns.chapter, plan, changes)
+    if ns.batch:
+        return asyncio.run(cmd_batch(ns.force))
+    if ns.collect:
+        return asyncio.run(cmd_collect())
+    return _profiled(
+        ns.profile,
+        lambda: asyncio.run(cmd_enrich(ns.force, ns.chapter, ns.concurrency, ns.rpm, ns.tpm, plan, changes)),
+        _enrich_report,
+    )
+
+
 def main() -> int:
+    from app.services.ratelimit import DEFAULT_RPM, DEFAULT_TPM
+
     parser = argparse.ArgumentParser(
         prog="readbrain",
         description="ReadBrain — AI-powered personal reading knowledge base",
@@ -87,12 +368,85 @@ def main() -> int:
     # enrich
     p_enrich = subparsers.add_parser("enrich", help="Enrich chapter notes with AI")
     p_enrich.add_argument("--force", action="store_true", help="Re-enrich all chapters")
-    p_enrich.add_argument("--chapter", metavar="ID", help="Enrich only this chapter (e.g. atomic-habits-ch1)")
-    p_enrich.set_defaults(func=lambda ns: asyncio.run(cmd_enrich(ns.force, ns.chapter)))
+    p_enrich_scope = p_enrich.add_mutually_exclusive_group()
+    p_enrich_scope.add_argument("--chapter", metavar="ID", help="Enrich only this chapter (e.g. atomic-habits-ch1)")
+    p_enrich_scope.add_argument(
+        "--since", metavar="REV",
+        help="Only chapters whose note or book meta.yaml changed since this git revision; rebuilds those books after",
+    )
+    p_enrich_scope.add_argument(
+        "--stdin", action="store_true",
+        help="Like --since, with the changed paths read from stdin (one per line, e.g. git diff --name-only)",
+    )
+    p_enrich.add_argument("--until", metavar="REV", help="End revision for --since (default: the working tree)")
+    p_enrich.add_argument("-j", "--concurrency", type=int, default=4, help="Parallel API calls (default: 4)")
+    p_enrich.add_argument(
+        "--rpm", type=int, default=DEFAULT_RPM, help=f"Requests-per-minute limit (default: {DEFAULT_RPM})"
+    )
+    p_enrich.add_argument(
+        "--tpm", type=int, default=DEFAULT_TPM, help=f"Tokens-per-minute limit (default: {DEFAULT_TPM})"
+    )
+    p_enrich.add_argument("--max-cost", type=float, metavar="USD", help="Stop before the run's cost would exceed this")
+    p_enrich.add_argument("--max-tokens", type=int, metavar="N", help="Stop before the run's tokens would exceed this")
+    p_enrich.add_argument(
+        "--order", choices=["stale", "largest"], default="stale",
+        help="Which chapters go first (and so fit a budget): never/least recently enriched, or largest notes "
+        "(default: stale)",
+    )
+    p_enrich.add_argument(
+        "--note-tokens", type=int, metavar="N",
+        help="Truncate notes to N tokens in the prompt (default: $READBRAIN_NOTE_TOKENS or 1000)",
+    )
+    p_enrich.add_argument(
+        "--profile", nargs="?", const="", metavar="FILE",
+        help="Print queue wait, API latency, token and retry totals; with FILE also write a cProfile dump",
+    )
+    p_enrich_mode = p_enrich.add_mutually_exclusive_group()
+    p_enrich_mode.add_argument("--stale", action="store_true", help="List chapters that would be enriched, with estimated cost")
+    p_enrich_mode.add_argument("--batch", action="store_true", help="Submit pending chapters through the Batch API")
+    p_enrich_mode.add_argument("--collect", action="store_true", help="Download finished batches and write results")
+    p_enrich.set_defaults(func=_run_enrich)
 
     # build
     p_build = subparsers.add_parser("build", help="Build graph-data.json from books")
-    p_build.set_defaults(func=lambda ns: asyncio.run(cmd_build()))
+    p_build.add_argument("--no-cache", action="store_true", help="Ignore the build cache and re-parse every file")
+    p_build.add_argument(
+        "--max-neighbors",
+        type=int,
+        default=10,
+        help="Concept edges kept per chapter, strongest first (0 = all pairs; default: 10)",
+    )
+    p_build.add_argument(
+        "--format",
+        choices=["pretty", "min", "compressed"],
+        help="graph-data.json layout: indented, minified, or minified with .gz/.br sidecars "
+        "(default: $READBRAIN_OUTPUT_FORMAT or pretty)",
+    )
+    p_build.add_argument(
+        "-j", "--workers", type=int, default=None, help="Parallel parse workers (default: CPU count; 1 = serial)"
+    )
+    p_build.add_argument(
+        "--pool", choices=["process", "thread"], default="process", help="Worker pool type (default: process)"
+    )
+    p_build.add_argument(
+        "--profile", nargs="?", const="", metavar="FILE",
+        help="Print time per build stage; with FILE also write a cProfile dump",
+    )
+    p_build.set_defaults(
+        func=lambda ns: _profiled(
+            ns.profile,
+            lambda: asyncio.run(cmd_build(not ns.no_cache, ns.max_neighbors, ns.format, ns.workers, ns.pool)),
+            _build_report,
+        )
+    )
+
+    # export
+    p_export = subparsers.add_parser(
+        "export", help="Build and write a static site with content-hashed data shards (for GitHub Pages)"
+    )
+    p_export.add_argument("-o", "--out", type=Path, metavar="DIR", help="Output directory (default: dist/)")
+    p_export.add_argument("--no-cache", action="store_true", help="Ignore the build cache and re-parse every file")
+    p_export.set_defaults(func=lambda ns: asyncio.run(cmd_export(ns.out, not ns.no_cache)))
 
     # serve
     p_serve = subparsers.add_parser("serve", help="Start the web server")
@@ -101,9 +455,52 @@ def main() -> int:
 
     # scaffold
     p_scaffold = subparsers.add_parser("scaffold", help="Scaffold a new book from search")
-    p_scaffold.add_argument("book", help='Book title, e.g. "Atomic Habits"')
+    p_scaffold.add_argument("book", nargs="?", help='Book title, e.g. "Atomic Habits"')
     p_scaffold.add_argument("author", nargs="?", help="Author name (optional)")
-    p_scaffold.set_defaults(func=lambda ns: asyncio.run(cmd_scaffold(ns.book, ns.author)))
+    p_scaffold.add_argument(
+        "--from", dest="from_file", type=Path, metavar="CSV",
+        help="Scaffold every book in a reading list (rows of title,author; author optional)",
+    )
+    p_scaffold.add_argument("--concurrency", type=int, default=4, help="Books scaffolded at once with --from (default: 4)")
+    p_scaffold.add_argument(
+        "--progress", type=Path, metavar="FILE",
+        help="Progress file for resuming an interrupted --from import (default: <CSV>.progress.json)",
+    )
+
+    def run_scaffold(ns: argparse.Namespace) -> int:
+        if ns.from_file:
+            if ns.book:
+                p_scaffold.error("give either a book or --from, not both")
+            return asyncio.run(cmd_scaffold_list(ns.from_file, ns.concurrency, ns.progress))
+        if not ns.book:
+            p_scaffold.error("a book title or --from CSV is required")
+        return asyncio.run(cmd_scaffold(ns.book, ns.author))
+
+    p_scaffold.set_defaults(func=run_scaffold)
+
+    # bench
+    p_bench = subparsers.add_parser("bench", help="Run performance benchmarks on a synthetic library")
+    p_bench.add_argument("--only", metavar="NAMES", help="Comma-separated subset: cold_build,warm_build,edit_build,api_graph,api_stream,rebuild_burst,search,neighbors,related,startup,enrich,scaffold")
+    p_bench.add_argument("--books", type=int, default=20, help="Synthetic books (default: 20)")
+    p_bench.add_argument("--chapters", type=int, default=10, help="Chapters per book (default: 10)")
+    p_bench.add_argument("--note-words", type=int, default=300, help="Words of notes per chapter (default: 300)")
+    p_bench.add_argument("--concepts", type=int, default=6, help="Concepts per chapter (default: 6)")
+    p_bench.add_argument(
+        "--concept-skew", type=float, default=1.0,
+        help="Zipf exponent of concept popularity; 0 = uniform, higher = more overlap (default: 1.0)",
+    )
+    p_bench.add_argument("--library", type=Path, metavar="DIR", help="Benchmark a copy of this books/ tree instead")
+    p_bench.add_argument("--repeat", type=int, default=3, help="Runs per build benchmark (default: 3)")
+    p_bench.add_argument("--requests", type=int, default=200, help="Requests per API variant (default: 200)")
+    p_bench.add_argument("--queries", type=int, default=500, help="Search queries (default: 500)")
+    p_bench.add_argument("--enrich-chapters", type=int, default=50, help="Chapters to enrich (default: 50)")
+    p_bench.add_argument("--scaffold-books", type=int, default=20, help="Books to bulk-scaffold (default: 20)")
+    p_bench.add_argument("--concurrency", type=int, default=8, help="Enrichment and scaffold concurrency (default: 8)")
+    p_bench.add_argument("--latency", type=float, default=0.3, help="Fake OpenAI seconds per call (default: 0.3)")
+    p_bench.add_argument("--rate-429", type=float, default=0.0, help="Share of fake OpenAI calls answered 429 (default: 0)")
+    p_bench.add_argument("-o", "--output", type=Path, metavar="FILE", help="Write results JSON here (default: stdout)")
+    p_bench.add_argument("--compare", type=Path, metavar="FILE", help="Print changes against an earlier results file")
+    p_bench.set_defaults(func=lambda ns: asyncio.run(cmd_bench(ns)))
 
     args = parser.parse_args()
     if not args.command:
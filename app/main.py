@@ -1,4 +1,6 @@
 """ReadBrain FastAPI application."""
+import asyncio
+import contextlib
 import os
 from contextlib import asynccontextmanager
 from pathlib import Path
@@ -7,23 +9,50 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
-from app.routes import graph, enrich as enrich_routes
-from app.services.build_graph import build_graph
+from app.middleware import MetricsMiddleware
+from app.routes import chapters, graph, metrics as metrics_routes, neighbors, search, enrich as enrich_routes
+from app.static_files import PrecompressedStaticFiles
+from app.services import metrics
+from app.services.graph_store import graph_store
+from app.services.watcher import watch_books
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
 
+async def _reconcile() -> None:
+    try:
+        await graph_store.rebuild()
+    except Exception as e:
+        print(f"⚠️  Startup graph build failed: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # On startup: build graph from whatever is on disk
-    await build_graph()
+    # Serve the last graph written right away; the first build brings it up to date with
+    # /books in the background (requests made before there is any graph wait for it)
+    await graph_store.load_persisted()
+    reconcile = asyncio.create_task(_reconcile())
+    # Keep the snapshot hot as notes are edited (set READBRAIN_WATCH=0 to disable)
+    watcher = None
+    if os.getenv("READBRAIN_WATCH", "1") != "0":
+        watcher = asyncio.create_task(watch_books(graph_store))
     yield
+    reconcile.cancel()
+    if watcher:
+        watcher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await watcher
+    await graph_store.close()
 
 
 app = FastAPI(title="ReadBrain API", lifespan=lifespan)
 
 app.include_router(graph.router, prefix="/api")
+app.include_router(chapters.router, prefix="/api")
+app.include_router(neighbors.router, prefix="/api")
+app.include_router(search.router, prefix="/api")
 app.include_router(enrich_routes.router, prefix="/api")
+app.include_router(metrics_routes.router)
 
 # Serve static assets (CSS, JS)
 site_src = PROJECT_ROOT / "site" / "src"
@@ -33,9 +62,14 @@ if site_src.exists():
 # Serve public assets (graph-data.json etc)
 site_public = PROJECT_ROOT / "site" / "public"
 site_public.mkdir(parents=True, exist_ok=True)
-app.mount("/public", StaticFiles(directory=str(site_public)), name="public")
+app.mount("/public", PrecompressedStaticFiles(directory=str(site_public)), name="public")
 
 # SPA catch-all — must be last
 @app.get("/{full_path:path}")
 async def serve_frontend(full_path: str):
     return FileResponse(str(PROJECT_ROOT / "site" / "index.html"))
+
+
+# Request timings for /metrics (READBRAIN_METRICS=0 leaves the middleware out entirely)
+if metrics.ENABLED:
+    app.add_middleware(MetricsMiddleware, routes=app.router.routes)
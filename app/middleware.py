@@ -0,0 +1,46 @@
+"""ASGI middleware recording request timings in app.services.metrics."""
+import time
+
+from starlette.routing import Match
+
+from app.services.metrics import HTTP_SECONDS
+
+
+class MetricsMiddleware:
+    """
+    Observes each HTTP request's duration, labelled by route template (not the raw
+    path, to keep the series count bounded) and status. Streaming responses are
+    timed until their body ends.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    def _route(self, scope) -> str:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        # Matched before the app runs: routing rewrites the scope (e.g. under a Mount)
+        route = self._route(scope)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_SECONDS.observe(
+                time.perf_counter() - start, method=scope["method"], route=route, status=status
+            )
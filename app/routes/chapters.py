@@ -0,0 +1,28 @@
+"""Chapter detail API routes (the reader loads one chapter at a time)."""
+from fastapi import APIRouter, HTTPException, Query
+from app.services.graph_store import graph_store
+
+router = APIRouter()
+
+# Most chapters one ?ids= request may ask for.
+MAX_IDS = 100
+
+
+@router.get("/chapters")
+async def get_chapters(ids: str = Query(..., description="Comma-separated chapter ids")):
+    wanted = list(dict.fromkeys(i for i in ids.split(",") if i))
+    if len(wanted) > MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IDS} ids per request")
+    chapters = (await graph_store.get()).chapters
+    return {
+        "chapters": [chapters[i] for i in wanted if i in chapters],
+        "missing": [i for i in wanted if i not in chapters],
+    }
+
+
+@router.get("/chapters/{chapter_id}")
+async def get_chapter(chapter_id: str):
+    chapter = (await graph_store.get()).chapters.get(chapter_id)
+    if chapter is None:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    return chapter
@@ -1,13 +1,74 @@
-"""Enrichment API routes."""
-from fastapi import APIRouter, Query
-from app.services.enrich import enrich_new_chapters
-from app.services.build_graph import build_graph
+"""Enrichment API routes. Enrichment runs as a background job; poll or stream its progress."""
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.services.events import format_sse
+from app.services.jobs import job_queue
 
 router = APIRouter()
 
+# Seconds between SSE keep-alive comments, so proxies don't close idle streams.
+KEEPALIVE_INTERVAL = 15.0
+
+
+@router.post("/enrich", status_code=202)
+async def trigger_enrichment(
+    force: bool = Query(default=False),
+    chapter: str | None = Query(default=None),
+    max_cost: float | None = Query(default=None, gt=0, description="USD cap for the run"),
+    max_tokens: int | None = Query(default=None, gt=0, description="Token cap for the run"),
+):
+    """Queue an enrichment job. An identical queued or running job is returned instead of a new one."""
+    job, created = job_queue.submit(force=force, chapter=chapter, max_cost=max_cost, max_tokens=max_tokens)
+    return JSONResponse(
+        status_code=202,
+        content={"message": "Enrichment queued" if created else "Enrichment already queued", **job.to_dict(chapters=False)},
+        headers={"Location": f"/api/jobs/{job.id}"},
+    )
+
+
+@router.get("/jobs")
+async def list_jobs():
+    return {"jobs": [job.to_dict(chapters=False) for job in job_queue.recent()]}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, per-chapter progress, counts and cost so far."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Server-Sent Events: `job` with the full state, then `planned`, `chapter` and `status` updates."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    queue = job.events.subscribe()
+
+    async def stream():
+        try:
+            yield format_sse("job", job.to_dict())
+            while job.active and not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event == "resync":
+                    event, data = "job", job.to_dict()
+                yield format_sse(event, data)
+            while not queue.empty():
+                yield format_sse(*queue.get_nowait())
+        finally:
+            job.events.unsubscribe(queue)
 
-@router.post("/enrich")
-async def trigger_enrichment(force: bool = Query(default=False)):
-    results = await enrich_new_chapters(force=force)
-    await build_graph()
-    return {"message": "Enrichment complete", "results": results}
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
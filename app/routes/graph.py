@@ -1,18 +1,118 @@
 """Graph API routes."""
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
-from app.services.build_graph import build_graph
+import asyncio
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from app.services.build_graph import graph_records
+from app.services.encoding import (
+    StreamCompressor,
+    available_encodings,
+    dumps_json,
+    negotiate_encoding,
+    wants_msgpack,
+    wants_ndjson,
+)
+from app.services.events import format_sse
+from app.services.graph_store import GraphSnapshot, graph_store
 
 router = APIRouter()
 
+# Seconds between SSE keep-alive comments, so proxies don't close idle streams.
+KEEPALIVE_INTERVAL = 15.0
+# A streamed /api/graph body is serialized and sent in chunks of about this many bytes.
+STREAM_CHUNK_BYTES = 256 * 1024
+
+
+def _next_chunk(records) -> bytes:
+    """NDJSON lines of the next records, up to about STREAM_CHUNK_BYTES (empty at the end)."""
+    lines, size = [], 0
+    for record in records:
+        lines.append(dumps_json(record) + b"\n")
+        size += len(lines[-1])
+        if size >= STREAM_CHUNK_BYTES:
+            break
+    return b"".join(lines)
+
+
+def _stream_graph(snapshot: GraphSnapshot, skeleton: bool, encoding: str | None, headers: dict) -> StreamingResponse:
+    """The graph as NDJSON (see build_graph.graph_records), serialized one chunk at a time."""
+
+    async def stream():
+        records = graph_records(snapshot.data, skeleton)
+        compressor = StreamCompressor(encoding) if encoding else None
+        while chunk := await asyncio.to_thread(_next_chunk, records):
+            yield compressor.compress(chunk) if compressor else chunk
+        if compressor:
+            yield compressor.finish()
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers=headers)
+
 
 @router.get("/graph")
-async def get_graph():
-    data = await build_graph()
-    return JSONResponse(content=data)
+async def get_graph(request: Request, view: str = Query(default="full", pattern="^(full|skeleton)$")):
+    """
+    view=skeleton leaves out chapter details; fetch those from /api/chapters.
+    Sent as MessagePack if the Accept header prefers it, and gzip/br compressed
+    per Accept-Encoding. With Accept: application/x-ndjson the graph is streamed
+    book by book instead of being serialized as one body.
+    """
+    snapshot = await graph_store.get()
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), available_encodings())
+    if wants_ndjson(request.headers.get("accept")):
+        etag = snapshot.stream_etag(view)
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+        if snapshot.matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return _stream_graph(snapshot, view == "skeleton", encoding, headers)
+    if view == "skeleton":
+        snapshot = snapshot.skeleton
+    fmt = "msgpack" if wants_msgpack(request.headers.get("accept")) else "json"
+    headers = {
+        "ETag": snapshot.variant_etag(fmt, encoding),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept, Accept-Encoding",
+    }
+    if snapshot.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    body = await asyncio.to_thread(snapshot.encoded, fmt, encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=f"application/{fmt}", headers=headers)
+
+
+@router.get("/graph/events")
+async def graph_events(request: Request):
+    """Server-Sent Events: `hello` with the current version/ETag, then one `delta` per graph change."""
+    queue = graph_store.events.subscribe()
+
+    async def stream():
+        try:
+            snapshot = await graph_store.get()
+            yield format_sse("hello", {
+                "version": snapshot.version,
+                "etag": snapshot.etag,
+                "skeletonEtag": snapshot.skeleton.etag,
+            })
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event, data)
+        finally:
+            graph_store.events.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/rebuild")
 async def rebuild_graph():
-    data = await build_graph()
-    return {"message": "Graph rebuilt", "stats": data["stats"]}
+    snapshot = await graph_store.rebuild()
+    return {"message": "Graph rebuilt", "stats": snapshot.data["stats"]}
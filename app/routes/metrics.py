@@ -0,0 +1,11 @@
+"""Prometheus metrics endpoint."""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
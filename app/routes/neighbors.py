@@ -0,0 +1,30 @@
+"""Neighbourhood API routes: bounded subgraphs around a chapter or a concept."""
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query, Response
+from app.services.encoding import dumps_json
+from app.services.graph_store import GraphSnapshot, graph_store
+from app.services.neighbors import MAX_DEPTH, MAX_LIMIT
+
+router = APIRouter()
+
+
+def _neighbourhood(snapshot: GraphSnapshot, node_id: str, depth: int, limit: int, min_weight: int) -> bytes | None:
+    result = snapshot.adjacency.neighbourhood(node_id, depth=depth, limit=limit, min_weight=min_weight)
+    return None if result is None else dumps_json({"version": snapshot.version, **result})
+
+
+@router.get("/neighbors/{node_id}")
+async def get_neighbors(
+    node_id: str,
+    depth: int = Query(default=1, ge=1, le=MAX_DEPTH),
+    limit: int = Query(default=50, ge=1, le=MAX_LIMIT),
+    min_weight: int = Query(default=1, ge=1),
+):
+    snapshot = await graph_store.get()
+    # In a thread: the first query of a snapshot builds its adjacency index. The body is
+    # encoded directly, as FastAPI's encoder would take longer than the query.
+    body = await asyncio.to_thread(_neighbourhood, snapshot, node_id, depth, limit, min_weight)
+    if body is None:
+        raise HTTPException(status_code=404, detail="No chapter or concept with this id")
+    return Response(content=body, media_type="application/json")
@@ -0,0 +1,32 @@
+"""Full-text search API routes."""
+import asyncio
+
+from fastapi import APIRouter, Query
+from app.services.graph_store import graph_store
+from app.services.search_index import snippet
+
+router = APIRouter()
+
+
+@router.get("/search")
+async def search(q: str = Query(..., min_length=1), limit: int = Query(default=10, ge=1, le=50)):
+    snapshot = await graph_store.get()
+    if graph_store.search_index is None:
+        # Serving the persisted graph from startup: the index is loaded by the first build
+        snapshot = await graph_store.synced()
+    # In a thread: waits out an index update by a rebuild without blocking the event loop
+    hits, terms = await asyncio.to_thread(graph_store.search_index.search, q, limit)
+    results = []
+    for chapter_id, score in hits:
+        chapter = snapshot.chapters.get(chapter_id)
+        if chapter is None:
+            continue
+        results.append({
+            "id": chapter_id,
+            "bookId": chapter["bookId"],
+            "title": chapter["title"],
+            "score": round(score, 4),
+            "snippet": snippet(chapter.get("rawNotes") or "", terms)
+            or snippet(chapter.get("summary") or "", terms),
+        })
+    return {"query": q, "results": results}
@@ -0,0 +1,219 @@
+"""Batch-API enrichment for large backfills: submit all pending prompts at once, collect later."""
+import io
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import yaml
+from openai import AsyncOpenAI
+
+from app.services.enrich import BOOKS_DIR, _plan, _prepare_item, _request_body, _to_record
+from app.services.enrich_cache import ResponseCache
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+BATCH_DIR = PROJECT_ROOT / ".readbrain" / "batches"
+STATE_FILE = BATCH_DIR / "state.json"
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+# Batch statuses after which nothing more will happen on the OpenAI side
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _load_state() -> dict:
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"batches": {}}
+
+
+def _save_state(state: dict) -> None:
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = STATE_FILE.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, STATE_FILE)
+
+
+def _pending_requests(state: dict) -> dict[str, str]:
+    """chapter -> input hash for requests sitting in batches that have not been collected yet."""
+    pending = {}
+    for batch in state["batches"].values():
+        if batch.get("collectedAt"):
+            continue
+        for chapter, req in batch["requests"].items():
+            pending[chapter] = req["inputHash"]
+    return pending
+
+
+def _client() -> AsyncOpenAI | None:
+    api_key = os.getenv("OPENAI_API_KEY")
+    return AsyncOpenAI(api_key=api_key) if api_key else None
+
+
+def _write_enriched(chapter: str, record: dict) -> None:
+    md_file = BOOKS_DIR / chapter
+    with open(md_file.parent / f"{md_file.stem}_enriched.json", "w") as f:
+        json.dump(record, f, indent=2)
+
+
+async def submit_batch(force: bool = False) -> dict:
+    """
+    Write every pending prompt to a JSONL batch file and submit it. Chapters whose
+    inputs are in the response cache are written immediately; chapters already
+    waiting in an uncollected batch with the same inputs are not resubmitted.
+    """
+    results = {"batch_id": None, "submitted": 0, "cached": 0, "skipped": 0, "already_pending": 0, "failed": 0}
+    client = _client()
+    if client is None:
+        print("⚠️  OPENAI_API_KEY not set — skipping enrichment")
+        return results
+
+    items, current, failed = _plan(force, None)
+    results["skipped"] = len(current)
+    results["failed"] = len(failed)
+    state = _load_state()
+    pending = _pending_requests(state)
+    cache = ResponseCache()
+    lines, requests = [], {}
+    try:
+        for item in items:
+            chapter = item["md_file"].relative_to(BOOKS_DIR).as_posix()
+            cached = None if force else cache.get(item["input_hash"])
+            if cached is not None:
+                _write_enriched(chapter, cached)
+                results["cached"] += 1
+                continue
+            if pending.get(chapter) == item["input_hash"]:
+                results["already_pending"] += 1
+                continue
+            lines.append(json.dumps({
+                "custom_id": chapter,
+                "method": "POST",
+                "url": CHAT_ENDPOINT,
+                "body": _request_body(item["prompt"]),
+            }))
+            requests[chapter] = {"inputHash": item["input_hash"]}
+    finally:
+        cache.close()
+
+    if not lines:
+        return results
+
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    created = datetime.now(timezone.utc)
+    input_path = BATCH_DIR / f"batch-{created.strftime('%Y%m%dT%H%M%S')}.jsonl"
+    input_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    with open(input_path, "rb") as f:
+        uploaded = await client.files.create(file=(input_path.name, f), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=CHAT_ENDPOINT,
+        completion_window="24h",
+        metadata={"source": "readbrain"},
+    )
+    state["batches"][batch.id] = {
+        "createdAt": created.isoformat(),
+        "inputFile": input_path.name,
+        "inputFileId": uploaded.id,
+        "status": batch.status,
+        "requests": requests,
+        "collected": [],
+    }
+    _save_state(state)
+    results["batch_id"] = batch.id
+    results["submitted"] = len(lines)
+    return results
+
+
+def _current_hash(chapter: str) -> str | None:
+    """Input hash of the chapter as it is on disk now (None if it was deleted)."""
+    md_file = BOOKS_DIR / chapter
+    if not md_file.exists():
+        return None
+    with open(md_file.parent / "meta.yaml") as f:
+        meta = yaml.safe_load(f) or {}
+    return _prepare_item(md_file, meta)["input_hash"]
+
+
+async def collect_batches() -> dict:
+    """
+    Poll every uncollected batch; download finished ones and fan results out into
+    _enriched.json files. Safe to re-run: collected requests are recorded in the
+    state file and never written twice.
+    """
+    results = {"collected": 0, "outdated": 0, "failed": 0, "in_progress": 0}
+    client = _client()
+    if client is None:
+        print("⚠️  OPENAI_API_KEY not set — skipping enrichment")
+        return results
+
+    state = _load_state()
+    cache = ResponseCache()
+    try:
+        for batch_id, entry in state["batches"].items():
+            if entry.get("collectedAt"):
+                continue
+            batch = await client.batches.retrieve(batch_id)
+            entry["status"] = batch.status
+            if batch.status not in TERMINAL_STATUSES:
+                results["in_progress"] += 1
+                print(f"  ⏳ {batch_id}: {batch.status}")
+                continue
+
+            collected = set(entry["collected"])
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if not file_id:
+                    continue
+                content = await client.files.content(file_id)
+                for line in io.StringIO(content.text):
+                    if not line.strip():
+                        continue
+                    try:
+                        row = json.loads(line)
+                        chapter = row["custom_id"]
+                    except (ValueError, TypeError, KeyError) as e:
+                        results["failed"] += 1
+                        print(f"  ⚠️  Unreadable row in {file_id}: {e}")
+                        continue
+                    request = entry["requests"].get(chapter)
+                    if request is None or chapter in collected:
+                        continue
+                    # Whatever happens to this row, it is done: a bad response must not
+                    # keep the batch (and every later --collect) stuck on it
+                    collected.add(chapter)
+                    response = row.get("response") or {}
+                    if row.get("error") or response.get("status_code") != 200:
+                        results["failed"] += 1
+                        print(f"  ⚠️  Failed {chapter}: {row.get('error') or response.get('status_code')}")
+                        continue
+                    try:
+                        body = response["body"]
+                        record = _to_record(body["choices"][0]["message"]["content"], body.get("usage"))
+                        record["inputHash"] = request["inputHash"]
+                        current = _current_hash(chapter)
+                    except Exception as e:
+                        results["failed"] += 1
+                        print(f"  ⚠️  Failed {chapter}: {e!r}")
+                        continue
+                    cache.put(request["inputHash"], record)
+                    if current == request["inputHash"]:
+                        _write_enriched(chapter, record)
+                        results["collected"] += 1
+                        print(f"  ✅ Enriched: {chapter}")
+                    else:
+                        # Note changed (or vanished) while the batch ran; a normal run picks it up
+                        results["outdated"] += 1
+                        print(f"  ↪️  Outdated, not written: {chapter}")
+                entry["collected"] = sorted(collected)
+                _save_state(state)
+
+            # Requests missing from both files (e.g. an expired batch) are left for the next submit
+            entry["collectedAt"] = datetime.now(timezone.utc).isoformat()
+            _save_state(state)
+    finally:
+        cache.close()
+        _save_state(state)
+    return results
@@ -0,0 +1,234 @@
+"""Persistent parse cache for build_graph. Keyed by path, mtime, size and content hash."""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+CACHE_DIR = PROJECT_ROOT / ".readbrain"
+CACHE_FILE = CACHE_DIR / "build-cache.json"
+
+# Bump when the shape of cached records changes so stale caches are discarded.
+CACHE_VERSION = 1
+
+
+_ROOT_PREFIX = str(PROJECT_ROOT) + os.sep
+
+
+def _rel(path: Path) -> str:
+    """Cache key for a path: relative to the project root when inside it (cheap string op)."""
+    s = str(path)
+    if s.startswith(_ROOT_PREFIX):
+        s = s[len(_ROOT_PREFIX):]
+    return s.replace(os.sep, "/")
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _same_content(old: dict | None, new: dict | None) -> bool:
+    if old is None or new is None:
+        return old is new
+    return old["sha256"] == new["sha256"]
+
+
+def _count(files: dict) -> int:
+    return sum(1 for fp in files.values() if fp)
+
+
+def _fingerprint(path: Path, previous: dict | None) -> dict | None:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    fp = {"mtime": st.st_mtime_ns, "size": st.st_size}
+    if previous and previous["mtime"] == fp["mtime"] and previous["size"] == fp["size"]:
+        fp["sha256"] = previous["sha256"]
+    else:
+        fp["sha256"] = _sha256(path)
+    return fp
+
+
+def resolve(paths: list[Path], previous: dict | None, parse: Callable[[], Any]) -> tuple[dict, Any]:
+    """
+    Fingerprint paths (hashing only files whose mtime or size moved) and call parse()
+    unless their content matches the previous fingerprints. Returns (fingerprints,
+    record), with record None when the previous record is still valid. Touches no
+    cache state, so it can run in a worker thread or process.
+    """
+    previous = previous or {}
+    files = {_rel(path): _fingerprint(path, previous.get(_rel(path))) for path in paths}
+    fresh = bool(previous) and files.keys() == previous.keys() and all(
+        _same_content(previous[rel], fp) for rel, fp in files.items()
+    )
+    return files, None if fresh else parse()
+
+
+class BuildCache:
+    """
+    Maps a cache key (usually a file path) to a parsed record plus the fingerprints
+    of every file the record was derived from. A record is reused when each file
+    still has the same mtime and size, or failing that the same sha256.
+    """
+
+    def __init__(self, path: Path | None = CACHE_FILE, data: dict | None = None):
+        self.path = path
+        data = data if data and data.get("version") == CACHE_VERSION else {}
+        self.entries: dict[str, dict] = data.get("entries", {})
+        self.generated: str | None = data.get("generated")
+        self.output_key: str | None = data.get("outputKey")
+        # Version of the latest graph built with this cache; only ever goes up
+        self.graph_version: int = data.get("graphVersion", 0)
+        self._dirty = False
+        self.begin()
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> "BuildCache":
+        """The cache saved at `path` (default: CACHE_FILE), or an empty one."""
+        path = path or CACHE_FILE
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        return cls(path, data)
+
+    @classmethod
+    def disabled(cls) -> "BuildCache":
+        """A cache that starts empty and is never written to disk."""
+        return cls(path=None)
+
+    def begin(self) -> None:
+        """Reset per-build counters so one cache instance can serve several builds."""
+        self.reused = 0
+        self.reparsed = 0
+        self.removed = 0
+        self._seen = set()
+
+    @property
+    def changed(self) -> bool:
+        """True if anything was re-parsed or removed since the cache was loaded."""
+        return self.reparsed > 0 or self.removed > 0
+
+    def lookup(self, source: Path, paths: list[Path], verify: bool = True) -> Any:
+        """
+        The cached record for source if it can be reused without reading any file: every
+        path still has the same mtime and size (or is still missing), or verify=False and
+        an entry exists. None means the caller has to resolve() and store() it.
+        """
+        key = _rel(source)
+        self._seen.add(key)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if verify:
+            old = entry["files"]
+            if len(old) != len(paths):
+                return None
+            for path in paths:
+                rel = _rel(path)
+                if rel not in old:
+                    return None
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    st = None
+                prev = old[rel]
+                if (st is None) != (prev is None):
+                    return None
+                if st is not None and (st.st_mtime_ns != prev["mtime"] or st.st_size != prev["size"]):
+                    return None
+        self.reused += _count(entry["files"])
+        return entry["record"]
+
+    def claim_versions_above(self, version: int) -> None:
+        """Make the next new graph's version exceed `version` (one served from another cache or process)."""
+        if version > self.graph_version:
+            self.graph_version = version
+            self._dirty = True
+
+    def forget_output(self) -> None:
+        """The graph-data.json on disk was not written from this cache: the next build is a new graph."""
+        self.generated = None
+        self.output_key = None
+
+    def next_graph_version(self) -> int:
+        """Claim the version for a new graph (persisted by the next save())."""
+        self.graph_version += 1
+        self._dirty = True
+        return self.graph_version
+
+    def previous_files(self, source: Path) -> dict | None:
+        entry = self.entries.get(_rel(source))
+        return entry["files"] if entry else None
+
+    def store(self, source: Path, files: dict, record: Any) -> Any:
+        """Apply the result of resolve() for source and return the record to use."""
+        key = _rel(source)
+        self._seen.add(key)
+        entry = self.entries.get(key)
+        if record is None:
+            self.reused += _count(files)
+            if files != entry["files"]:
+                # Touched but identical content: remember the new mtime to skip hashing next time.
+                entry["files"] = files
+                self._dirty = True
+            return entry["record"]
+        self.entries[key] = {"files": files, "record": record}
+        self.reparsed += _count(files)
+        self._dirty = True
+        return record
+
+    def fetch(self, source: Path, paths: list[Path], parse: Callable[[], Any], verify: bool = True) -> Any:
+        """
+        Return the cached record for source if none of paths changed, else parse() and store it.
+        With verify=False an existing entry is trusted without touching the filesystem.
+        """
+        record = self.lookup(source, paths, verify)
+        if record is not None:
+            return record
+        files, record = resolve(paths, self.previous_files(source), parse)
+        return self.store(source, files, record)
+
+    def prune(self) -> None:
+        """Drop entries whose key was not fetched during this build (deleted files)."""
+        stale = [k for k in self.entries if k not in self._seen]
+        for key in stale:
+            self.removed += _count(self.entries[key]["files"])
+            del self.entries[key]
+        if stale:
+            self._dirty = True
+
+    def save(self, generated: str | None, output_key: str | None = None) -> None:
+        """
+        Persist the cache. generated is the timestamp of the graph-data.json on disk (None
+        if it is stale) and output_key identifies the build options it was written with.
+        """
+        if generated != self.generated or output_key != self.output_key:
+            self.generated = generated
+            self.output_key = output_key
+            self._dirty = True
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "version": CACHE_VERSION,
+                    "generated": self.generated,
+                    "outputKey": self.output_key,
+                    "graphVersion": self.graph_version,
+                    "entries": self.entries,
+                },
+                f,
+                separators=(",", ":"),
+            )
+        os.replace(tmp, self.path)
+        self._dirty = False
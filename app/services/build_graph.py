@@ -1,14 +1,64 @@
 """Build graph-data.json from /books. Walks markdown notes, merges enrichment, outputs graph."""
+import asyncio
 import json
+import multiprocessing
+import os
 import re
+import threading
 import yaml
 import frontmatter
 from pathlib import Path
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone
+from itertools import chain
+from typing import Any, Iterator
+
+from app.services import library_index
+from app.services.build_cache import BuildCache, resolve
+from app.services.encoding import SIDECARS, available_encodings, compress, dumps_json, loads_json
+from app.services.library_index import LibraryIndex, book_digest
+from app.services.metrics import BUILD_FILES, BUILD_STAGE_SECONDS
+from app.services.related import RelatedIndex
+from app.services.search_index import SearchIndex
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 BOOKS_DIR = PROJECT_ROOT / "books"
 OUTPUT_FILE = PROJECT_ROOT / "site" / "public" / "graph-data.json"
+# Static split export: the skeleton graph plus one detail file per chapter.
+SKELETON_FILE = OUTPUT_FILE.with_name("graph-skeleton.json")
+CHAPTERS_DIR = OUTPUT_FILE.with_name("chapters")
+
+# Bump when the graph-data.json layout changes so an unchanged library is still rewritten.
+GRAPH_FORMAT = 6
+# Strongest chapter-to-chapter edges kept per chapter in conceptGraph.edges
+MAX_NEIGHBORS = 10
+# graph-data.json layouts: "pretty" (indented, diff-friendly), "min" (minified) or
+# "compressed" (minified, plus .gz/.br sidecars of graph-data.json and graph-skeleton.json).
+# READBRAIN_OUTPUT_FORMAT sets the default, which the server also uses when it rewrites them.
+OUTPUT_FORMATS = ("pretty", "min", "compressed")
+DEFAULT_OUTPUT_FORMAT = os.getenv("READBRAIN_OUTPUT_FORMAT", "pretty")
+# Parse pool: "process" (parallel YAML/frontmatter parsing) or "thread". Changed files
+# are parsed in PARSE_CHUNK-sized batches, in a pool only once there are PARALLEL_MIN_FILES.
+POOL_KINDS = ("process", "thread")
+DEFAULT_POOL = "process"
+PARALLEL_MIN_FILES = 256
+PARSE_CHUNK = 64
+# Chapter fields only needed by the reader; left out of the skeleton graph. (Related
+# lists shift when other books change, so keeping them out also keeps book shards of
+# the static export stable.)
+DETAIL_FIELDS = (
+    "summary",
+    "keyInsights",
+    "quotableIdeas",
+    "actionableItems",
+    "connectedIdeas",
+    "emotionalResonance",
+    "rawNotes",
+    "relatedChapters",
+)
+# Concept nodes / edges per record of graph_records()
+RECORD_ITEMS = 5000
 
 
 def _chapter_sort_key(md_file: Path) -> tuple:
@@ -24,8 +74,15 @@ def _normalize_concept(s: str) -> str:
     return re.sub(r"\s+", "-", s.lower().strip()).strip("-") or ""
 
 
-def _build_concept_graph(concept_index: dict) -> dict:
-    nodes, edges = [], []
+def _build_concept_graph(concept_index: dict, max_neighbors: int | None = MAX_NEIGHBORS) -> dict:
+    """
+    Concept nodes (concepts shared by 2+ chapters) plus one weighted edge per chapter
+    pair, where weight is the number of shared concepts. Each chapter keeps edges to
+    its max_neighbors strongest neighbours (None keeps every pair); an edge survives
+    if it is in the top list of either endpoint.
+    """
+    nodes, postings = [], []
+    chapter_index: dict[str, int] = {}
     for concept, chapter_ids in concept_index.items():
         if len(chapter_ids) > 1:
             nodes.append({
@@ -34,88 +91,342 @@ def _build_concept_graph(concept_index: dict) -> dict:
                 "chapters": chapter_ids,
                 "weight": len(chapter_ids),
             })
-            for i in range(len(chapter_ids)):
-                for j in range(i + 1, len(chapter_ids)):
-                    edges.append({
-                        "source": chapter_ids[i],
-                        "target": chapter_ids[j],
-                        "concept": concept,
-                    })
+            postings.append([chapter_index.setdefault(c, len(chapter_index)) for c in chapter_ids])
+
+    chapter_ids = list(chapter_index)
+    chapter_concepts: list[list[int]] = [[] for _ in chapter_ids]
+    for concept_num, posting in enumerate(postings):
+        for chapter_num in posting:
+            chapter_concepts[chapter_num].append(concept_num)
+
+    # Sparse co-occurrence, one row at a time: counting the postings of a chapter's
+    # concepts gives its shared-concept count with every other chapter.
+    pairs: dict[tuple[int, int], int] = {}
+    for i, concepts in enumerate(chapter_concepts):
+        counts = Counter(chain.from_iterable(postings[c] for c in concepts))
+        del counts[i]
+        if max_neighbors is None:
+            row = [(j, w) for j, w in counts.items() if j > i]
+        else:
+            row = counts.most_common(max_neighbors)
+        for j, w in row:
+            pairs[(i, j) if i < j else (j, i)] = w
+
+    edges = []
+    for i, j in sorted(pairs):
+        shared = set(chapter_concepts[j])
+        edges.append({
+            "source": chapter_ids[i],
+            "target": chapter_ids[j],
+            "weight": pairs[(i, j)],
+            "concepts": [nodes[c]["id"] for c in chapter_concepts[i] if c in shared],
+        })
     return {"nodes": nodes, "edges": edges}
 
 
-async def build_graph() -> dict:
-    books = []
-    concept_index: dict[str, list[str]] = {}
+def _load_meta(meta_file: Path) -> dict:
+    with open(meta_file) as f:
+        return yaml.safe_load(f) or {}
+
+
+def _enriched_path(md_file: Path) -> Path:
+    return md_file.parent / f"{md_file.stem}_enriched.json"
+
+
+def _parse_chapter(book_id: str, md_file: Path, enriched_file: Path) -> dict:
+    """Parse one chapter note and merge its enrichment into a graph chapter record."""
+    post = frontmatter.load(md_file)
+    enriched = {}
+    if enriched_file.exists():
+        with open(enriched_file) as f:
+            enriched = json.load(f)
+
+    chapter_num = post.metadata.get("chapter", 0)
+    chapter_id = f"{book_id}-ch{chapter_num}"
+    raw_concepts = enriched.get("concepts", post.metadata.get("keyThemes", []))
+    concepts_normalized = [
+        c for c in (_normalize_concept(x) for x in raw_concepts if x)
+    ]
+    concepts_deduped = list(dict.fromkeys(c for c in concepts_normalized if c))
+
+    return {
+        "id": chapter_id,
+        "bookId": book_id,
+        "chapter": chapter_num,
+        "title": post.metadata.get("title", md_file.stem),
+        "dateNoted": str(post.metadata.get("dateNoted", "")),
+        "keyThemes": post.metadata.get("keyThemes", []),
+        "rating": post.metadata.get("rating"),
+        "isEnriched": bool(enriched),
+        "summary": enriched.get("summary"),
+        "keyInsights": enriched.get("keyInsights", []),
+        "quotableIdeas": enriched.get("quotableIdeas", []),
+        "concepts": concepts_deduped,
+        "actionableItems": enriched.get("actionableItems", []),
+        "connectedIdeas": enriched.get("connectedIdeas", []),
+        "emotionalResonance": enriched.get("emotionalResonance"),
+        "rawNotes": post.content,
+    }
+
+
+def skeleton_graph(graph_data: dict) -> dict:
+    """The graph without chapter detail fields: ids, titles, colours, concepts and structure."""
+    return {
+        **graph_data,
+        "books": [
+            {
+                **book,
+                "chapters": [
+                    {k: v for k, v in c.items() if k not in DETAIL_FIELDS} for c in book["chapters"]
+                ],
+            }
+            for book in graph_data["books"]
+        ],
+    }
+
+
+def graph_records(graph_data: dict, skeleton: bool = False) -> Iterator[dict]:
+    """
+    The graph as a sequence of small records, for streaming: {"meta": generated, version
+    and stats}, one {"book": ...} per book, then the conceptGraph as {"nodes": [...]} and
+    {"edges": [...]} records of up to RECORD_ITEMS each. skeleton=True leaves out the
+    chapter detail fields, as skeleton_graph() does.
+    """
+    yield {"meta": {k: v for k, v in graph_data.items() if k not in ("books", "conceptGraph")}}
+    for book in graph_data["books"]:
+        if skeleton:
+            chapters = [{k: v for k, v in c.items() if k not in DETAIL_FIELDS} for c in book["chapters"]]
+            book = {**book, "chapters": chapters}
+        yield {"book": book}
+    for key in ("nodes", "edges"):
+        items = graph_data["conceptGraph"][key]
+        for start in range(0, len(items), RECORD_ITEMS):
+            yield {key: items[start:start + RECORD_ITEMS]}
+
+
+def _write_atomic(path: Path, body: bytes) -> None:
+    """Write via a temp file and rename, so readers never see a partly written file."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_bytes(body)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _write_if_changed(path: Path, body: bytes) -> bool:
+    try:
+        if path.read_bytes() == body:
+            return False
+    except OSError:
+        pass
+    _write_atomic(path, body)
+    return True
+
+
+def _write_artifact(path: Path, body: bytes, encodings: list[str]) -> None:
+    """Write `path` plus a precompressed sidecar per encoding; remove sidecars not asked for."""
+    changed = _write_if_changed(path, body)
+    for encoding, suffix in SIDECARS.items():
+        sidecar = path.with_name(path.name + suffix)
+        if encoding not in encodings:
+            sidecar.unlink(missing_ok=True)
+        elif changed or not sidecar.exists():
+            _write_atomic(sidecar, compress(body, encoding))
+
+
+def write_graph(graph_data: dict, output_format: str = DEFAULT_OUTPUT_FORMAT) -> None:
+    """Write graph-data.json plus the split export (graph-skeleton.json and chapters/<id>.json)."""
+    encodings = available_encodings() if output_format == "compressed" else []
+    with BUILD_STAGE_SECONDS.time(stage="serialize"):
+        body = dumps_json(graph_data, pretty=output_format == "pretty")
+        chapters = {
+            f"{chapter['id']}.json": dumps_json(chapter)
+            for book in graph_data["books"]
+            for chapter in book["chapters"]
+        }
+        skeleton = dumps_json(skeleton_graph(graph_data))
+
+    with BUILD_STAGE_SECONDS.time(stage="write"):
+        OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
+        _write_artifact(OUTPUT_FILE, body, encodings)
+        CHAPTERS_DIR.mkdir(exist_ok=True)
+        for name, chapter_body in chapters.items():
+            _write_if_changed(CHAPTERS_DIR / name, chapter_body)
+        for stale in CHAPTERS_DIR.glob("*.json"):
+            if stale.name not in chapters:
+                stale.unlink()
+        # Skeleton last: a client that sees it can rely on every chapter file being present
+        _write_artifact(SKELETON_FILE, skeleton, encodings)
+
 
+def read_graph() -> dict | None:
+    """The last graph-data.json written, or None if there is none (or it cannot be read)."""
+    try:
+        data = loads_json(OUTPUT_FILE.read_bytes())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or not {"generated", "stats", "books", "conceptGraph"} <= data.keys():
+        return None
+    return data
+
+
+def _discover() -> list[tuple[str, Path, list[Path]]]:
+    """(book id, meta.yaml, chapter notes in chapter order) for every book, sorted by id."""
+    books = []
     for book_dir in sorted(BOOKS_DIR.iterdir()):
         if not book_dir.is_dir() or book_dir.name.startswith("_"):
             continue
         meta_file = book_dir / "meta.yaml"
         if not meta_file.exists():
             continue
+        books.append((book_dir.name, meta_file, sorted(book_dir.glob("ch*.md"), key=_chapter_sort_key)))
+    return books
+
+
+def _parse_source(book_id: str, source: Path) -> dict:
+    if source.name == "meta.yaml":
+        return _load_meta(source)
+    return _parse_chapter(book_id, source, _enriched_path(source))
+
+
+def _resolve_batch(batch: list[tuple[str, Path, list[Path], dict | None]]) -> list[tuple[dict, Any]]:
+    """Pool worker: fingerprint, and parse if changed, each (book id, source, paths, previous files)."""
+    return [
+        resolve(paths, previous, lambda: _parse_source(book_id, source))
+        for book_id, source, paths, previous in batch
+    ]
+
+
+def _executor(pool: str, workers: int) -> Executor:
+    if pool == "thread":
+        return ThreadPoolExecutor(workers)
+    # Not fork: the server calls this from a worker thread while others are running
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(workers, mp_context=context)
+
+
+def _resolve_pending(pending: list, workers: int, pool: str) -> list[tuple[dict, Any]]:
+    if workers <= 1 or len(pending) < PARALLEL_MIN_FILES:
+        return _resolve_batch(pending)
+    chunks = [pending[i:i + PARSE_CHUNK] for i in range(0, len(pending), PARSE_CHUNK)]
+    with _executor(pool, workers) as executor:
+        return [result for batch in executor.map(_resolve_batch, chunks) for result in batch]
+
+
+def _sync_index(discovered: list, cache: BuildCache, graph_data: dict, graph_key: str) -> None:
+    """Bring the library index in line with this build (its export() then equals graph_data)."""
+    # Related lists change with other books too, so they are part of each book's digest
+    sources = {
+        book_id: (
+            book_digest(
+                [cache.previous_files(source) for source in [meta_file, *md_files]],
+                GRAPH_FORMAT,
+                [c["relatedChapters"] for c in book["chapters"]],
+            ),
+            [f"{book_id}/{md.name}" for md in md_files],
+        )
+        for (book_id, meta_file, md_files), book in zip(discovered, graph_data["books"])
+    }
+    with LibraryIndex() as index:
+        index.sync(
+            graph_data["books"],
+            sources,
+            graph_data["conceptGraph"],
+            graph_data["generated"],
+            graph_key,
+            graph_data["version"],
+        )
+
+
+def _build_graph(
+    cache: BuildCache | None,
+    changed_books: set[str] | None,
+    write: bool,
+    max_neighbors: int | None,
+    search: SearchIndex | None,
+    related: RelatedIndex | None,
+    output_format: str,
+    workers: int | None,
+    pool: str,
+) -> dict:
+    if cache is None:
+        cache = BuildCache.load()
+    cache.begin()
+    with BUILD_STAGE_SECONDS.time(stage="discovery"):
+        discovered = _discover()
+
+        # 1. Reuse every cached record whose files kept their mtime and size; queue the rest.
+        records: dict[Path, Any] = {}
+        pending = []
+        for book_id, meta_file, md_files in discovered:
+            verify = changed_books is None or book_id in changed_books
+            sources = [(meta_file, [meta_file])] + [(md, [md, _enriched_path(md)]) for md in md_files]
+            for source, paths in sources:
+                record = cache.lookup(source, paths, verify)
+                if record is None:
+                    pending.append((book_id, source, paths, cache.previous_files(source)))
+                else:
+                    records[source] = record
 
-        with open(meta_file) as f:
-            meta = yaml.safe_load(f) or {}
-
-        book_id = book_dir.name
-        chapters = []
-
-        md_files = sorted(book_dir.glob("ch*.md"), key=_chapter_sort_key)
-        for md_file in md_files:
-            post = frontmatter.load(md_file)
-            enriched = {}
-            enriched_file = md_file.parent / f"{md_file.stem}_enriched.json"
-            if enriched_file.exists():
-                with open(enriched_file) as f:
-                    enriched = json.load(f)
-
-            chapter_num = post.metadata.get("chapter", 0)
-            chapter_id = f"{book_id}-ch{chapter_num}"
-            raw_concepts = enriched.get("concepts", post.metadata.get("keyThemes", []))
-            concepts_normalized = [
-                c for c in (_normalize_concept(x) for x in raw_concepts if x)
-            ]
-            concepts_deduped = list(dict.fromkeys(c for c in concepts_normalized if c))
-
-            for concept in concepts_deduped:
-                concept_index.setdefault(concept, []).append(chapter_id)
-
-            chapters.append({
-                "id": chapter_id,
-                "bookId": book_id,
-                "chapter": chapter_num,
-                "title": post.metadata.get("title", md_file.stem),
-                "dateNoted": str(post.metadata.get("dateNoted", "")),
-                "keyThemes": post.metadata.get("keyThemes", []),
-                "rating": post.metadata.get("rating"),
-                "isEnriched": bool(enriched),
-                "summary": enriched.get("summary"),
-                "keyInsights": enriched.get("keyInsights", []),
-                "quotableIdeas": enriched.get("quotableIdeas", []),
-                "concepts": concepts_deduped,
-                "actionableItems": enriched.get("actionableItems", []),
-                "connectedIdeas": enriched.get("connectedIdeas", []),
-                "emotionalResonance": enriched.get("emotionalResonance"),
-                "rawNotes": post.content,
+    # 2. Hash and parse the queued files, in a worker pool for large batches.
+    with BUILD_STAGE_SECONDS.time(stage="parse"):
+        results = _resolve_pending(pending, workers or os.cpu_count() or 1, pool)
+        for (_, source, _, _), (files, record) in zip(pending, results):
+            records[source] = cache.store(source, files, record)
+        cache.prune()
+    BUILD_FILES.inc(len(records) - len(pending), result="reused")
+    BUILD_FILES.inc(len(pending), result="parsed")
+
+    # 3. Reduce in discovery order, so the output does not depend on scheduling.
+    with BUILD_STAGE_SECONDS.time(stage="merge"):
+        books = []
+        concept_index: dict[str, list[str]] = {}
+        for book_id, meta_file, md_files in discovered:
+            meta = records[meta_file]
+            chapters = [records[md] for md in md_files]
+            for chapter in chapters:
+                for concept in chapter["concepts"]:
+                    concept_index.setdefault(concept, []).append(chapter["id"])
+            books.append({
+                "id": book_id,
+                "title": meta.get("title", book_id),
+                "author": meta.get("author", "Unknown"),
+                "cover": meta.get("cover"),
+                "color": meta.get("color", "#8B949E"),
+                "rating": meta.get("rating"),
+                "status": meta.get("status", "reading"),
+                "tags": meta.get("tags", []),
+                "dateFinished": str(meta.get("dateFinished", "")),
+                "totalChapters": meta.get("totalChapters", len(chapters)),
+                "chapters": chapters,
             })
 
-        books.append({
-            "id": book_id,
-            "title": meta.get("title", book_id),
-            "author": meta.get("author", "Unknown"),
-            "cover": meta.get("cover"),
-            "color": meta.get("color", "#8B949E"),
-            "rating": meta.get("rating"),
-            "status": meta.get("status", "reading"),
-            "tags": meta.get("tags", []),
-            "dateFinished": str(meta.get("dateFinished", "")),
-            "totalChapters": meta.get("totalChapters", len(chapters)),
-            "chapters": chapters,
-        })
+    if related is None:
+        related = RelatedIndex.load()
+    with BUILD_STAGE_SECONDS.time(stage="related"):
+        # A delta (write=False, the server applying an edit) refreshes only the affected lists
+        related_changed = related.update((c for b in books for c in b["chapters"]), incremental=not write)
+        # Copies: the records themselves stay as cached
+        for book in books:
+            book["chapters"] = [{**c, "relatedChapters": related.related(c["id"])} for c in book["chapters"]]
+
+    # Same graph as the last build with this cache: it keeps its version (a touched file
+    # or a re-saved note claims none), and if graph-data.json is also up to date, the
+    # previous output and its timestamp are kept as-is.
+    output_key = f"{GRAPH_FORMAT}:{max_neighbors}:{output_format}"
+    same_graph = not cache.changed and not related_changed and cache.output_key == output_key
+    unchanged = same_graph and cache.generated is not None and OUTPUT_FILE.exists() and SKELETON_FILE.exists()
+    generated = cache.generated if unchanged else datetime.now(timezone.utc).isoformat()
+    version = cache.graph_version if same_graph and cache.graph_version else cache.next_graph_version()
+
+    with BUILD_STAGE_SECONDS.time(stage="concept_graph"):
+        concept_graph = _build_concept_graph(concept_index, max_neighbors)
 
     graph_data = {
-        "generated": datetime.now(timezone.utc).isoformat(),
+        "generated": generated,
+        "version": version,
         "stats": {
             "totalBooks": len(books),
             "totalChapters": sum(len(b["chapters"]) for b in books),
@@ -125,11 +436,63 @@ async def build_graph() -> dict:
             ),
         },
         "books": books,
-        "conceptGraph": _build_concept_graph(concept_index),
+        "conceptGraph": concept_graph,
     }
 
-    OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(OUTPUT_FILE, "w") as f:
-        json.dump(graph_data, f, indent=2)
+    if library_index.ENABLED:
+        with BUILD_STAGE_SECONDS.time(stage="library_index"):
+            _sync_index(discovered, cache, graph_data, output_key)
+
+    if search is None:
+        search = SearchIndex.load()
+    with BUILD_STAGE_SECONDS.time(stage="search_index"):
+        search.update(c for b in books for c in b["chapters"])
+
+    if unchanged or write:
+        if not unchanged:
+            write_graph(graph_data, output_format)
+        with BUILD_STAGE_SECONDS.time(stage="save_caches"):
+            search.save()
+            related.save()
+            cache.save(generated, output_key)
+    elif not same_graph:
+        # graph-data.json is now behind the sources; the caller persists it (and the cache,
+        # search index and related lists) later.
+        cache.generated = None
+        cache.output_key = output_key
 
     return graph_data
+
+
+async def build_graph(
+    cache: BuildCache | None = None,
+    changed_books: set[str] | None = None,
+    write: bool = True,
+    max_neighbors: int | None = MAX_NEIGHBORS,
+    search: SearchIndex | None = None,
+    related: RelatedIndex | None = None,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    workers: int | None = None,
+    pool: str = DEFAULT_POOL,
+) -> dict:
+    """
+    Build graph-data.json. Parsed meta.yaml / chapter records are reused from the
+    build cache when their source files are unchanged; pass BuildCache.disabled()
+    to force a full re-parse.
+
+    changed_books limits filesystem checks to those book ids (cached records of
+    other books are trusted as-is). write=False skips writing graph-data.json.
+    max_neighbors caps conceptGraph edges per chapter (None keeps all pairs).
+    output_format is one of OUTPUT_FORMATS.
+    The search index (loaded from disk if not given) is updated for changed chapters
+    and saved whenever graph-data.json is; so are the related-chapter lists, which
+    fill each chapter's relatedChapters (updated incrementally when write=False, in
+    full by a later written build). With READBRAIN_INDEX=1 the library index
+    is synced too.
+
+    Changed files are parsed by `workers` (default: CPU count) in a `pool` of
+    POOL_KINDS. The whole build runs in a worker thread, off the event loop.
+    """
+    return await asyncio.to_thread(
+        _build_graph, cache, changed_books, write, max_neighbors, search, related, output_format, workers, pool
+    )
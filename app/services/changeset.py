@@ -0,0 +1,73 @@
+"""
+Map changed files (from git, or any list of paths) to the books and chapter notes they
+affect, so enrichment and builds can cover one push instead of the whole library.
+"""
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+BOOKS_DIR = PROJECT_ROOT / "books"
+
+
+@dataclass
+class ChangeSet:
+    """Books to rebuild, and the chapter notes among them to check for enrichment."""
+
+    books: set[str] = field(default_factory=set)
+    chapters: set[Path] = field(default_factory=set)
+
+
+def from_paths(
+    paths: Iterable[str | Path], base: Path | None = None, books_dir: Path | None = None
+) -> ChangeSet:
+    """
+    Relative paths are taken from `base` (default: the current directory). A changed
+    meta.yaml puts every chapter of its book in the set (the title and author are part
+    of each chapter's prompt); deleted notes and _enriched.json files only mark their
+    book for a rebuild. Paths outside books_dir (default: BOOKS_DIR) are ignored.
+    """
+    base = base or Path.cwd()
+    books_dir = books_dir or BOOKS_DIR
+    root = books_dir.resolve()
+    changes = ChangeSet()
+    for raw in paths:
+        path = Path(raw)
+        try:
+            parts = (path if path.is_absolute() else base / path).resolve().relative_to(root).parts
+        except ValueError:
+            continue
+        if len(parts) != 2 or parts[0].startswith("_"):
+            continue
+        book, name = parts
+        book_dir = books_dir / book
+        changes.books.add(book)
+        if name == "meta.yaml":
+            changes.chapters.update(book_dir.glob("ch*.md"))
+        elif name.startswith("ch") and name.endswith(".md") and (book_dir / name).is_file():
+            changes.chapters.add(book_dir / name)
+    return changes
+
+
+def _git(cwd: Path, *args: str) -> str:
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ValueError(f"git {args[0]} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def changed_since(since: str, until: str | None = None, books_dir: Path | None = None) -> ChangeSet:
+    """
+    Files under books_dir that differ between the `since` and `until` revisions. Without
+    `until`, the working tree is compared instead, untracked files included.
+    """
+    books_dir = books_dir or BOOKS_DIR
+    top = Path(_git(books_dir, "rev-parse", "--show-toplevel").strip())
+    # --no-renames: a renamed note shows up as a deletion plus a new file
+    names = _git(
+        top, "diff", "--name-only", "-z", "--no-renames", since, *([until] if until else []), "--", str(books_dir)
+    ).split("\0")
+    if until is None:
+        names += _git(top, "ls-files", "-z", "--others", "--exclude-standard", "--", str(books_dir)).split("\0")
+    return from_paths([n for n in names if n], base=top, books_dir=books_dir)
@@ -0,0 +1,126 @@
+"""Serialization and compression for graph artifacts. orjson, msgpack and brotli are optional."""
+import gzip
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson")
+# Content-Encoding -> file suffix of the precompressed sidecar
+SIDECARS = {"br": ".br", "gzip": ".gz"}
+# Maximum effort (gzip 9, brotli 11) is only used for bodies up to this size; beyond
+# it, and for responses compressed on the fly, gzip 6 / brotli 5 are used. Brotli 11
+# is ~50x slower than 5 (49 s vs 0.8 s on a 12 MB graph) and gzip 9 ~9x slower than 6.
+MAX_EFFORT_BYTES = 1 << 20
+
+
+def dumps_json(data, pretty: bool = False) -> bytes:
+    """JSON bytes, via orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(data, indent=2).encode()
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def loads_json(body: bytes):
+    """Parse JSON bytes, via orjson when installed."""
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def dumps_msgpack(data) -> bytes | None:
+    """MessagePack bytes, or None if msgpack is not installed."""
+    return msgpack.packb(data) if msgpack is not None else None
+
+
+def available_encodings() -> list[str]:
+    """Content-Encodings we can produce, best first."""
+    return [e for e in SIDECARS if e != "br" or brotli is not None]
+
+
+def compress(body: bytes, encoding: str, fast: bool = False) -> bytes:
+    best = not fast and len(body) <= MAX_EFFORT_BYTES
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else 5)
+    return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+
+
+class StreamCompressor:
+    """gzip/br for a body sent in chunks; each chunk is flushed so the client can decode it at once."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=5)
+        else:
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def _parse_header(value: str | None) -> dict[str, float]:
+    """Header value like 'gzip, br;q=0.5' -> {token: q}."""
+    out = {}
+    for part in (value or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, val = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(val)
+                except ValueError:
+                    q = 0.0
+        out[token.strip().lower()] = q
+    return out
+
+
+def negotiate_encoding(accept_encoding: str | None, offered: list[str]) -> str | None:
+    """Preferred acceptable encoding among `offered` (in our order of preference), or None."""
+    accepted = _parse_header(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in offered:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def wants_msgpack(accept: str | None) -> bool:
+    """True if the Accept header prefers MessagePack and msgpack is installed."""
+    if msgpack is None:
+        return False
+    accepted = _parse_header(accept)
+    q_msgpack = max((accepted.get(t, 0.0) for t in MSGPACK_TYPES), default=0.0)
+    q_json = max(accepted.get("application/json", 0.0), accepted.get("*/*", 0.0))
+    return q_msgpack > 0 and q_msgpack >= q_json
+
+
+def wants_ndjson(accept: str | None) -> bool:
+    """True if the Accept header prefers newline-delimited JSON (a streamed response)."""
+    accepted = _parse_header(accept)
+    q_ndjson = max((accepted.get(t, 0.0) for t in NDJSON_TYPES), default=0.0)
+    q_json = max(accepted.get("application/json", 0.0), accepted.get("*/*", 0.0))
+    return q_ndjson > 0 and q_ndjson >= q_json
@@ -1,16 +1,50 @@
 """OpenAI enrichment for chapter notes. Writes _enriched.json sibling files."""
+import asyncio
+import hashlib
 import json
 import os
 import re
+import time
 from pathlib import Path
+from typing import Callable, Iterable
 import frontmatter
 import yaml
-from openai import AsyncOpenAI
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
 from datetime import datetime, timezone
 
+from app.services import library_index
+from app.services.enrich_cache import ResponseCache
+from app.services.metrics import (
+    ENRICH_API_SECONDS,
+    ENRICH_CHAPTERS,
+    ENRICH_QUEUE_SECONDS,
+    ENRICH_RETRIES,
+    ENRICH_TOKENS,
+)
+from app.services.tokens import Budget, count_tokens, truncate_tokens
+from app.services.ratelimit import (
+    DEFAULT_RPM,
+    DEFAULT_TPM,
+    MAX_RETRIES,
+    RateLimiter,
+    backoff_delay,
+)
+
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 BOOKS_DIR = PROJECT_ROOT / "books"
 
+MODEL = "gpt-4o-mini"
+DEFAULT_CONCURRENCY = 4
+# Notes are cut to this many tokens before prompting (READBRAIN_NOTE_TOKENS or --note-tokens).
+NOTE_TOKEN_LIMIT = int(os.getenv("READBRAIN_NOTE_TOKENS", "1000"))
+# Completion tokens assumed per call when budgeting (rate limits, --max-cost / --max-tokens).
+COMPLETION_TOKEN_ESTIMATE = 600
+# Order in which pending chapters are enriched, which decides what a capped budget covers:
+# "stale" = never enriched first, then the longest since last enriched; "largest" = biggest prompt first.
+ORDERS = ("stale", "largest")
+# USD per 1M tokens (input, output)
+PRICING = {"gpt-4o-mini": (0.15, 0.60)}
+
 
 def _chapter_sort_key(md_file: Path) -> tuple:
     """Sort key: numeric chapter number from filename (ch1, ch2, ch10, ...)."""
@@ -24,13 +58,12 @@ Notes may be rough or personal — interpret them charitably.
 Return ONLY valid JSON. No markdown, no code blocks, no explanation."""
 
 
-async def _call_openai(client, title, author, chapter_num, chapter_title, content) -> dict:
-    user_prompt = f"""Book: "{title}" by {author}
+USER_PROMPT = """Book: "{title}" by {author}
 Chapter {chapter_num}: "{chapter_title}"
 
 Raw notes:
 ---
-{content[:4000]}
+{content}
 ---
 
 Extract as JSON:
@@ -44,24 +77,108 @@ Extract as JSON:
   "emotionalResonance": "one sentence on why this chapter matters"
 }}"""
 
-    response = await client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
+
+def _cost(prompt_tokens: int, completion_tokens: int = COMPLETION_TOKEN_ESTIMATE) -> float:
+    """USD for a call; with the default completion size this is the pre-flight estimate."""
+    price_in, price_out = PRICING[MODEL]
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+def _build_prompt(
+    title, author, chapter_num, chapter_title, content, note_tokens: int = NOTE_TOKEN_LIMIT
+) -> tuple[str, str]:
+    """Return (user_prompt, input_hash). The hash covers every input that shapes the response."""
+    content = truncate_tokens(content, note_tokens)
+    user_prompt = USER_PROMPT.format(
+        title=title,
+        author=author,
+        chapter_num=chapter_num,
+        chapter_title=chapter_title,
+        content=content,
+    )
+    inputs = {
+        "model": MODEL,
+        "system": SYSTEM_PROMPT,
+        "template": USER_PROMPT,
+        "title": title,
+        "author": author,
+        "chapter": chapter_num,
+        "chapterTitle": chapter_title,
+        "content": content,
+    }
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+    return user_prompt, digest
+
+
+def _request_body(user_prompt: str) -> dict:
+    """Chat completion request parameters, shared by direct calls and batch files."""
+    return {
+        "model": MODEL,
+        "messages": [
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt},
         ],
-        response_format={"type": "json_object"},
-        temperature=0.3,
-    )
+        "response_format": {"type": "json_object"},
+        "temperature": 0.3,
+    }
+
 
-    result = json.loads(response.choices[0].message.content)
+def _to_record(content: str, usage: dict | None = None) -> dict:
+    """Turn a model response message (and its token usage, if known) into an enrichment record."""
+    result = json.loads(content)
     result["enrichedAt"] = datetime.now(timezone.utc).isoformat()
-    result["model"] = "gpt-4o-mini"
+    result["model"] = MODEL
+    if usage:
+        result["usage"] = {
+            "promptTokens": usage["prompt_tokens"],
+            "completionTokens": usage["completion_tokens"],
+        }
     return result
 
 
+_ERROR_OUTCOMES = {RateLimitError: "rate_limited", InternalServerError: "server_error", APIConnectionError: "connection_error"}
+
+
+async def _call_openai(client, limiter, user_prompt, tokens: int, queued_at: float | None = None) -> dict:
+    """
+    `tokens` is the call's estimated size for the rate limiter. queued_at (perf_counter)
+    is when the chapter started waiting, for the queue-wait metric.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.acquire(tokens)
+        if attempt == 0 and queued_at is not None:
+            ENRICH_QUEUE_SECONDS.observe(time.perf_counter() - queued_at)
+        start = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(**_request_body(user_prompt))
+            ENRICH_API_SECONDS.observe(time.perf_counter() - start, outcome="ok")
+            break
+        except (RateLimitError, InternalServerError, APIConnectionError) as e:
+            outcome = next(o for cls, o in _ERROR_OUTCOMES.items() if isinstance(e, cls))
+            ENRICH_API_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+            if attempt == MAX_RETRIES:
+                raise
+            ENRICH_RETRIES.inc(reason=outcome)
+            delay = backoff_delay(attempt, e)
+            if isinstance(e, RateLimitError):
+                # Everyone waits, not just this worker
+                limiter.pause(delay)
+            await asyncio.sleep(delay)
+
+    usage = response.usage.model_dump() if response.usage else None
+    if usage:
+        ENRICH_TOKENS.inc(usage["prompt_tokens"], direction="prompt")
+        ENRICH_TOKENS.inc(usage["completion_tokens"], direction="completion")
+    return _to_record(response.choices[0].message.content, usage)
+
+
 def _resolve_chapter_file(chapter_id: str) -> Path | None:
     """Resolve chapter_id (e.g. 'atomic-habits-ch1') to the corresponding .md file."""
+    if library_index.ENABLED:
+        rel = library_index.reader().chapter_path(chapter_id)
+        if rel and (BOOKS_DIR / rel).exists():
+            return BOOKS_DIR / rel
+        # Not built yet (or moved since): fall back to the file name
     m = re.match(r"^(.+)-ch(\d+)$", chapter_id, re.I)
     if not m:
         return None
@@ -78,69 +195,336 @@ def _resolve_chapter_file(chapter_id: str) -> Path | None:
     return None
 
 
-async def enrich_new_chapters(force: bool = False, chapter_id: str | None = None) -> dict:
-    results = {"enriched": 0, "skipped": 0, "failed": 0, "cost_estimate": 0.0}
+def _prepare_item(md_file: Path, meta: dict, note_tokens: int = NOTE_TOKEN_LIMIT) -> dict:
+    """Read a chapter and build its prompt, input hash and prompt size."""
+    post = frontmatter.load(md_file)
+    content = post.content.strip()
+    if not content:
+        content = f"[No notes yet. Chapter: {post.metadata.get('title', md_file.stem)}]"
+    prompt, input_hash = _build_prompt(
+        title=meta.get("title", md_file.parent.name),
+        author=meta.get("author", "Unknown"),
+        chapter_num=post.metadata.get("chapter", "?"),
+        chapter_title=post.metadata.get("title", md_file.stem),
+        content=content,
+        note_tokens=note_tokens,
+    )
+    return {
+        "md_file": md_file,
+        "enriched_file": md_file.parent / f"{md_file.stem}_enriched.json",
+        "prompt": prompt,
+        "input_hash": input_hash,
+        "prompt_tokens": count_tokens(SYSTEM_PROMPT, prompt),
+    }
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("⚠️  OPENAI_API_KEY not set — skipping enrichment")
-        return results
 
-    client = AsyncOpenAI(api_key=api_key)
+def _chapter_name(item: dict) -> str:
+    return f"{item['md_file'].parent.name}/{item['md_file'].name}"
+
+
+def _stale_reason(item: dict) -> str | None:
+    """Why this chapter needs enrichment, or None if its _enriched.json is current."""
+    enriched_file = item["enriched_file"]
+    if not enriched_file.exists():
+        return "new"
+    try:
+        with open(enriched_file) as f:
+            enriched = json.load(f)
+    except (OSError, ValueError):
+        return "unreadable"
+    stored_hash = enriched.get("inputHash")
+    item["enriched_at"] = enriched.get("enrichedAt")
+    item["completion_tokens"] = (enriched.get("usage") or {}).get("completionTokens")
+    if not stored_hash:
+        # Enriched before input hashes were recorded: there is nothing to compare the note
+        # with, so the enrichment counts as current and a run records the hash it has now
+        # (see _adopt_input_hashes); only edits after that re-enrich it
+        item["unhashed"] = True
+        return None
+    return None if stored_hash == item["input_hash"] else "changed"
+
+
+def _adopt_input_hashes(items: list[dict]) -> None:
+    """Stamp _enriched.json files written before input hashes were recorded with their current hash."""
+    for item in items:
+        with open(item["enriched_file"]) as f:
+            enriched = json.load(f)
+        enriched["inputHash"] = item["input_hash"]
+        with open(item["enriched_file"], "w") as f:
+            json.dump(enriched, f, indent=2)
+
+
+def _try_prepare(md_file: Path, meta: dict, note_tokens: int, failed: list[dict]) -> dict | None:
+    """_prepare_item(), or None (and an entry in `failed`) if the note cannot be read."""
+    try:
+        return _prepare_item(md_file, meta, note_tokens)
+    except Exception as e:
+        print(f"  ⚠️  Failed {md_file.name}: {e}")
+        failed.append({"md_file": md_file, "error": str(e)})
+        return None
 
-    items_to_process: list[tuple[Path, dict]] = []
 
+def _plan(
+    force: bool,
+    chapter_id: str | None,
+    note_tokens: int = NOTE_TOKEN_LIMIT,
+    chapter_files: Iterable[Path] | None = None,
+) -> tuple[list[dict], list[dict], list[dict]] | None:
+    """
+    Return (items to enrich, items already current, notes that could not be read, as
+    {md_file, error}), or None if chapter_id was not found. chapter_files limits the
+    plan to those notes (only their books are read).
+    """
+    failed: list[dict] = []
     if chapter_id:
         md_file = _resolve_chapter_file(chapter_id)
         if not md_file:
-            print(f"⚠️  Chapter not found: {chapter_id}")
-            return results
-        book_dir = md_file.parent
-        with open(book_dir / "meta.yaml") as f:
+            return None
+        with open(md_file.parent / "meta.yaml") as f:
             meta = yaml.safe_load(f) or {}
-        items_to_process = [(md_file, meta)]
-    else:
-        for book_dir in sorted(BOOKS_DIR.iterdir()):
-            if not book_dir.is_dir() or book_dir.name.startswith("_"):
+        item = _try_prepare(md_file, meta, note_tokens, failed)
+        if item is None:
+            return [], [], failed
+        item["reason"] = "requested"
+        return [item], [], failed
+
+    only = None if chapter_files is None else set(chapter_files)
+    book_dirs = BOOKS_DIR.iterdir() if only is None else {md_file.parent for md_file in only}
+    items, current = [], []
+    for book_dir in sorted(book_dirs):
+        if not book_dir.is_dir() or book_dir.name.startswith("_"):
+            continue
+        meta_file = book_dir / "meta.yaml"
+        if not meta_file.exists():
+            continue
+        with open(meta_file) as f:
+            meta = yaml.safe_load(f) or {}
+        for md_file in sorted(book_dir.glob("ch*.md"), key=_chapter_sort_key):
+            if only is not None and md_file not in only:
                 continue
-            meta_file = book_dir / "meta.yaml"
-            if not meta_file.exists():
+            item = _try_prepare(md_file, meta, note_tokens, failed)
+            if item is None:
                 continue
-            with open(meta_file) as f:
-                meta = yaml.safe_load(f) or {}
-            for md_file in sorted(book_dir.glob("ch*.md"), key=_chapter_sort_key):
-                enriched_file = md_file.parent / f"{md_file.stem}_enriched.json"
-                if enriched_file.exists() and not force:
-                    results["skipped"] += 1
-                    continue
-                items_to_process.append((md_file, meta))
-
-    for md_file, meta in items_to_process:
-        enriched_file = md_file.parent / f"{md_file.stem}_enriched.json"
-        try:
-            post = frontmatter.load(md_file)
-            content = post.content.strip()
-            if not content:
-                content = f"[No notes yet. Chapter: {post.metadata.get('title', md_file.stem)}]"
-
-            enriched = await _call_openai(
-                client=client,
-                title=meta.get("title", md_file.parent.name),
-                author=meta.get("author", "Unknown"),
-                chapter_num=post.metadata.get("chapter", "?"),
-                chapter_title=post.metadata.get("title", md_file.stem),
-                content=content,
-            )
-
-            with open(enriched_file, "w") as f:
-                json.dump(enriched, f, indent=2)
-
-            results["enriched"] += 1
-            results["cost_estimate"] += 0.002
-            print(f"  ✅ Enriched: {md_file.parent.name}/{md_file.name}")
-
-        except Exception as e:
-            print(f"  ⚠️  Failed {md_file.name}: {e}")
-            results["failed"] += 1
+            item["reason"] = "forced" if force else _stale_reason(item)
+            if force:
+                _stale_reason(item)  # for enriched_at, used by order="stale"
+            if item["reason"] is None:
+                current.append(item)
+                continue
+            items.append(item)
+    return items, current, failed
+
+
+def _prioritize(items: list[dict], order: str) -> list[dict]:
+    if order == "largest":
+        return sorted(items, key=lambda item: -item["prompt_tokens"])
+    # Never enriched (or unreadable) first, then oldest enrichment; larger prompts break ties
+    return sorted(items, key=lambda item: (
+        item.get("enriched_at") is not None, item.get("enriched_at") or "", -item["prompt_tokens"]
+    ))
+
+
+def _completion_estimate(items: list[dict]) -> int:
+    """Mean completion size recorded in existing _enriched.json files, else COMPLETION_TOKEN_ESTIMATE."""
+    known = [item["completion_tokens"] for item in items if item.get("completion_tokens")]
+    return -(-sum(known) // len(known)) if known else COMPLETION_TOKEN_ESTIMATE
+
+
+def _budget_plan(
+    items: list[dict], cache: ResponseCache, force: bool, budget: Budget, completion_tokens: int
+) -> None:
+    """
+    Mark each item (in priority order) with `cached`, its estimated `tokens` / `cost`,
+    and `deferred` from the first API call that would exceed `budget` on. Cached chapters are free.
+    """
+    over = False
+    for item in items:
+        item["cached"] = not force and cache.get(item["input_hash"]) is not None
+        item["tokens"] = 0 if item["cached"] else item["prompt_tokens"] + completion_tokens
+        item["cost"] = 0.0 if item["cached"] else _cost(item["prompt_tokens"], completion_tokens)
+        if not item["cached"]:
+            over = over or not budget.reserve(item["tokens"], item["cost"])
+        item["deferred"] = over and not item["cached"]
+
+
+def find_stale_chapters(
+    force: bool = False,
+    chapter_id: str | None = None,
+    order: str = "stale",
+    max_cost: float | None = None,
+    max_tokens: int | None = None,
+    note_tokens: int = NOTE_TOKEN_LIMIT,
+    chapter_files: Iterable[Path] | None = None,
+) -> list[dict]:
+    """
+    List chapters a run would (re-)enrich, in the order it would enrich them, without
+    calling the API. Chapters whose inputs are already in the response cache cost
+    nothing; chapters beyond max_cost / max_tokens are marked deferred. chapter_files
+    limits the run to those notes (see changeset.ChangeSet).
+    """
+    planned = _plan(force, chapter_id, note_tokens, chapter_files)
+    if planned is None:
+        return []
+    items = _prioritize(planned[0], order)
+    cache = ResponseCache()
+    try:
+        completion_tokens = _completion_estimate(planned[0] + planned[1])
+        _budget_plan(items, cache, force, Budget(max_cost, max_tokens), completion_tokens)
+    finally:
+        cache.close()
+    return [
+        {
+            "chapter": _chapter_name(item),
+            "reason": item["reason"],
+            "cached": item["cached"],
+            "deferred": item["deferred"],
+            "promptTokens": item["prompt_tokens"],
+            "cost_estimate": item["cost"],
+        }
+        for item in items
+    ]
+
+
+async def enrich_new_chapters(
+    force: bool = False,
+    chapter_id: str | None = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rpm: int | None = DEFAULT_RPM,
+    tpm: int | None = DEFAULT_TPM,
+    on_progress: Callable[[str, dict], None] | None = None,
+    order: str = "stale",
+    max_cost: float | None = None,
+    max_tokens: int | None = None,
+    note_tokens: int = NOTE_TOKEN_LIMIT,
+    chapter_files: Iterable[Path] | None = None,
+) -> dict:
+    """
+    Enrich chapters whose prompt inputs changed since their last enrichment (all
+    chapters with force=True), among chapter_files if given (see changeset.ChangeSet).
+    Responses for previously seen inputs are served from the local response cache
+    unless force is set.
+
+    Up to `concurrency` calls are in flight, admitted by a requests/tokens-per-minute
+    limiter, and each result is written as soon as it arrives.
+    Set OPENAI_BASE_URL to point at a local OpenAI-compatible server.
+
+    Chapters are enriched in `order` (see ORDERS). With max_cost (USD) and/or
+    max_tokens, the run covers chapters in that order while their estimated cost
+    fits, and stops starting calls once actual spend plus the next estimate would
+    exceed the cap; the rest are counted as deferred. Token counts and cost in the
+    results come from the API's reported usage.
+
+    on_progress, if given, is called with ("planned", {...}) once the work is known
+    and ("chapter", {...}) as each chapter finishes.
+    """
+    results = {
+        "enriched": 0, "cached": 0, "skipped": 0, "failed": 0, "deferred": 0,
+        "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0,
+    }
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("⚠️  OPENAI_API_KEY not set — skipping enrichment")
+        return results
+
+    planned = _plan(force, chapter_id, note_tokens, chapter_files)
+    if planned is None:
+        print(f"⚠️  Chapter not found: {chapter_id}")
+        return results
+    pending, current, failed = planned
+    results["skipped"] = len(current)
+    results["failed"] = len(failed)
+    _adopt_input_hashes([item for item in current if item.get("unhashed")])
+
+    cache = ResponseCache()
+    pending = _prioritize(pending, order)
+    _budget_plan(pending, cache, force, Budget(max_cost, max_tokens), _completion_estimate(pending + current))
+    items_to_process = [item for item in pending if not item["deferred"]]
+    results["deferred"] = len(pending) - len(items_to_process)
+    if results["deferred"]:
+        print(f"  ⏸️  Budget covers {len(items_to_process)} of {len(pending)} chapters; deferring the rest")
+    if on_progress:
+        on_progress("planned", {
+            "chapters": [_chapter_name(item) for item in items_to_process + failed],
+            "skipped": len(current),
+            "deferred": results["deferred"],
+        })
+    for item in failed:
+        ENRICH_CHAPTERS.inc(result="failed")
+        if on_progress:
+            on_progress("chapter", {
+                "chapter": _chapter_name(item),
+                "bookId": item["md_file"].parent.name,
+                "status": "failed",
+                "error": item["error"],
+                "cost": 0.0,
+            })
+
+    # Retries are handled here (shared backoff across workers), not per request by the SDK
+    client = AsyncOpenAI(api_key=api_key, max_retries=0)
+    limiter = RateLimiter(rpm=rpm, tpm=tpm)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    # Planned against estimates; enforced here against actual usage as calls complete
+    budget = Budget(max_cost, max_tokens)
+
+    async def enrich_one(item: dict) -> None:
+        name = _chapter_name(item)
+        queued_at = time.perf_counter()
+        async with semaphore:
+            error = None
+            reserved = (item["tokens"], item["cost"])
+            try:
+                enriched = None if force else cache.get(item["input_hash"])
+                if enriched is None and not budget.reserve(*reserved):
+                    status = "deferred"
+                    results["deferred"] += 1
+                    print(f"  ⏸️  Over budget, deferred: {name}")
+                elif enriched is None:
+                    try:
+                        enriched = await _call_openai(
+                            client, limiter, item["prompt"], item["tokens"], queued_at
+                        )
+                    except Exception:
+                        budget.settle(reserved, (0, 0.0))
+                        raise
+                    usage = enriched.get("usage") or {
+                        "promptTokens": item["prompt_tokens"], "completionTokens": COMPLETION_TOKEN_ESTIMATE,
+                    }
+                    cost = _cost(usage["promptTokens"], usage["completionTokens"])
+                    budget.settle(reserved, (usage["promptTokens"] + usage["completionTokens"], cost))
+                    results["prompt_tokens"] += usage["promptTokens"]
+                    results["completion_tokens"] += usage["completionTokens"]
+                    results["cost"] += cost
+                    enriched["inputHash"] = item["input_hash"]
+                    cache.put(item["input_hash"], enriched)
+                    status = "enriched"
+                    results["enriched"] += 1
+                    print(f"  ✅ Enriched: {name} ({usage['promptTokens']}+{usage['completionTokens']} tokens)")
+                else:
+                    status = "cached"
+                    results["cached"] += 1
+                    print(f"  ♻️  From cache: {name}")
+
+                if enriched is not None:
+                    with open(item["enriched_file"], "w") as f:
+                        json.dump(enriched, f, indent=2)
+
+            except Exception as e:
+                print(f"  ⚠️  Failed {item['md_file'].name}: {e}")
+                status, error = "failed", str(e)
+                results["failed"] += 1
+            ENRICH_CHAPTERS.inc(result=status)
+            if on_progress:
+                on_progress("chapter", {
+                    "chapter": name,
+                    "bookId": item["md_file"].parent.name,
+                    "status": status,
+                    "error": error,
+                    "cost": results["cost"],
+                })
 
+    try:
+        await asyncio.gather(*(enrich_one(item) for item in items_to_process))
+    finally:
+        cache.close()
     return results
@@ -0,0 +1,46 @@
+"""Local SQLite cache of enrichment responses, keyed by the hash of the exact prompt inputs."""
+import json
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+CACHE_FILE = PROJECT_ROOT / ".readbrain" / "enrich-cache.sqlite"
+
+
+class ResponseCache:
+    """Identical inputs (e.g. a renamed or moved note) are served without an API call."""
+
+    def __init__(self, path: Path | None = None):
+        path = path or CACHE_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " input_hash TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " record TEXT NOT NULL,"
+            " created_at TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, input_hash: str) -> dict | None:
+        row = self._conn.execute(
+            "SELECT record FROM responses WHERE input_hash = ?", (input_hash,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, input_hash: str, record: dict) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (input_hash, model, record, created_at) VALUES (?, ?, ?, ?)",
+            (
+                input_hash,
+                record.get("model", ""),
+                json.dumps(record),
+                datetime.now(timezone.utc).isoformat(),
+            ),
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,145 @@
+"""
+Static site export (GitHub Pages and other static hosts). Writes index.html, the site
+assets under content-hashed names, and the graph as a small manifest plus one
+content-hashed shard per book, so everything but index.html, the manifest and the
+chapter detail files can be cached as immutable.
+
+    out/index.html                     references the hashed assets and the manifest
+    out/static/main.<hash>.js          site/src, imports rewritten to the hashed names
+    out/data/manifest.json             generated, stats and the shard names
+    out/data/books/<book>.<hash>.json  book record with its skeleton chapters
+    out/data/search/<book>.<hash>.json the book's searchable chapter text
+    out/data/concepts.<hash>.json      conceptGraph
+    out/data/chapters/<id>.json        full chapter records, fetched when opened
+"""
+import hashlib
+import re
+from pathlib import Path
+
+from app.services.build_graph import DETAIL_FIELDS
+from app.services.encoding import dumps_json
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+SITE_DIR = PROJECT_ROOT / "site"
+EXPORT_DIR = PROJECT_ROOT / "dist"
+
+MANIFEST_VERSION = 1
+# Hex digits of the content hash in file names
+HASH_CHARS = 12
+# Chapter fields the static site searches (see site/src/search.js)
+SEARCH_FIELDS = ("id", "bookId", "title", "keyThemes", "concepts", "summary", "rawNotes")
+# Subdirectories of the export that are rewritten (and pruned) as a whole
+OWNED_DIRS = ("static", "data")
+
+
+def _hashed(name: str, body: bytes) -> str:
+    stem, dot, suffix = name.rpartition(".")
+    digest = hashlib.sha256(body).hexdigest()[:HASH_CHARS]
+    return f"{stem}.{digest}.{suffix}" if dot else f"{name}.{digest}"
+
+
+def _assets(src_dir: Path) -> tuple[dict[str, bytes], dict[str, str]]:
+    """
+    site/src's scripts and stylesheets under hashed names, and the name map. A module's
+    relative imports ("./x.js") are rewritten first, so its hash covers its imports'.
+    """
+    sources = {p.name: p.read_bytes() for p in sorted(src_dir.iterdir()) if p.suffix in (".js", ".css")}
+    imports = {
+        name: [other for other in sources if other != name and re.search(rf"""["']\./{re.escape(other)}["']""".encode(), body)]
+        for name, body in sources.items()
+    }
+    files, names = {}, {}
+    while len(names) < len(sources):
+        ready = [n for n in sources if n not in names and all(i in names for i in imports[n])]
+        if not ready:
+            raise ValueError(f"Circular imports between {', '.join(n for n in sources if n not in names)}")
+        for name in ready:
+            body = sources[name]
+            for other in imports[name]:
+                body = re.sub(
+                    rf"""(["'])\./{re.escape(other)}\1""".encode(),
+                    lambda m, other=other: m.group(1) + f"./{names[other]}".encode() + m.group(1),
+                    body,
+                )
+            names[name] = _hashed(name, body)
+            files[names[name]] = body
+    return files, names
+
+
+def _index_html(html: str, names: dict[str, str]) -> str:
+    """index.html pointing at the hashed assets and, through a meta tag, at the manifest."""
+    html = re.sub(
+        r'(src|href)="static/([^"]+)"',
+        lambda m: f'{m.group(1)}="static/{names.get(m.group(2), m.group(2))}"',
+        html,
+    )
+    meta = '  <meta name="readbrain-manifest" content="data/manifest.json">\n'
+    return html.replace("</head>", meta + "</head>", 1)
+
+
+def export_files(graph_data: dict, site_dir: Path = SITE_DIR) -> dict[str, bytes]:
+    """Every file of the export, by path relative to the export directory."""
+    assets, names = _assets(site_dir / "src")
+    files = {f"static/{name}": body for name, body in assets.items()}
+    files["index.html"] = _index_html((site_dir / "index.html").read_text(), names).encode()
+
+    def shard(directory: str, name: str, data) -> str:
+        body = dumps_json(data)
+        path = f"{directory}/{_hashed(name + '.json', body)}"
+        files[f"data/{path}"] = body
+        return path
+
+    books = []
+    for book in graph_data["books"]:
+        chapters = book["chapters"]
+        for chapter in chapters:
+            files[f"data/chapters/{chapter['id']}.json"] = dumps_json(chapter)
+        skeleton = [{k: v for k, v in c.items() if k not in DETAIL_FIELDS} for c in chapters]
+        books.append({
+            "id": book["id"],
+            "shard": shard("books", book["id"], {**book, "chapters": skeleton}),
+            "search": shard("search", book["id"], [{k: c.get(k) for k in SEARCH_FIELDS} for c in chapters]),
+        })
+    concepts = dumps_json(graph_data["conceptGraph"])
+    files[f"data/{_hashed('concepts.json', concepts)}"] = concepts
+    files["data/manifest.json"] = dumps_json({
+        "version": MANIFEST_VERSION,
+        "generated": graph_data["generated"],
+        "graphVersion": graph_data.get("version", 0),
+        "stats": graph_data["stats"],
+        "conceptGraph": _hashed("concepts.json", concepts),
+        "books": books,
+        "chapters": "chapters/",
+    })
+    return files
+
+
+def export_site(graph_data: dict, out_dir: Path = EXPORT_DIR, site_dir: Path = SITE_DIR) -> dict[str, int]:
+    """
+    Write the export to out_dir. Files whose content is unchanged are left alone and
+    files of an earlier export that are no longer part of it are removed (only under
+    OWNED_DIRS). Returns counts of files written, unchanged and removed.
+    """
+    files = export_files(graph_data, site_dir)
+    counts = {"written": 0, "unchanged": 0, "removed": 0}
+    for rel, body in files.items():
+        path = out_dir / rel
+        try:
+            if path.read_bytes() == body:
+                counts["unchanged"] += 1
+                continue
+        except OSError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(body)
+        tmp.replace(path)
+        counts["written"] += 1
+    for owned in OWNED_DIRS:
+        for path in sorted((out_dir / owned).rglob("*"), reverse=True):
+            rel = path.relative_to(out_dir).as_posix()
+            if path.is_file() and rel not in files:
+                path.unlink()
+                counts["removed"] += 1
+            elif path.is_dir() and not any(path.iterdir()):
+                path.rmdir()
+    return counts
@@ -0,0 +1,367 @@
+"""In-memory graph snapshot served by the API. Rebuilt on demand or when /books changes."""
+import asyncio
+import contextlib
+import hashlib
+import os
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+
+from app.services.build_cache import BuildCache
+from app.services.build_graph import BOOKS_DIR, build_graph, read_graph, skeleton_graph, write_graph
+from app.services.encoding import compress, dumps_json, dumps_msgpack
+from app.services.events import EventBroker
+from app.services.metrics import GRAPH_REBUILDS
+from app.services.neighbors import AdjacencyIndex
+from app.services.related import RelatedIndex
+from app.services.search_index import SearchIndex
+
+# How often GET /api/graph may stat the books tree to detect out-of-band edits
+# (only used when the filesystem watcher is not running).
+STALE_CHECK_INTERVAL = 2.0
+# Delay before an incrementally updated graph is written back to graph-data.json.
+PERSIST_DELAY = 1.0
+
+
+@dataclass(frozen=True)
+class GraphSnapshot:
+    """A built graph plus its lazily serialized body and ETag. Treat `data` as read-only."""
+
+    data: dict
+    version: int = 0
+    _encoded: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @cached_property
+    def body(self) -> bytes:
+        return dumps_json(self.data)
+
+    @cached_property
+    def etag(self) -> str:
+        return f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+    def encoded(self, fmt: str = "json", encoding: str | None = None) -> bytes:
+        """Body as "json" or "msgpack", compressed with `encoding` if given. Each variant is built once."""
+        key = (fmt, encoding)
+        if key not in self._encoded:
+            body = self.body if fmt == "json" else dumps_msgpack(self.data)
+            self._encoded[key] = compress(body, encoding, fast=True) if encoding else body
+        return self._encoded[key]
+
+    def variant_etag(self, fmt: str = "json", encoding: str | None = None) -> str:
+        """Strong ETag for the plain JSON body; other variants share it as a weak ETag."""
+        return self.etag if fmt == "json" and encoding is None else f"W/{self.etag}"
+
+    @cached_property
+    def skeleton(self) -> "GraphSnapshot":
+        """Same graph without chapter detail fields (see build_graph.DETAIL_FIELDS)."""
+        return GraphSnapshot(data=skeleton_graph(self.data), version=self.version)
+
+    @cached_property
+    def chapters(self) -> dict[str, dict]:
+        """Full chapter records by id."""
+        return {c["id"]: c for b in self.data["books"] for c in b["chapters"]}
+
+    @cached_property
+    def adjacency(self) -> AdjacencyIndex:
+        """Neighbourhood index over the concept graph, built on the first query."""
+        return AdjacencyIndex(self.data)
+
+    def stream_etag(self, view: str) -> str:
+        """
+        Weak ETag of a streamed response. Derived from the version and build time, since
+        the streamed body is never held in full to be hashed.
+        """
+        key = f"{self.version}:{self.data['generated']}:{view}"
+        return f'W/"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+    def matches(self, if_none_match: str | None, etag: str | None = None) -> bool:
+        """True if an If-None-Match header value covers `etag` (default: this snapshot's ETag)."""
+        if not if_none_match:
+            return False
+        etag = (etag or self.etag).removeprefix("W/")
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+def source_signature() -> str:
+    """Cheap fingerprint of every file build_graph reads (names, mtimes and sizes only)."""
+    h = hashlib.sha1()
+    for book in sorted(os.scandir(BOOKS_DIR), key=lambda e: e.name):
+        if not book.is_dir() or book.name.startswith("_"):
+            continue
+        for entry in sorted(os.scandir(book.path), key=lambda e: e.name):
+            if entry.name == "meta.yaml" or entry.name.startswith("ch"):
+                st = entry.stat()
+                h.update(f"{book.name}/{entry.name}:{st.st_mtime_ns}:{st.st_size};".encode())
+    return h.hexdigest()
+
+
+def _book_meta(book: dict) -> dict:
+    return {k: v for k, v in book.items() if k != "chapters"}
+
+
+def graph_delta(old: dict, new: dict) -> dict:
+    """Chapter- and book-level difference between two graph dicts, as sent to SSE clients."""
+    old_chapters = {c["id"]: c for b in old["books"] for c in b["chapters"]}
+    new_chapters = {c["id"]: c for b in new["books"] for c in b["chapters"]}
+    old_books = {b["id"]: b for b in old["books"]}
+    new_book_ids = [b["id"] for b in new["books"]]
+
+    upserted_books = []
+    for book in new["books"]:
+        chapter_ids = [c["id"] for c in book["chapters"]]
+        prev = old_books.get(book["id"])
+        if (
+            prev is None
+            or _book_meta(prev) != _book_meta(book)
+            or [c["id"] for c in prev["chapters"]] != chapter_ids
+        ):
+            upserted_books.append({**_book_meta(book), "chapterIds": chapter_ids})
+
+    delta = {
+        "generated": new["generated"],
+        "stats": new["stats"],
+        "bookIds": new_book_ids,
+        "books": {
+            "upserted": upserted_books,
+            "removed": [b for b in old_books if b not in set(new_book_ids)],
+        },
+        "chapters": {
+            "upserted": [c for cid, c in new_chapters.items() if old_chapters.get(cid) != c],
+            "removed": [cid for cid in old_chapters if cid not in new_chapters],
+        },
+    }
+    if old["conceptGraph"] != new["conceptGraph"]:
+        delta["conceptGraph"] = new["conceptGraph"]
+    return delta
+
+
+def _is_empty(delta: dict) -> bool:
+    return not (
+        delta["books"]["upserted"] or delta["books"]["removed"]
+        or delta["chapters"]["upserted"] or delta["chapters"]["removed"]
+        or "conceptGraph" in delta
+    )
+
+
+class GraphStore:
+    """
+    Holds the current GraphSnapshot. Builds reuse one in-memory BuildCache and run one
+    at a time: a request made while a build is in flight waits for the single trailing
+    build that starts once it finishes (covering every book asked for meanwhile), so a
+    burst of requests runs at most two builds. Every change is published to `events`
+    as a delta.
+
+    At startup the snapshot can be the last graph-data.json written (load_persisted()),
+    served while the first build reconciles it with /books.
+    """
+
+    def __init__(
+        self,
+        cache: BuildCache | None = None,
+        search: SearchIndex | None = None,
+        related: RelatedIndex | None = None,
+    ):
+        """cache/search/related default to the on-disk ones, loaded on the first rebuild."""
+        self.events = EventBroker()
+        self.watching = False
+        self._snapshot: GraphSnapshot | None = None
+        self._signature: str | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._cache = cache
+        self._search = search
+        self._related = related
+        self._persist_task: asyncio.Task | None = None
+        # Single flight: the task running the current build, its result, and the trailing
+        # build's result and scope (books to re-check; None = everything)
+        self._build_task: asyncio.Task | None = None
+        self._running: asyncio.Future | None = None
+        self._trailing: asyncio.Future | None = None
+        self._trailing_books: set[str] | None = set()
+        self.builds = 0
+        # False until a full build ran: before that the snapshot may be a persisted one
+        self._synced = False
+        # True while the snapshot is the graph-data.json read by load_persisted()
+        self._persisted = False
+
+    @property
+    def snapshot(self) -> GraphSnapshot | None:
+        return self._snapshot
+
+    @property
+    def search_index(self) -> SearchIndex | None:
+        """Full-text index kept in step with the snapshot (None until the first build)."""
+        return self._search
+
+    def _follow_snapshot(self) -> None:
+        """
+        Before a build: versions of the cache and the snapshot can diverge (a persisted
+        graph, another process, a reset cache), so new graphs are numbered above the
+        snapshot's. A build then keeps the snapshot's version only if it is the same graph.
+        """
+        if self._snapshot is None:
+            return
+        self._cache.claim_versions_above(self._snapshot.version)
+        if self._persisted and self._snapshot.data["generated"] != self._cache.generated:
+            # Served from a graph-data.json this cache did not write (e.g. one built in CI)
+            self._cache.forget_output()
+
+    async def _commit(self, data: dict) -> GraphSnapshot:
+        """Publish a build's graph; its version only ever goes up (see _follow_snapshot)."""
+        old = self._snapshot
+        self._persisted = False
+        if old is not None and data["version"] == old.version:
+            return old
+        delta = await asyncio.to_thread(graph_delta, old.data, data) if old else None
+        self._snapshot = GraphSnapshot(data=data, version=data["version"])
+        if delta is not None:
+            # Empty deltas too, so clients keep following the version
+            self.events.publish("delta", {**delta, "baseVersion": old.version, "version": data["version"]})
+        return self._snapshot
+
+    async def load_persisted(self) -> GraphSnapshot | None:
+        """Serve the last graph-data.json written until the first build; None if there is none."""
+        if self._snapshot is not None:
+            return self._snapshot
+        data = await asyncio.to_thread(read_graph)
+        if data is None or self._snapshot is not None:
+            return self._snapshot
+        self._snapshot = GraphSnapshot(data=data, version=data.get("version", 0))
+        self._persisted = True
+        return self._snapshot
+
+    async def synced(self) -> GraphSnapshot:
+        """The snapshot once a full build has run (waiting for the one in flight, if any)."""
+        if not self._synced and self._running is not None:
+            with contextlib.suppress(Exception):
+                await asyncio.shield(self._running)
+        if not self._synced:
+            return await self.rebuild()
+        return self._snapshot
+
+    async def rebuild(self) -> GraphSnapshot:
+        """Re-check every source file and write graph-data.json."""
+        return await self._request(None)
+
+    async def apply_changes(self, changed_books: set[str]) -> GraphSnapshot:
+        """Re-check only the given books, update the snapshot and persist in the background."""
+        return await self._request(set(changed_books))
+
+    async def _request(self, books: set[str] | None) -> GraphSnapshot:
+        """Join the trailing build if one is in flight, else start a build."""
+        if self._running is None:
+            self._running = asyncio.get_running_loop().create_future()
+            self._start(books, self._running)
+            # Shielded: a caller that goes away must not cancel the build others wait for
+            return await asyncio.shield(self._running)
+        if self._trailing is None:
+            self._trailing = asyncio.get_running_loop().create_future()
+            self._trailing_books = set()
+        GRAPH_REBUILDS.inc(result="coalesced")
+        if books is None or self._trailing_books is None:
+            self._trailing_books = None
+        else:
+            self._trailing_books |= books
+        return await asyncio.shield(self._trailing)
+
+    def _start(self, books: set[str] | None, result: asyncio.Future) -> None:
+        async def run():
+            try:
+                result.set_result(await self._build(books))
+            except Exception as e:
+                result.set_exception(e)
+                # Retrieved here so a build nobody else awaits does not log a warning
+                result.exception()
+            finally:
+                if self._trailing is not None:
+                    self._running, books_next = self._trailing, self._trailing_books
+                    self._trailing, self._trailing_books = None, set()
+                    self._start(books_next, self._running)
+                else:
+                    self._running = None
+
+        self._build_task = asyncio.create_task(run())
+
+    async def _build(self, books: set[str] | None) -> GraphSnapshot:
+        self.builds += 1
+        GRAPH_REBUILDS.inc(result="built")
+        if books is None or not self._synced:
+            return await self._rebuild()
+        return await self._apply_changes(books)
+
+    async def _rebuild(self) -> GraphSnapshot:
+        async with self._lock:
+            if self._cache is None:
+                self._cache = BuildCache.load()
+            if self._search is None:
+                self._search = SearchIndex.load()
+            if self._related is None:
+                self._related = RelatedIndex.load()
+            self._follow_snapshot()
+            signature = await asyncio.to_thread(source_signature)
+            data = await build_graph(cache=self._cache, search=self._search, related=self._related)
+            self._signature = signature
+            self._checked_at = time.monotonic()
+            self._synced = True
+            return await self._commit(data)
+
+    async def _apply_changes(self, changed_books: set[str]) -> GraphSnapshot:
+        async with self._lock:
+            self._follow_snapshot()
+            data = await build_graph(
+                cache=self._cache,
+                changed_books=changed_books,
+                write=False,
+                search=self._search,
+                related=self._related,
+            )
+            if not self._cache.changed:
+                return self._snapshot
+            snapshot = await self._commit(data)
+        self._schedule_persist()
+        return snapshot
+
+    def _schedule_persist(self) -> None:
+        if self._persist_task is None or self._persist_task.done():
+            self._persist_task = asyncio.create_task(self._persist())
+
+    async def _persist(self) -> None:
+        await asyncio.sleep(PERSIST_DELAY)
+        async with self._lock:
+            data = self._snapshot.data
+            if self._cache.generated == data["generated"]:
+                return
+            await asyncio.to_thread(write_graph, data)
+            await asyncio.to_thread(self._search.save)
+            await asyncio.to_thread(self._related.save)
+            await asyncio.to_thread(self._cache.save, data["generated"], self._cache.output_key)
+            self._signature = await asyncio.to_thread(source_signature)
+
+    async def close(self) -> None:
+        """On shutdown: let the builds in flight finish, then write a pending graph-data.json."""
+        # A trailing build replaces _build_task as the one before it ends
+        while self._build_task is not None and not self._build_task.done():
+            await self._build_task
+        if self._persist_task is not None:
+            with contextlib.suppress(Exception):
+                await self._persist_task
+
+    async def get(self) -> GraphSnapshot:
+        """
+        Return the current snapshot, rebuilding first if none exists or /books changed.
+        While a build is running the current snapshot is returned without waiting.
+        """
+        if self._snapshot is None:
+            return await self.synced()
+        if self.watching or self._running is not None:
+            return self._snapshot
+        now = time.monotonic()
+        if now - self._checked_at >= STALE_CHECK_INTERVAL:
+            self._checked_at = now
+            if await asyncio.to_thread(source_signature) != self._signature:
+                return await self.rebuild()
+        return self._snapshot
+
+
+graph_store = GraphStore()
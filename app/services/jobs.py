@@ -0,0 +1,195 @@
+"""Background enrichment jobs: one runs at a time, progress is kept in memory and streamed."""
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from app.services.events import EventBroker
+from app.services.graph_store import GraphStore, graph_store
+
+# Finished jobs kept for GET /api/jobs/{id}; older ones are forgotten.
+MAX_FINISHED_JOBS = 50
+
+
+@dataclass
+class EnrichJob:
+    force: bool = False
+    chapter: str | None = None
+    max_cost: float | None = None
+    max_tokens: int | None = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = "queued"  # queued -> running -> done | failed
+    created: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    error: str | None = None
+    skipped: int = 0
+    deferred: int = 0
+    # chapter ("book/ch1-x.md") -> pending | enriched | cached | failed | deferred
+    chapters: dict[str, str] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+    cost: float = 0.0
+    events: EventBroker = field(default_factory=EventBroker, repr=False)
+
+    @property
+    def key(self) -> tuple:
+        return (self.force, self.chapter, self.max_cost, self.max_tokens)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def counts(self) -> dict[str, int]:
+        counts = {"total": len(self.chapters), "pending": 0, "enriched": 0, "cached": 0, "failed": 0, "deferred": 0}
+        for status in self.chapters.values():
+            counts[status] += 1
+        counts["skipped"] = self.skipped
+        # Chapters the budget ruled out at planning time are never listed individually
+        counts["deferred"] += self.deferred
+        return counts
+
+    def to_dict(self, chapters: bool = True) -> dict:
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "force": self.force,
+            "chapter": self.chapter,
+            "maxCost": self.max_cost,
+            "maxTokens": self.max_tokens,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "counts": self.counts(),
+            "cost": round(self.cost, 6),
+        }
+        if chapters:
+            data["chapters"] = [
+                {"chapter": name, "status": status, "error": self.errors.get(name)}
+                for name, status in self.chapters.items()
+            ]
+        return data
+
+
+class JobQueue:
+    """
+    Runs enrichment jobs one after another. Submitting a job identical to one that
+    is already queued or running returns that job instead of adding another.
+    Each finished chapter's book is re-applied to the graph store right away.
+    """
+
+    def __init__(self, store: GraphStore):
+        self.store = store
+        self._jobs: dict[str, EnrichJob] = {}
+        self._queue: asyncio.Queue[EnrichJob] = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+        self._dirty_books: set[str] = set()
+        self._refresh_task: asyncio.Task | None = None
+
+    def get(self, job_id: str) -> EnrichJob | None:
+        return self._jobs.get(job_id)
+
+    def recent(self) -> list[EnrichJob]:
+        return sorted(self._jobs.values(), key=lambda j: j.created, reverse=True)
+
+    def submit(
+        self,
+        force: bool = False,
+        chapter: str | None = None,
+        max_cost: float | None = None,
+        max_tokens: int | None = None,
+    ) -> tuple[EnrichJob, bool]:
+        """Queue a job; returns (job, created). created is False if an identical job was reused."""
+        job = EnrichJob(force=force, chapter=chapter, max_cost=max_cost, max_tokens=max_tokens)
+        active = [j for j in self._jobs.values() if j.active and j.key == job.key]
+        if active:
+            # Prefer the queued one: it has not planned its chapters yet, so it sees every edit
+            return min(active, key=lambda j: j.status != "queued"), False
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run_queue())
+        self._forget_finished()
+        return job, True
+
+    def _forget_finished(self) -> None:
+        finished = [j for j in self.recent() if not j.active]
+        for job in finished[MAX_FINISHED_JOBS:]:
+            del self._jobs[job.id]
+
+    async def _run_queue(self) -> None:
+        while not self._queue.empty():
+            await self._run(self._queue.get_nowait())
+
+    async def _run(self, job: EnrichJob) -> None:
+        job.status, job.started = "running", time.time()
+        job.events.publish("status", job.to_dict(chapters=False))
+
+        seen = set()
+
+        def on_progress(event: str, data: dict) -> None:
+            seen.add(event)
+            if event == "planned":
+                job.skipped = data["skipped"]
+                job.deferred = data["deferred"]
+                job.chapters = dict.fromkeys(data["chapters"], "pending")
+                job.events.publish("planned", job.to_dict())
+            elif event == "chapter":
+                job.chapters[data["chapter"]] = data["status"]
+                job.cost = data["cost"]
+                if data["error"]:
+                    job.errors[data["chapter"]] = data["error"]
+                if data["status"] != "failed":
+                    self._refresh(data["bookId"])
+                job.events.publish("chapter", {
+                    "chapter": data["chapter"],
+                    "bookId": data["bookId"],
+                    "status": data["status"],
+                    "error": data["error"],
+                    "counts": job.counts(),
+                    "cost": round(job.cost, 6),
+                })
+
+        status, error = "done", None
+        try:
+            # Imported here: the OpenAI client takes half a second to import, which
+            # server startup should not pay
+            from app.services.enrich import enrich_new_chapters
+
+            if not os.getenv("OPENAI_API_KEY"):
+                raise RuntimeError("OPENAI_API_KEY not set")
+            results = await enrich_new_chapters(
+                force=job.force,
+                chapter_id=job.chapter,
+                max_cost=job.max_cost,
+                max_tokens=job.max_tokens,
+                on_progress=on_progress,
+            )
+            job.cost = results["cost"]
+            if job.chapter and "planned" not in seen:
+                raise LookupError(f"Chapter not found: {job.chapter}")
+        except Exception as e:
+            status, error = "failed", str(e)
+        # The job only counts as finished once the graph shows its last chapter
+        if self._refresh_task is not None:
+            await asyncio.shield(self._refresh_task)
+        job.status, job.error, job.finished = status, error, time.time()
+        job.events.publish("status", job.to_dict(chapters=False))
+
+    def _refresh(self, book_id: str) -> None:
+        """Re-apply a book to the graph; books finishing while a refresh runs are batched into the next."""
+        self._dirty_books.add(book_id)
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._drain_refresh())
+
+    async def _drain_refresh(self) -> None:
+        while self._dirty_books:
+            books, self._dirty_books = self._dirty_books, set()
+            try:
+                await self.store.apply_changes(books)
+            except Exception as e:
+                print(f"⚠️  Graph update failed for {', '.join(sorted(books))}: {e}")
+
+
+job_queue = JobQueue(graph_store)
@@ -0,0 +1,222 @@
+"""
+Optional SQLite index of the library: books, chapter records (with their note files)
+and the conceptGraph edges. Set READBRAIN_INDEX=1 to have every build sync it; finding
+a chapter's note by id is then a B-tree query instead of globbing books/, and export()
+regenerates graph-data.json from the index alone. Neighbourhood queries are answered
+from the served graph instead (neighbors.AdjacencyIndex).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+INDEX_FILE = PROJECT_ROOT / ".readbrain" / "library.sqlite"
+
+ENABLED = os.getenv("READBRAIN_INDEX", "0") == "1"
+
+# Bump when the tables change; an index with another version is rebuilt from scratch.
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS books (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chapters (
+    book_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    enriched INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (book_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chapters_by_id ON chapters (id);
+CREATE TABLE IF NOT EXISTS edges (
+    position INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    weight INTEGER NOT NULL,
+    concepts TEXT NOT NULL
+);
+"""
+
+
+def book_digest(fingerprints: list[dict], graph_format: int, derived: list | None = None) -> str:
+    """
+    Digest of a book's source files (the build cache fingerprints of meta.yaml and its
+    notes), plus any `derived` chapter data that can change without them.
+    """
+    h = hashlib.sha256(str(graph_format).encode())
+    for files in fingerprints:
+        for rel, fp in sorted(files.items()):
+            h.update(f"{rel}:{fp['sha256'] if fp else '-'};".encode())
+    if derived is not None:
+        h.update(json.dumps(derived, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+class LibraryIndex:
+    """
+    One connection per instance; open one per thread. WAL mode lets readers query
+    the index while a build writes to it.
+    """
+
+    def __init__(self, path: Path | None = None):
+        path = path or INDEX_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.executescript(
+                "DROP TABLE IF EXISTS meta; DROP TABLE IF EXISTS books; DROP TABLE IF EXISTS chapters;"
+                f" DROP TABLE IF EXISTS concepts; DROP TABLE IF EXISTS edges; {SCHEMA}"
+                f" PRAGMA user_version = {SCHEMA_VERSION};"
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "LibraryIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -- writing ---------------------------------------------------------------
+
+    def sync(
+        self,
+        books: list[dict],
+        sources: dict[str, tuple[str, list[str]]],
+        concept_graph: dict,
+        generated: str,
+        graph_key: str,
+        version: int = 0,
+    ) -> int:
+        """
+        Bring the index in line with a build. `books` is as in graph-data.json and
+        `sources` maps book id -> (book_digest(), its chapters' note files relative to
+        books/, in chapter order). Only books whose digest changed are rewritten; the
+        edges are replaced when any book changed or graph_key (the build options) did.
+        Returns the number of books written or removed.
+        """
+        stored = dict(self._conn.execute("SELECT id, digest FROM books"))
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        changed = 0
+        with self._conn:
+            for position, book in enumerate(books):
+                chapters = book["chapters"]
+                digest, chapter_paths = sources[book["id"]]
+                if stored.pop(book["id"], None) == digest:
+                    self._conn.execute("UPDATE books SET position = ? WHERE id = ?", (position, book["id"]))
+                    continue
+                changed += 1
+                self._delete_book(book["id"])
+                record = {k: v for k, v in book.items() if k != "chapters"}
+                self._conn.execute(
+                    "INSERT INTO books (id, position, digest, record) VALUES (?, ?, ?, ?)",
+                    (book["id"], position, digest, json.dumps(record)),
+                )
+                self._conn.executemany(
+                    "INSERT INTO chapters (book_id, position, id, path, enriched, record) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (book["id"], i, c["id"], path, int(c["isEnriched"]), json.dumps(c))
+                        for i, (c, path) in enumerate(zip(chapters, chapter_paths))
+                    ],
+                )
+            for book_id in stored:
+                changed += 1
+                self._delete_book(book_id)
+            if changed or meta.get("graphKey") != graph_key:
+                # Edge weights depend on every book, so the edge table is replaced as a whole
+                self._conn.execute("DELETE FROM edges")
+                self._conn.executemany(
+                    "INSERT INTO edges (position, source, target, weight, concepts) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (i, e["source"], e["target"], e["weight"], json.dumps(e["concepts"]))
+                        for i, e in enumerate(concept_graph["edges"])
+                    ],
+                )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [("generated", generated), ("graphKey", graph_key), ("version", str(version))],
+            )
+        return changed
+
+    def _delete_book(self, book_id: str) -> None:
+        self._conn.execute("DELETE FROM chapters WHERE book_id = ?", (book_id,))
+        self._conn.execute("DELETE FROM books WHERE id = ?", (book_id,))
+
+    # -- queries ---------------------------------------------------------------
+
+    def chapter_path(self, chapter_id: str) -> str | None:
+        """The chapter's note file, relative to books/."""
+        row = self._conn.execute("SELECT path FROM chapters WHERE id = ? LIMIT 1", (chapter_id,)).fetchone()
+        return row[0] if row else None
+
+    def export(self) -> dict:
+        """graph-data.json, rebuilt from the index alone."""
+        books = []
+        concept_index: dict[str, list[str]] = {}
+        chapters_by_book: dict[str, list[dict]] = {}
+        for book_id, record in self._conn.execute(
+            "SELECT c.book_id, c.record FROM chapters c JOIN books b ON b.id = c.book_id"
+            " ORDER BY b.position, c.position"
+        ):
+            chapter = json.loads(record)
+            chapters_by_book.setdefault(book_id, []).append(chapter)
+        for book_id, record in self._conn.execute("SELECT id, record FROM books ORDER BY position"):
+            chapters = chapters_by_book.get(book_id, [])
+            for chapter in chapters:
+                for concept in chapter["concepts"]:
+                    concept_index.setdefault(concept, []).append(chapter["id"])
+            books.append({**json.loads(record), "chapters": chapters})
+
+        nodes = [
+            {"id": concept, "label": concept.replace("-", " ").title(), "chapters": ids, "weight": len(ids)}
+            for concept, ids in concept_index.items()
+            if len(ids) > 1
+        ]
+        edges = [
+            {"source": source, "target": target, "weight": weight, "concepts": json.loads(concepts)}
+            for source, target, weight, concepts in self._conn.execute(
+                "SELECT source, target, weight, concepts FROM edges ORDER BY position"
+            )
+        ]
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        return {
+            "generated": meta.get("generated"),
+            "version": int(meta.get("version", 0)),
+            "stats": {
+                "totalBooks": len(books),
+                "totalChapters": sum(len(b["chapters"]) for b in books),
+                "totalConcepts": len(concept_index),
+                "enrichedChapters": sum(1 for b in books for c in b["chapters"] if c["isEnriched"]),
+            },
+            "books": books,
+            "conceptGraph": {"nodes": nodes, "edges": edges},
+        }
+
+
+_readers = threading.local()
+
+
+def reader(path: Path | None = None) -> LibraryIndex:
+    """
+    The calling thread's long-lived index connection, for lookups (opening a
+    connection costs more than a query). Never close it.
+    """
+    path = path or INDEX_FILE
+    index = getattr(_readers, "index", None)
+    if index is None or index.path != path:
+        index = _readers.index = LibraryIndex(path)
+    return index
@@ -0,0 +1,51 @@
+"""Local SQLite cache of Open Library search results, expiring after a TTL."""
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+CACHE_FILE = PROJECT_ROOT / ".readbrain" / "lookup-cache.sqlite"
+
+# Seconds a search result is reused before Open Library is asked again (default: 7 days)
+DEFAULT_TTL = float(os.getenv("READBRAIN_LOOKUP_TTL", str(7 * 24 * 3600)))
+
+
+class LookupCache:
+    """Search results keyed by the normalized query. An empty dict records "no match"."""
+
+    def __init__(self, path: Path | None = None, ttl: float = DEFAULT_TTL):
+        path = path or CACHE_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            " query TEXT PRIMARY KEY,"
+            " result TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def get(self, query: str) -> dict | None:
+        """The cached result, or None if there is none younger than the TTL."""
+        row = self._conn.execute(
+            "SELECT result FROM lookups WHERE query = ? AND fetched_at >= ?",
+            (self.key(query), time.time() - self.ttl),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, query: str, result: dict) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO lookups (query, result, fetched_at) VALUES (?, ?, ?)",
+            (self.key(query), json.dumps(result), time.time()),
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
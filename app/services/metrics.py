@@ -0,0 +1,166 @@
+"""
+Process-wide counters and timing histograms, rendered in the Prometheus text format.
+Set READBRAIN_METRICS=0 to turn recording off; Histogram.time() then returns a shared no-op.
+"""
+import contextlib
+import os
+import threading
+import time
+from bisect import bisect_left
+
+ENABLED = os.getenv("READBRAIN_METRICS", "1") != "0"
+
+# Upper bounds (seconds) of histogram buckets; wide enough for a 5 ms request and a
+# 10 minute enrichment run.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_NOOP = contextlib.nullcontext()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: dict | None = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in [*zip(names, values), *(extra or {}).items()]]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help, labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not ENABLED:
+            return
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(n, "") for n in self.label_names), 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name, self.help, self.label_names, self.buckets = name, help, labels, buckets
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        if not ENABLED:
+            return
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the elapsed seconds of its block."""
+        return _Timer(self, labels) if ENABLED else _NOOP
+
+    def totals(self) -> dict[tuple, tuple[float, int]]:
+        """Label values -> (sum of observations, count)."""
+        with self._lock:
+            return {key: (series[1], series[2]) for key, series in self._series.items()}
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = {key: (list(s[0]), s[1], s[2]) for key, s in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip((*map(_number, self.buckets), "+Inf"), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, {'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+REGISTRY: list[Counter | Histogram] = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+BUILD_STAGE_SECONDS = _register(Histogram(
+    "readbrain_build_stage_seconds", "Time spent in each build_graph stage", ("stage",)
+))
+BUILD_FILES = _register(Counter(
+    "readbrain_build_files_total", "Source files seen by build_graph, by whether they were re-parsed", ("result",)
+))
+GRAPH_REBUILDS = _register(Counter(
+    "readbrain_graph_builds_total", "Graph store builds run, and requests that joined a pending build instead", ("result",)
+))
+ENRICH_QUEUE_SECONDS = _register(Histogram(
+    "readbrain_enrich_queue_wait_seconds", "Time a chapter waited for a worker slot and the rate limiter"
+))
+ENRICH_API_SECONDS = _register(Histogram(
+    "readbrain_enrich_api_seconds", "OpenAI chat completion latency, by outcome", ("outcome",)
+))
+ENRICH_TOKENS = _register(Counter(
+    "readbrain_enrich_tokens_total", "Tokens reported by the API, by direction", ("direction",)
+))
+ENRICH_RETRIES = _register(Counter(
+    "readbrain_enrich_retries_total", "Retried OpenAI calls, by error", ("reason",)
+))
+ENRICH_CHAPTERS = _register(Counter(
+    "readbrain_enrich_chapters_total", "Chapters processed by enrichment, by result", ("result",)
+))
+HTTP_SECONDS = _register(Histogram(
+    "readbrain_http_request_seconds", "Time to the end of the response body, by route", ("method", "route", "status")
+))
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+def stage_breakdown(histogram: Histogram = BUILD_STAGE_SECONDS) -> str:
+    """Human-readable table of a histogram's time per label, largest first."""
+    totals = histogram.totals()
+    overall = sum(total for total, _ in totals.values()) or 1.0
+    lines = []
+    for key, (total, count) in sorted(totals.items(), key=lambda kv: -kv[1][0]):
+        name = "/".join(key) or histogram.name
+        lines.append(f"   {name:<24} {total:>9.3f}s  {total / overall:>6.1%}  ×{count}")
+    return "\n".join(lines)
@@ -0,0 +1,190 @@
+"""
+Adjacency index over the conceptGraph: concept -> chapters, chapter -> concepts and
+chapter -> neighbours by weight, for bounded neighbourhood queries (GET /api/neighbors)
+without sending the whole concept graph to the client.
+"""
+import importlib.util
+from array import array
+from itertools import accumulate, chain
+
+from app.services.build_graph import _normalize_concept
+
+# numpy (optional, imported on first use) sorts the rows of a large graph several
+# times faster than the pure-Python fallback
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+np = None
+
+# Bounds of one query
+MAX_DEPTH = 3
+MAX_LIMIT = 500
+
+
+def _import_numpy() -> None:
+    global np
+    if np is None:
+        import numpy as np
+
+
+def _rows_numpy(n: int, sources: list[int], targets: list[int], weights: list[int]) -> tuple[array, ...]:
+    """Offsets, then neighbours, weights and edge numbers of every chapter's row, strongest first."""
+    _import_numpy()
+    s, t, w = (np.array(values, dtype=np.int32) for values in (sources, targets, weights))
+    chapter, other = np.concatenate((s, t)), np.concatenate((t, s))
+    w = np.concatenate((w, w))
+    e = np.tile(np.arange(len(sources), dtype=np.int32), 2)
+    order = np.lexsort((e, -w, chapter))
+    offsets = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(chapter, minlength=n), out=offsets[1:])
+    return tuple(array("i", a.astype(np.int32).tobytes()) for a in (offsets, other[order], w[order], e[order]))
+
+
+def _rows_python(n: int, sources: list[int], targets: list[int], weights: list[int]) -> tuple[array, ...]:
+    """
+    As _rows_numpy. Both directions of every edge become one int (chapter, weight
+    descending, edge number), so a single sort of plain ints orders every row.
+    """
+    e_bits = max(len(sources), 1).bit_length()
+    w_bits = max(weights, default=0).bit_length() + 1
+    top, mask = (1 << w_bits) - 1, (1 << e_bits) - 1
+    keys = [(i << w_bits | top - w) << e_bits | e for e, (i, w) in enumerate(zip(sources, weights))]
+    keys += [(j << w_bits | top - w) << e_bits | e for e, (j, w) in enumerate(zip(targets, weights))]
+    keys.sort()
+    edge_nums = array("i", [k & mask for k in keys])
+    shift = w_bits + e_bits
+    neighbours = array("i", [sources[e] ^ targets[e] ^ k >> shift for k, e in zip(keys, edge_nums)])
+    degrees = [0] * n
+    for i in chain(sources, targets):
+        degrees[i] += 1
+    return array("i", [0, *accumulate(degrees)]), neighbours, array("i", [weights[e] for e in edge_nums]), edge_nums
+
+
+class AdjacencyIndex:
+    """
+    Chapters are numbered in graph order. Each chapter's neighbours are kept strongest
+    first in flat arrays (a row per chapter, from _offsets[i] to _offsets[i + 1]), so
+    a query reads only the head of each row it expands.
+    """
+
+    def __init__(self, graph_data: dict):
+        self.chapters: list[dict] = []
+        self._colors: list[str] = []
+        for book in graph_data["books"]:
+            for chapter in book["chapters"]:
+                self.chapters.append(chapter)
+                self._colors.append(book.get("color", "#8B949E"))
+        num = self._num = {c["id"]: i for i, c in enumerate(self.chapters)}
+
+        concept_graph = graph_data["conceptGraph"]
+        self.concepts = {node["id"]: node for node in concept_graph["nodes"]}
+        self.concept_chapters: dict[str, array] = {}
+        self.chapter_concepts: list[list[str]] = [[] for _ in self.chapters]
+        for concept, node in self.concepts.items():
+            nums = array("i", [num[c] for c in node["chapters"]])
+            self.concept_chapters[concept] = nums
+            for n in nums:
+                self.chapter_concepts[n].append(concept)
+
+        self._edges = edges = concept_graph["edges"]
+        sources = [num[e["source"]] for e in edges]
+        targets = [num[e["target"]] for e in edges]
+        weights = [e["weight"] for e in edges]
+        rows = _rows_numpy if HAVE_NUMPY else _rows_python
+        self._offsets, self._neighbours, self._weights, self._edge_nums = rows(
+            len(self.chapters), sources, targets, weights
+        )
+
+    def resolve(self, key: str) -> tuple[str, str] | None:
+        """("chapter" | "concept", id) for a chapter id or a concept (in any spelling), or None."""
+        if key in self._num:
+            return "chapter", key
+        concept = key if key in self.concepts else _normalize_concept(key)
+        return ("concept", concept) if concept in self.concepts else None
+
+    def neighbourhood(self, key: str, depth: int = 1, limit: int = 50, min_weight: int = 1) -> dict | None:
+        """
+        The subgraph around a chapter or a concept, as D3 nodes and links, or None if
+        `key` is neither. Chapters are added a ring at a time (a concept's own chapters
+        form its first ring), strongest link first, up to `limit` chapters; `links` are
+        the edges of at least min_weight among them. `truncated` is set when the limit
+        left chapters within `depth` out.
+        """
+        resolved = self.resolve(key)
+        if resolved is None:
+            return None
+        kind, center = resolved
+        depth = max(1, min(depth, MAX_DEPTH))
+        limit = max(1, min(limit, MAX_LIMIT))
+
+        ring: dict[int, int] = {}  # chapter number -> distance from the center
+        truncated = False
+        if kind == "chapter":
+            frontier = [self._num[center]]
+            ring[frontier[0]] = 0
+        else:
+            posting = self.concept_chapters[center]
+            frontier = list(posting[:limit])
+            truncated = len(posting) > limit
+            ring.update((num, 1) for num in frontier)
+            depth -= 1
+
+        center_nodes = 1 if kind == "chapter" else 0
+        for distance in range(1, depth + 1):
+            room = limit - (len(ring) - center_nodes)
+            if room <= 0 or not frontier:
+                truncated = truncated or bool(frontier and self._has_unseen(frontier, ring, min_weight))
+                break
+            # Each list is strongest first, so the `room` strongest new chapters overall are
+            # among the first `room` new ones of each list
+            best: dict[int, int] = {}
+            for num in frontier:
+                found = 0
+                for p in range(self._offsets[num], self._offsets[num + 1]):
+                    j, w = self._neighbours[p], self._weights[p]
+                    if w < min_weight or found >= room:
+                        break
+                    if j in ring:
+                        continue
+                    found += 1
+                    if w > best.get(j, 0):
+                        best[j] = w
+            ranked = sorted(best, key=lambda j: (-best[j], j))
+            if len(ranked) > room:
+                truncated = True
+            frontier = ranked[:room]
+            ring.update((j, distance) for j in frontier)
+
+        nodes, links = [], []
+        if kind == "concept":
+            node = self.concepts[center]
+            nodes.append({"id": center, "type": "concept", "label": node["label"], "weight": node["weight"], "depth": 0})
+        for num, distance in ring.items():
+            chapter = self.chapters[num]
+            nodes.append({
+                "id": chapter["id"],
+                "type": "chapter",
+                "label": chapter["title"],
+                "bookId": chapter["bookId"],
+                "color": self._colors[num],
+                "concepts": self.chapter_concepts[num],
+                "depth": distance,
+            })
+            if kind == "concept" and distance == 1:
+                links.append({"source": center, "target": chapter["id"], "weight": 1, "concepts": [center]})
+        for num in ring:
+            for p in range(self._offsets[num], self._offsets[num + 1]):
+                j, w = self._neighbours[p], self._weights[p]
+                if w < min_weight:
+                    break
+                if j > num and j in ring:
+                    edge = self._edges[self._edge_nums[p]]
+                    links.append({"source": edge["source"], "target": edge["target"], "weight": w, "concepts": edge["concepts"]})
+        return {"center": center, "type": kind, "nodes": nodes, "links": links, "truncated": truncated}
+
+    def _has_unseen(self, frontier: list[int], ring: dict[int, int], min_weight: int) -> bool:
+        for num in frontier:
+            for p in range(self._offsets[num], self._offsets[num + 1]):
+                if self._weights[p] < min_weight:
+                    break
+                if self._neighbours[p] not in ring:
+                    return True
+        return False
@@ -0,0 +1,89 @@
+"""Token-bucket rate limiting for OpenAI calls (requests-per-minute and tokens-per-minute)."""
+import asyncio
+import random
+import time
+
+# Defaults match the gpt-4o-mini tier-1 limits; override via CLI flags.
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200_000
+MAX_RETRIES = 5
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute, holding at most one minute's worth."""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Admits calls in FIFO order once both buckets have room. A 429 pauses every
+    caller via pause(), so concurrent workers back off together.
+    """
+
+    def __init__(self, rpm: int | None = DEFAULT_RPM, tpm: int | None = DEFAULT_TPM):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        async with self._lock:
+            while True:
+                wait = max(
+                    self._paused_until - time.monotonic(),
+                    self.requests.delay_for(1) if self.requests else 0.0,
+                    self.tokens.delay_for(tokens) if self.tokens else 0.0,
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(tokens)
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def retry_after(error: Exception) -> float | None:
+    """Seconds the server asked us to wait, from Retry-After / retry-after-ms headers."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def backoff_delay(attempt: int, error: Exception | None = None) -> float:
+    """Server-provided delay if any, else exponential backoff with jitter."""
+    delay = retry_after(error) if error is not None else None
+    if delay is None:
+        delay = min(MAX_BACKOFF, BASE_BACKOFF * 2**attempt) * (0.5 + random.random() / 2)
+    return delay
@@ -0,0 +1,388 @@
+"""
+Related chapters: top-k cosine similarity of TF-IDF vectors over each chapter's notes,
+summary, key insights and concepts. Uses scipy sparse matrix products when numpy and
+scipy are installed, else an inverted index in pure Python.
+"""
+import base64
+import hashlib
+import heapq
+import importlib.util
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator
+
+# numpy and scipy are imported on first use (see _import_scipy): together they take a
+# third of a second to import, which server startup should not pay
+HAVE_SCIPY = importlib.util.find_spec("numpy") is not None and importlib.util.find_spec("scipy") is not None
+np = None
+sparse = None
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+RELATED_FILE = PROJECT_ROOT / ".readbrain" / "related.json"
+# Bump when tokenizing, weighting or the file layout change; older files are rebuilt.
+RELATED_VERSION = 1
+
+# Related chapters kept per chapter (READBRAIN_RELATED_K=0 turns the stage off)
+TOP_K = int(os.getenv("READBRAIN_RELATED_K", "5"))
+MIN_SCORE = 0.05
+# Each occurrence of a term in a field adds this much to its term frequency. Concepts
+# also count as one whole term each, so an exact tag match weighs more than its words.
+FIELD_WEIGHTS = {"rawNotes": 1, "summary": 2, "keyInsights": 2, "concepts": 3}
+# Terms in fewer chapters cannot link two chapters; terms in more carry little signal.
+MIN_DF = 2
+MAX_DF_RATIO = 0.5
+# Only each chapter's most distinctive terms take part in matching (all terms tied at
+# the cut, so the choice never depends on term numbering); this bounds the cost of a row
+# to about MAX_TERMS posting lists.
+MAX_TERMS = 64
+# Chapters weighted and pruned at once (as a dense block of their term weights)
+PRUNE_ROWS = 4096
+# Candidate scores materialized at once (rows of the similarity matrix are computed
+# in batches up to this many non-zero entries), which bounds peak memory.
+BATCH_ENTRIES = 4_000_000
+# Libraries up to FULL_PASS_CHAPTERS are recomputed in full on every build, so their
+# lists do not depend on the order of past edits. Larger ones, and incremental updates
+# (the server's per-edit deltas) of any size, refresh only the affected lists (idf drifts
+# meanwhile) until REFIT_RATIO of chapters changed since the last full pass; the next
+# full build of a small library then recomputes it in full again.
+# A pure-Python pass grows quadratically, hence the lower bound without scipy.
+FULL_PASS_CHAPTERS = 5000 if HAVE_SCIPY else 1000
+REFIT_RATIO = 0.1
+
+# Words of three or more characters, split as in search_index.tokenize()
+_WORD = re.compile(r"\w{3,}")
+
+
+def _import_scipy() -> None:
+    global np, sparse
+    if sparse is None:
+        import numpy as np
+        from scipy import sparse
+
+
+def _terms(chapter: dict) -> Counter:
+    counts: Counter[str] = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        value = chapter.get(field) or ""
+        text = " ".join(map(str, value)) if isinstance(value, list) else str(value)
+        for token, n in Counter(_WORD.findall(text.lower())).items():
+            if not token.isdigit():
+                counts[token] += n * weight
+    for concept in chapter.get("concepts") or []:
+        counts[f"#{concept}"] += FIELD_WEIGHTS["concepts"]
+    return counts
+
+
+def _signature(chapter: dict) -> str:
+    body = json.dumps([chapter.get(field) for field in FIELD_WEIGHTS], sort_keys=True)
+    return hashlib.blake2b(body.encode(), digest_size=12).hexdigest()
+
+
+def _pack(a: array) -> str:
+    return base64.b64encode(a.tobytes()).decode()
+
+
+def _unpack(s: str, typecode: str) -> array:
+    a = array(typecode)
+    a.frombytes(base64.b64decode(s))
+    return a
+
+
+class RelatedIndex:
+    """
+    Keeps each chapter's term counts, the document frequencies and the current top-k
+    lists. An update re-tokenizes only chapters whose fields changed, then recomputes
+    the lists of those chapters and of chapters that listed one of them; the changed
+    chapters' scores against every other chapter are merged into the remaining lists.
+
+    update(), save() and related() hold a lock, like SearchIndex.
+    """
+
+    def __init__(self, path: Path | None = RELATED_FILE, top_k: int = TOP_K):
+        self.path = path
+        self.top_k = top_k
+        self.vocab: dict[str, int] = {}
+        self.df = array("I")
+        # chapter id -> (term ids, term frequencies)
+        self.docs: dict[str, tuple[array, array]] = {}
+        self.signatures: dict[str, str] = {}
+        self.lists: dict[str, list[tuple[str, float]]] = {}
+        self.drift = 0
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: Path | None = None, top_k: int = TOP_K) -> "RelatedIndex":
+        path = path or RELATED_FILE
+        index = cls(path, top_k)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if data.get("version") != RELATED_VERSION or data.get("topK") != top_k:
+            return index
+        index.vocab = {term: n for n, term in enumerate(data["terms"])}
+        index.df = _unpack(data["df"], "I")
+        index.docs = {cid: (_unpack(t, "I"), _unpack(f, "f")) for cid, (t, f) in data["docs"].items()}
+        index.signatures = data["signatures"]
+        index.lists = {cid: [tuple(pair) for pair in pairs] for cid, pairs in data["lists"].items()}
+        index.drift = data["drift"]
+        return index
+
+    def save(self) -> None:
+        """Write the index atomically if it changed since it was loaded or saved."""
+        with self._lock:
+            if self.path is None or not self._dirty:
+                return
+            data = {
+                "version": RELATED_VERSION,
+                "topK": self.top_k,
+                "terms": list(self.vocab),
+                "df": _pack(self.df),
+                "docs": {cid: [_pack(t), _pack(f)] for cid, (t, f) in self.docs.items()},
+                "signatures": self.signatures,
+                # Full precision: related() rounds, and rounding twice could change its output
+                "lists": {cid: [list(pair) for pair in pairs] for cid, pairs in self.lists.items()},
+                "drift": self.drift,
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+    def related(self, chapter_id: str) -> list[dict]:
+        """The chapter's related chapters as relatedChapters entries, most similar first."""
+        with self._lock:
+            return [{"id": other, "score": round(score, 3)} for other, score in self.lists.get(chapter_id, [])]
+
+    # -- updating --------------------------------------------------------------
+
+    def update(self, chapters: Iterable[dict], incremental: bool = False) -> int:
+        """
+        Bring the lists in line with `chapters` (all of them); returns how many chapters
+        (or, when a full pass only settles earlier incremental updates, lists) changed.
+        incremental=True skips the full pass a small library otherwise gets.
+        """
+        with self._lock:
+            return self._update(chapters, incremental)
+
+    def _update(self, chapters: Iterable[dict], incremental: bool) -> int:
+        seen, changed = set(), set()
+        for chapter in chapters:
+            cid = chapter["id"]
+            seen.add(cid)
+            signature = _signature(chapter)
+            if self.signatures.get(cid) == signature:
+                continue
+            self._remove(cid)
+            self._add(cid, _terms(chapter), signature)
+            changed.add(cid)
+        removed = [cid for cid in self.docs if cid not in seen]
+        for cid in removed:
+            self._remove(cid)
+            self.lists.pop(cid, None)
+        small = len(self.docs) <= FULL_PASS_CHAPTERS and not incremental
+        if not changed and not removed:
+            if not (small and self.drift and self.top_k > 0):
+                return 0
+            # Unchanged since incremental updates: recompute in full, as if built from scratch
+            before = self.lists
+            self.lists = {}
+            self._compact()
+            self.drift = 0
+            self._recompute(set(self.docs), set())
+            self._dirty = True
+            return sum(before.get(cid) != pairs for cid, pairs in self.lists.items())
+
+        self._dirty = True
+        self.drift += len(changed) + len(removed)
+        if self.top_k <= 0:
+            self.lists = {}
+            return len(changed) + len(removed)
+        if small or self.drift > REFIT_RATIO * len(self.docs):
+            self._compact()
+            self.drift = 0
+            rows, spread = set(self.docs), set()
+        else:
+            touched = changed | set(removed)
+            rows = changed | {cid for cid, pairs in self.lists.items() if any(o in touched for o, _ in pairs)}
+            spread = changed
+        self._recompute(rows, spread)
+        return len(changed) + len(removed)
+
+    def _add(self, cid: str, counts: Counter, signature: str) -> None:
+        vocab, df = self.vocab, self.df
+        terms = array("I", [vocab.setdefault(term, len(vocab)) for term in counts])
+        if len(vocab) > len(df):
+            df.frombytes(bytes(df.itemsize * (len(vocab) - len(df))))
+        for n in terms:
+            df[n] += 1
+        self.docs[cid] = (terms, array("f", counts.values()))
+        self.signatures[cid] = signature
+
+    def _remove(self, cid: str) -> None:
+        doc = self.docs.pop(cid, None)
+        self.signatures.pop(cid, None)
+        if doc is not None:
+            for n in doc[0]:
+                self.df[n] -= 1
+
+    def _compact(self) -> None:
+        """Drop terms no chapter uses any more and renumber the rest."""
+        if all(self.df):
+            return
+        remap = {}
+        vocab, df = {}, array("I")
+        for term, n in self.vocab.items():
+            if self.df[n]:
+                remap[n] = vocab[term] = len(vocab)
+                df.append(self.df[n])
+        self.vocab, self.df = vocab, df
+        self.docs = {
+            cid: (array("I", (remap[n] for n in terms)), tfs) for cid, (terms, tfs) in self.docs.items()
+        }
+
+    def _recompute(self, rows: set[str], spread: set[str]) -> None:
+        """
+        Recompute the lists of `rows`; scores of the `spread` chapters against every
+        other chapter are also offered to the lists that were not recomputed.
+        """
+        ids = list(self.docs)
+        number = {cid: i for i, cid in enumerate(ids)}
+        scorer = _ScipyScorer if HAVE_SCIPY else _PythonScorer
+        k = self.top_k
+        full = {number[cid] for cid in spread}
+        for row, cols, scores in scorer(self, ids).rows(sorted(number[cid] for cid in rows), k + 1, full):
+            cid = ids[row]
+            pairs = [(ids[c], float(s)) for c, s in zip(cols, scores) if c != row and s >= MIN_SCORE]
+            self.lists[cid] = heapq.nlargest(k, pairs, key=lambda p: (p[1], p[0]))
+            if cid not in spread:
+                continue
+            for other, score in pairs:
+                if other in rows:
+                    continue
+                current = self.lists.setdefault(other, [])
+                if len(current) < k or score > current[-1][1]:
+                    current.append((cid, score))
+                    current.sort(key=lambda p: (p[1], p[0]), reverse=True)
+                    del current[k:]
+
+
+def _idf(df: float, n_docs: int) -> float:
+    return math.log((1 + n_docs) / (1 + df)) + 1
+
+
+class _PythonScorer:
+    """Accumulates dot products over an inverted index of the pruned, normalized vectors."""
+
+    def __init__(self, index: RelatedIndex, ids: list[str]):
+        n_docs = len(ids)
+        max_df = max(MIN_DF, MAX_DF_RATIO * n_docs)
+        self.vectors: list[list[tuple[int, float]]] = []
+        self.postings: dict[int, list[tuple[int, float]]] = {}
+        for row, cid in enumerate(ids):
+            terms, tfs = index.docs[cid]
+            weights = [
+                (t, (1 + math.log(tf)) * _idf(index.df[t], n_docs))
+                for t, tf in zip(terms, tfs)
+                if MIN_DF <= index.df[t] <= max_df
+            ]
+            if len(weights) > MAX_TERMS:
+                cut = heapq.nlargest(MAX_TERMS, (w for _, w in weights))[-1]
+                weights = [(t, w) for t, w in weights if w >= cut]
+            norm = math.sqrt(sum(w * w for _, w in weights)) or 1.0
+            vector = [(t, w / norm) for t, w in weights]
+            self.vectors.append(vector)
+            for t, w in vector:
+                self.postings.setdefault(t, []).append((row, w))
+
+    def rows(self, rows: list[int], k: int, full: set[int]) -> Iterator[tuple[int, list[int], list[float]]]:
+        """(row, columns, scores) of each row's non-zero scores: all of them for rows in `full`, else the top k."""
+        for row in rows:
+            scores: dict[int, float] = {}
+            for t, w in self.vectors[row]:
+                for other, w2 in self.postings[t]:
+                    scores[other] = scores.get(other, 0.0) + w * w2
+            if row not in full and len(scores) > k:
+                scores = dict(heapq.nlargest(k, scores.items(), key=lambda p: p[1]))
+            yield row, list(scores), list(scores.values())
+
+
+def _prune(weights: "np.ndarray", lengths: "np.ndarray") -> None:
+    """
+    Zero all but the MAX_TERMS heaviest weights (and those tied with the last) of each
+    row, in place; row i holds the next lengths[i] weights.
+    """
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    rows = np.flatnonzero(lengths > MAX_TERMS)
+    if not len(rows):
+        return
+    width = np.arange(lengths[rows].max())
+    valid = width[None, :] < lengths[rows][:, None]
+    positions = (starts[rows][:, None] + width[None, :])[valid]
+    block = np.full(valid.shape, -np.inf)
+    block[valid] = weights[positions]
+    cut = -np.partition(-block, MAX_TERMS - 1, axis=1)[:, MAX_TERMS - 1]
+    weights[positions[(block < cut[:, None])[valid]]] = 0
+
+
+class _ScipyScorer:
+    """Rows of X·Xᵀ for L2-normalized TF-IDF rows X, in batches of at most BATCH_ENTRIES."""
+
+    def __init__(self, index: RelatedIndex, ids: list[str]):
+        _import_scipy()
+        n_docs = len(ids)
+        df = np.frombuffer(index.df, dtype=np.uint32).astype(np.float64)
+        idf = np.log((1 + n_docs) / (1 + df)) + 1
+        idf[(df < MIN_DF) | (df > max(MIN_DF, MAX_DF_RATIO * n_docs))] = 0
+        # Weighted and pruned PRUNE_ROWS chapters at a time, so only the kept entries of
+        # the whole library are in memory at once
+        parts = []
+        for chunk in range(0, n_docs, PRUNE_ROWS):
+            docs = [index.docs[cid] for cid in ids[chunk:chunk + PRUNE_ROWS]]
+            lengths = np.fromiter((len(terms) for terms, _ in docs), dtype=np.int64, count=len(docs))
+            terms = np.concatenate([np.frombuffer(t, dtype=np.uint32) for t, _ in docs])
+            tfs = np.concatenate([np.frombuffer(f, dtype=np.float32) for _, f in docs]).astype(np.float64)
+            weights = (1 + np.log(tfs)) * idf[terms]
+            _prune(weights, lengths)
+            kept = np.flatnonzero(weights)
+            row_of = np.repeat(np.arange(chunk, chunk + len(docs)), lengths)
+            parts.append((row_of[kept], terms[kept], weights[kept]))
+        rows, cols, weights = (np.concatenate(p) for p in zip(*parts)) if parts else (np.zeros(0),) * 3
+
+        matrix = sparse.csr_matrix((weights, (rows, cols)), shape=(n_docs, len(index.df)))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        self.matrix = sparse.diags(1 / norms) @ matrix
+        self.transposed = self.matrix.T.tocsr()
+        # Upper bound on the non-zeros of each row of the product: the sum of its terms' df
+        column_df = np.diff(self.transposed.indptr)
+        self.cost = (self.matrix != 0).astype(np.int64) @ column_df
+
+    def rows(self, rows: list[int], k: int, full: set[int]) -> Iterator[tuple[int, "np.ndarray", "np.ndarray"]]:
+        """(row, columns, scores) of each row's non-zero scores: all of them for rows in `full`, else the top k."""
+        start = 0
+        while start < len(rows):
+            end, total = start, 0
+            while end < len(rows) and (end == start or total + self.cost[rows[end]] <= BATCH_ENTRIES):
+                total += self.cost[rows[end]]
+                end += 1
+            batch = rows[start:end]
+            product = (self.matrix[batch] @ self.transposed).tocsr()
+            for i, row in enumerate(batch):
+                lo, hi = product.indptr[i], product.indptr[i + 1]
+                cols, scores = product.indices[lo:hi], product.data[lo:hi]
+                if row not in full and hi - lo > k:
+                    top = np.argpartition(-scores, k)[:k]
+                    cols, scores = cols[top], scores[top]
+                yield row, cols.tolist(), scores.tolist()
+            start = end
@@ -1,19 +1,34 @@
-"""Scaffold a new book from a search query. Uses Open Library API + OpenAI."""
+"""Scaffold new books from search queries or a reading list. Uses Open Library API + OpenAI."""
+import asyncio
+import csv
 import json
 import os
 import random
 import re
 from pathlib import Path
+from typing import Callable
 
 import httpx
 import yaml
 from openai import AsyncOpenAI
 
+from app.services.lookup_cache import LookupCache
+
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 BOOKS_DIR = PROJECT_ROOT / "books"
 
-OPEN_LIBRARY_SEARCH = "https://openlibrary.org/search.json"
+# READBRAIN_OPENLIBRARY_URL points the search at a local stand-in (e.g. benchmarks.fake_openai)
+OPEN_LIBRARY_SEARCH = os.getenv("READBRAIN_OPENLIBRARY_URL", "https://openlibrary.org").rstrip("/") + "/search.json"
 COVER_BASE = "https://covers.openlibrary.org/b/id"
+OPEN_LIBRARY_TIMEOUT = 10.0
+USER_AGENT = "ReadBrain/1.0 (https://github.com/readbrain)"
+
+# Books scaffolded at once by scaffold_books
+DEFAULT_BULK_CONCURRENCY = 4
+
+MODEL = "gpt-4o-mini"
+# Explicit, so the model calls do not inherit the shared client's timeout
+MODEL_TIMEOUT = 60.0
 
 CHAPTER_PROMPT = """Given the book "{title}" by {author}, list all chapters with their numbers and titles.
 Return ONLY valid JSON: {{"chapters": [{{"chapter": 1, "title": "Chapter Title"}}, ...]}}.
@@ -43,66 +58,60 @@ def _kebab(s: str) -> str:
     return re.sub(r"[^a-z0-9]+", "-", s.lower()).strip("-")
 
 
-async def _search_open_library(query: str, author: str | None = None) -> dict | None:
-    """Search Open Library; return top result or None."""
+async def _search_open_library(
+    http: httpx.AsyncClient, query: str, author: str | None = None, cache: LookupCache | None = None
+) -> dict | None:
+    """Search Open Library; return top result or None. Results (and misses) are cached."""
     q = query if not author else f"{query} {author}"
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.get(
-            OPEN_LIBRARY_SEARCH,
-            params={"q": q, "limit": 1},
-            headers={"User-Agent": "ReadBrain/1.0 (https://github.com/readbrain)"},
-        )
+    if cache is not None and (hit := cache.get(q)) is not None:
+        return hit or None
+    try:
+        r = await http.get(OPEN_LIBRARY_SEARCH, params={"q": q, "limit": 1}, timeout=OPEN_LIBRARY_TIMEOUT)
         r.raise_for_status()
         data = r.json()
-    docs = data.get("docs", [])
-    if not docs:
+    except httpx.HTTPError:
         return None
-    d = docs[0]
-    return {
-        "title": d.get("title", query),
-        "author": (d.get("author_name") or ["Unknown"])[0],
-        "cover_i": d.get("cover_i"),
-        "first_publish_year": d.get("first_publish_year"),
-    }
+    docs = data.get("docs", [])
+    result = {}
+    if docs:
+        d = docs[0]
+        result = {
+            "title": d.get("title", query),
+            "author": (d.get("author_name") or ["Unknown"])[0],
+            "cover_i": d.get("cover_i"),
+            "first_publish_year": d.get("first_publish_year"),
+        }
+    if cache is not None:
+        cache.put(q, result)
+    return result or None
 
 
-async def _get_chapters_openai(client: AsyncOpenAI, title: str, author: str) -> list[dict]:
-    """Get chapter list from OpenAI."""
-    prompt = CHAPTER_PROMPT.format(title=title, author=author)
+async def _chat_json(client: AsyncOpenAI, prompt: str, temperature: float) -> dict:
     response = await client.chat.completions.create(
-        model="gpt-4o-mini",
+        model=MODEL,
         messages=[
             {"role": "system", "content": "Return ONLY valid JSON. No markdown, no code blocks."},
             {"role": "user", "content": prompt},
         ],
         response_format={"type": "json_object"},
-        temperature=0.2,
+        temperature=temperature,
     )
-    content = response.choices[0].message.content
-    data = json.loads(content)
+    return json.loads(response.choices[0].message.content)
+
+
+async def _get_chapters_openai(client: AsyncOpenAI, title: str, author: str) -> list[dict]:
+    """Get chapter list from OpenAI."""
+    data = await _chat_json(client, CHAPTER_PROMPT.format(title=title, author=author), 0.2)
     chapters = data.get("chapters", [])
     if not chapters:
         return [{"chapter": i, "title": f"Chapter {i}"} for i in range(1, 11)]
     return chapters
 
 
-async def _get_outlines_openai(
-    client: AsyncOpenAI, title: str, author: str, chapters: list[dict]
-) -> dict[str, str]:
-    """Get optional outline prompts per chapter."""
+async def _get_outlines_openai(client: AsyncOpenAI, title: str, author: str) -> dict[str, str]:
+    """Get optional outline prompts per chapter (keyed by chapter number, so no chapter list is needed)."""
     try:
-        prompt = OUTLINE_PROMPT.format(title=title, author=author)
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Return ONLY valid JSON. No markdown, no code blocks."},
-                {"role": "user", "content": prompt},
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.3,
-        )
-        content = response.choices[0].message.content
-        data = json.loads(content)
+        data = await _chat_json(client, OUTLINE_PROMPT.format(title=title, author=author), 0.3)
         return data.get("outlines", {})
     except Exception:
         return {}
@@ -110,61 +119,86 @@ async def _get_outlines_openai(
 
 async def _fallback_title_author_openai(client: AsyncOpenAI, query: str) -> tuple[str, str]:
     """When Open Library fails, infer title/author from query."""
-    prompt = FALLBACK_PROMPT.format(query=query)
-    response = await client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "Return ONLY valid JSON. No markdown, no code blocks."},
-            {"role": "user", "content": prompt},
-        ],
-        response_format={"type": "json_object"},
-        temperature=0.2,
-    )
-    data = json.loads(response.choices[0].message.content)
+    data = await _chat_json(client, FALLBACK_PROMPT.format(query=query), 0.2)
     return data.get("title", query), data.get("author", "Unknown")
 
 
-async def scaffold_book(
-    query: str,
-    author: str | None = None,
-    include_outlines: bool = True,
-) -> dict:
-    """
-    Scaffold a new book from a search query.
-    Returns {book_id, title, author, chapters_created}.
-    Raises FileExistsError if book folder exists, ValueError if no match.
-    """
+def _write_book(book_dir: Path, meta_yaml: dict, chapters: list[dict], outlines: dict[str, str]) -> None:
+    # Fails if another scaffold created the folder since the existence check
+    book_dir.mkdir(parents=True)
+    with open(book_dir / "meta.yaml", "w") as f:
+        yaml.dump(meta_yaml, f, default_flow_style=False, allow_unicode=True)
+
+    for ch in chapters:
+        num = ch.get("chapter", 0)
+        ch_title = ch.get("title", f"Chapter {num}")
+        slug = _kebab(ch_title)
+        if not slug:
+            slug = f"chapter-{num}"
+        filename = f"ch{num}-{slug}.md"
+        outline = outlines.get(str(num), "")
+        body = f"\n{outline}\n" if outline else ""
+        frontmatter = {
+            "chapter": num,
+            "title": ch_title,
+        }
+        content = "---\n"
+        content += yaml.dump(frontmatter, default_flow_style=False, allow_unicode=True)
+        content += "---\n"
+        content += body
+        (book_dir / filename).write_text(content, encoding="utf-8")
+
+
+def _open_clients(api_key: str, connections: int = 10) -> tuple[httpx.AsyncClient, AsyncOpenAI]:
+    """One connection pool for Open Library and the model API."""
+    http = httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT},
+        limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+    )
+    return http, AsyncOpenAI(api_key=api_key, http_client=http, timeout=MODEL_TIMEOUT)
+
+
+def _require_api_key() -> str:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY not set — required for scaffold")
+    return api_key
 
-    # 1. Search Open Library
-    meta = await _search_open_library(query, author)
+
+async def _scaffold(
+    http: httpx.AsyncClient,
+    client: AsyncOpenAI,
+    cache: LookupCache,
+    query: str,
+    author: str | None,
+    include_outlines: bool,
+) -> dict:
+    """Resolve the book, request its chapters and write the folder. Does not touch the graph."""
+    # 1. Search Open Library (cached on disk)
+    meta = await _search_open_library(http, query, author, cache)
     if meta:
         title = meta["title"]
         author_name = meta["author"]
         cover = f"{COVER_BASE}/{meta['cover_i']}-M.jpg" if meta.get("cover_i") else ""
     else:
         # 2. Fallback: OpenAI infers title/author
-        client = AsyncOpenAI(api_key=api_key)
         title, author_name = await _fallback_title_author_openai(client, query)
         cover = ""
 
-    # 3. Get chapter structure from OpenAI
-    client = AsyncOpenAI(api_key=api_key)
-    chapters = await _get_chapters_openai(client, title, author_name)
-    outlines: dict[str, str] = {}
-    if include_outlines and chapters:
-        outlines = await _get_outlines_openai(client, title, author_name, chapters)
-
-    # 4. Slugify and check book exists
+    # 3. Check the book does not exist before paying for the model calls
     book_id = _slugify(title)
     book_dir = BOOKS_DIR / book_id
     if book_dir.exists():
         raise FileExistsError(f"Book {book_id} already exists")
 
-    # 5. Create book dir and meta.yaml
-    book_dir.mkdir(parents=True, exist_ok=True)
+    # 4. Chapter structure and outlines only depend on title/author: request both at once
+    chapters_call = _get_chapters_openai(client, title, author_name)
+    if include_outlines:
+        chapters, outlines = await asyncio.gather(chapters_call, _get_outlines_openai(client, title, author_name))
+    else:
+        chapters, outlines = await chapters_call, {}
+
+    # 5. Create book dir, meta.yaml and chapter files
     meta_yaml = {
         "title": title,
         "author": author_name,
@@ -175,37 +209,140 @@ async def scaffold_book(
         "tags": ["new"],
         "totalChapters": len(chapters),
     }
-    with open(book_dir / "meta.yaml", "w") as f:
-        yaml.dump(meta_yaml, f, default_flow_style=False, allow_unicode=True)
-
-    # 6. Create chapter files
-    for ch in chapters:
-        num = ch.get("chapter", 0)
-        ch_title = ch.get("title", f"Chapter {num}")
-        slug = _kebab(ch_title)
-        if not slug:
-            slug = f"chapter-{num}"
-        filename = f"ch{num}-{slug}.md"
-        outline = outlines.get(str(num), "")
-        body = f"\n{outline}\n" if outline else ""
-        frontmatter = {
-            "chapter": num,
-            "title": ch_title,
-        }
-        content = "---\n"
-        content += yaml.dump(frontmatter, default_flow_style=False, allow_unicode=True)
-        content += "---\n"
-        content += body
-        (book_dir / filename).write_text(content, encoding="utf-8")
-
-    # 7. Rebuild graph
-    from app.services.build_graph import build_graph
-
-    await build_graph()
-
+    await asyncio.to_thread(_write_book, book_dir, meta_yaml, chapters, outlines)
     return {
         "book_id": book_id,
         "title": title,
         "author": author_name,
         "chapters_created": len(chapters),
     }
+
+
+async def scaffold_book(
+    query: str,
+    author: str | None = None,
+    include_outlines: bool = True,
+) -> dict:
+    """
+    Scaffold a new book from a search query.
+    Returns {book_id, title, author, chapters_created}.
+    Raises FileExistsError if book folder exists, ValueError if no match.
+    """
+    api_key = _require_api_key()
+    http, client = _open_clients(api_key)
+    cache = LookupCache()
+    try:
+        async with http:
+            result = await _scaffold(http, client, cache, query, author, include_outlines)
+    finally:
+        cache.close()
+
+    # 6. Add the new book to the graph; other books are served from the build cache
+    from app.services.build_graph import build_graph
+
+    await build_graph(changed_books={result["book_id"]})
+    return result
+
+
+def read_reading_list(path: Path) -> list[tuple[str, str | None]]:
+    """
+    (title, author or None) for each row of a CSV reading list. A `title,author`
+    header row is optional; blank rows, rows starting with # and repeats are ignored.
+    """
+    entries = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.reader(f):
+            row = [cell.strip() for cell in row]
+            if not row or not row[0] or row[0].startswith("#"):
+                continue
+            if not entries and row[0].lower() == "title":
+                continue
+            entries.append((row[0], row[1] if len(row) > 1 and row[1] else None))
+    return list(dict.fromkeys(entries))
+
+
+def _entry_key(title: str, author: str | None) -> str:
+    return " ".join(f"{title}|{author or ''}".lower().split())
+
+
+def _load_progress(path: Path | None) -> dict:
+    if path is None or not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("entries", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_progress(path: Path | None, entries: dict) -> None:
+    if path is None:
+        return
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"entries": entries}, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+async def scaffold_books(
+    entries: list[tuple[str, str | None]],
+    concurrency: int = DEFAULT_BULK_CONCURRENCY,
+    progress_file: Path | None = None,
+    include_outlines: bool = True,
+    on_result: Callable[[str, str | None, dict], None] | None = None,
+) -> dict:
+    """
+    Scaffold every (title, author) in `entries`, up to `concurrency` books at a
+    time over one connection pool, then update the graph once for all new books.
+
+    Each finished entry is recorded in `progress_file`; on a re-run, entries it
+    lists as created or existing are skipped (failed ones are retried), so an
+    interrupted import continues where it stopped. Books whose folder already
+    exists are skipped without any API call when the title's slug matches.
+
+    on_result, if given, is called with (title, author, outcome) per entry.
+    Returns {created, exists, failed, resumed}: lists of outcomes, and the number
+    of entries skipped from the progress file.
+    """
+    api_key = _require_api_key()
+    progress = _load_progress(progress_file)
+    results: dict = {"created": [], "exists": [], "failed": [], "resumed": 0}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    http, client = _open_clients(api_key, connections=max(10, 2 * concurrency))
+    cache = LookupCache()
+
+    async def scaffold_one(title: str, author: str | None) -> None:
+        key = _entry_key(title, author)
+        previous = progress.get(key)
+        if previous and previous["status"] != "failed":
+            results["resumed"] += 1
+            return
+        outcome = {"title": title, "author": author}
+        if (BOOKS_DIR / _slugify(title)).exists():
+            outcome.update(status="exists", bookId=_slugify(title))
+        else:
+            async with semaphore:
+                try:
+                    result = await _scaffold(http, client, cache, title, author, include_outlines)
+                    outcome.update(status="created", bookId=result["book_id"], chapters=result["chapters_created"])
+                except FileExistsError as e:
+                    outcome.update(status="exists", error=str(e))
+                except Exception as e:
+                    outcome.update(status="failed", error=f"{type(e).__name__}: {e}")
+        progress[key] = outcome
+        _save_progress(progress_file, progress)
+        results[outcome["status"]].append(outcome)
+        if on_result:
+            on_result(title, author, outcome)
+
+    try:
+        async with http:
+            await asyncio.gather(*(scaffold_one(title, author) for title, author in entries))
+    finally:
+        cache.close()
+
+    # Includes books created by an earlier, interrupted run whose graph update never happened
+    created = {o["bookId"] for o in progress.values() if o["status"] == "created"}
+    if created:
+        from app.services.build_graph import build_graph
+
+        await build_graph(changed_books=created)
+    return results
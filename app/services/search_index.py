@@ -0,0 +1,309 @@
+"""Inverted index over chapter text: BM25 ranking with field boosts and prefix matching."""
+import base64
+import hashlib
+import heapq
+import html
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Iterable
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+INDEX_FILE = PROJECT_ROOT / "site" / "public" / "search-index.json"
+# Bump when tokenizing, boosts or the file layout change; older files are rebuilt.
+INDEX_VERSION = 1
+
+# Each occurrence of a term in a field adds this much to the chapter's term frequency.
+FIELD_BOOSTS = {"title": 5, "concepts": 3, "keyThemes": 3, "summary": 2, "rawNotes": 1}
+K1 = 1.2
+B = 0.75
+# The last query word (the one still being typed) also matches longer terms starting
+# with it, if it has at least MIN_PREFIX characters: the MAX_EXPANSIONS most common,
+# each at PREFIX_WEIGHT of an exact match.
+MIN_PREFIX = 2
+MAX_EXPANSIONS = 20
+PREFIX_WEIGHT = 0.5
+# Deleted documents stay in the postings until they make up this share of the index.
+COMPACT_RATIO = 0.2
+SNIPPET_CHARS = 160
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _fields(chapter: dict) -> dict[str, str]:
+    out = {}
+    for field in FIELD_BOOSTS:
+        value = chapter.get(field) or ""
+        out[field] = " ".join(map(str, value)) if isinstance(value, list) else str(value)
+    return out
+
+
+def _signature(fields: dict[str, str]) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    for text in fields.values():
+        h.update(text.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _pack(a: array) -> str:
+    return base64.b64encode(a.tobytes()).decode()
+
+
+def _unpack(s: str) -> array:
+    a = array("I")
+    a.frombytes(base64.b64decode(s))
+    return a
+
+
+class SearchIndex:
+    """
+    Postings are append-only arrays of (document number, weighted term frequency).
+    Updating a chapter retires its old document number and appends a new one, so
+    an edit costs only that chapter's terms; retired numbers are skipped at query
+    time and dropped by compaction. Until then they still count towards document
+    frequencies, so idf drifts slightly with heavy churn.
+
+    update(), save() and search() hold a lock, so the index can be updated by a build
+    running in a worker thread while searches run in others.
+    """
+
+    def __init__(self, path: Path | None = INDEX_FILE):
+        self.path = path
+        self.docs: dict[str, int] = {}
+        self.ids: list[str | None] = []
+        self.signatures: dict[str, str] = {}
+        self.lengths = array("I")
+        self.total_length = 0
+        self.postings: dict[str, tuple[array, array]] = {}
+        self._terms: list[str] | None = None
+        self._norms: list[float] | None = None
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> "SearchIndex":
+        path = path or INDEX_FILE
+        index = cls(path)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if data.get("version") != INDEX_VERSION:
+            return index
+        index.ids = data["ids"]
+        index.docs = {cid: n for n, cid in enumerate(index.ids) if cid is not None}
+        index.signatures = data["signatures"]
+        index.lengths = _unpack(data["lengths"])
+        index.total_length = data["totalLength"]
+        index.postings = {t: (_unpack(d), _unpack(f)) for t, (d, f) in data["postings"].items()}
+        return index
+
+    def save(self) -> None:
+        """Write the index atomically if it changed since it was loaded or saved."""
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        data = {
+            "version": INDEX_VERSION,
+            "ids": self.ids,
+            "signatures": self.signatures,
+            "lengths": _pack(self.lengths),
+            "totalLength": self.total_length,
+            "postings": {t: [_pack(d), _pack(f)] for t, (d, f) in self.postings.items()},
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def update(self, chapters: Iterable[dict]) -> int:
+        """Bring the index in line with `chapters` (all of them); returns how many were (re)indexed or removed."""
+        with self._lock:
+            return self._update(chapters)
+
+    def _update(self, chapters: Iterable[dict]) -> int:
+        seen = set()
+        changed = 0
+        for chapter in chapters:
+            cid = chapter["id"]
+            seen.add(cid)
+            fields = _fields(chapter)
+            signature = _signature(fields)
+            if self.signatures.get(cid) == signature:
+                continue
+            self._remove(cid)
+            self._add(cid, fields, signature)
+            changed += 1
+        for cid in [c for c in self.docs if c not in seen]:
+            self._remove(cid)
+            changed += 1
+        if changed:
+            self._terms = None
+            self._norms = None
+            self._dirty = True
+            if len(self.ids) - len(self.docs) > COMPACT_RATIO * len(self.ids):
+                self._compact()
+        return changed
+
+    def _add(self, cid: str, fields: dict[str, str], signature: str) -> None:
+        counts: Counter[str] = Counter()
+        length = 0
+        for field, text in fields.items():
+            boost = FIELD_BOOSTS[field]
+            tokens = tokenize(text)
+            length += boost * len(tokens)
+            for token in tokens:
+                counts[token] += boost
+        n = len(self.ids)
+        self.ids.append(cid)
+        self.docs[cid] = n
+        self.signatures[cid] = signature
+        self.lengths.append(length)
+        self.total_length += length
+        for term, tf in counts.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array("I"), array("I"))
+            posting[0].append(n)
+            posting[1].append(tf)
+
+    def _remove(self, cid: str) -> None:
+        n = self.docs.pop(cid, None)
+        if n is None:
+            return
+        self.ids[n] = None
+        self.signatures.pop(cid, None)
+        self.total_length -= self.lengths[n]
+
+    def _compact(self) -> None:
+        """Renumber live documents and drop retired ones from every posting list."""
+        remap = {}
+        ids, lengths = [], array("I")
+        for n, cid in enumerate(self.ids):
+            if cid is not None:
+                remap[n] = len(ids)
+                ids.append(cid)
+                lengths.append(self.lengths[n])
+        postings = {}
+        for term, (docs, tfs) in self.postings.items():
+            new_docs, new_tfs = array("I"), array("I")
+            for n, tf in zip(docs, tfs):
+                m = remap.get(n)
+                if m is not None:
+                    new_docs.append(m)
+                    new_tfs.append(tf)
+            if new_docs:
+                postings[term] = (new_docs, new_tfs)
+        self.ids, self.lengths, self.postings = ids, lengths, postings
+        self.docs = {cid: n for n, cid in enumerate(ids)}
+
+    def _expand(self, token: str, prefix: bool) -> list[tuple[str, float]]:
+        """The token itself plus (if prefix) the most frequent longer terms it starts."""
+        terms = [(token, 1.0)] if token in self.postings else []
+        if not prefix or len(token) < MIN_PREFIX:
+            return terms
+        if self._terms is None:
+            self._terms = sorted(self.postings)
+        start = bisect_left(self._terms, token)
+        if start < len(self._terms) and self._terms[start] == token:
+            start += 1
+        candidates = []
+        for term in islice(self._terms, start, None):
+            if not term.startswith(token):
+                break
+            candidates.append(term)
+        if len(candidates) > MAX_EXPANSIONS:
+            candidates = heapq.nlargest(MAX_EXPANSIONS, candidates, key=lambda t: len(self.postings[t][0]))
+        return terms + [(t, PREFIX_WEIGHT) for t in candidates]
+
+    def search(self, query: str, limit: int = 10) -> tuple[list[tuple[str, float]], list[str]]:
+        """Top `limit` (chapter id, score) pairs, plus every index term the query matched."""
+        with self._lock:
+            return self._search(query, limit)
+
+    def _search(self, query: str, limit: int) -> tuple[list[tuple[str, float]], list[str]]:
+        n_docs = len(self.docs)
+        if not n_docs:
+            return [], []
+        if self._norms is None:
+            avg = self.total_length / n_docs
+            self._norms = [K1 * (1 - B + B * length / avg) for length in self.lengths]
+        norms, ids = self._norms, self.ids
+
+        tokens = list(dict.fromkeys(tokenize(query)))
+        expanded = [
+            (term, weight)
+            for i, token in enumerate(tokens)
+            for term, weight in self._expand(token, prefix=i == len(tokens) - 1)
+        ]
+        matched = [term for term, _ in expanded]
+        # Broad queries accumulate into a flat list (cheaper per posting than a dict)
+        dense = sum(len(self.postings[t][0]) for t in matched) > len(ids) // 4
+        scores: list[float] | dict[int, float] = [0.0] * len(ids) if dense else {}
+
+        for term, weight in expanded:
+            docs, tfs = self.postings[term]
+            df = len(docs)
+            w = weight * math.log(1 + (n_docs - df + 0.5) / (df + 0.5)) * (K1 + 1)
+            if dense:
+                for n, tf in zip(docs, tfs):
+                    scores[n] += w * tf / (tf + norms[n])
+            else:
+                for n, tf in zip(docs, tfs):
+                    scores[n] = scores.get(n, 0.0) + w * tf / (tf + norms[n])
+
+        if dense:
+            candidates = heapq.nlargest(limit + len(ids) - n_docs, range(len(ids)), key=scores.__getitem__)
+            top = [(n, scores[n]) for n in candidates if scores[n] > 0 and ids[n] is not None][:limit]
+        else:
+            top = heapq.nlargest(limit + len(ids) - n_docs, scores.items(), key=itemgetter(1))
+            top = [(n, score) for n, score in top if ids[n] is not None][:limit]
+        return [(ids[n], score) for n, score in top], matched
+
+
+def snippet(text: str, terms: list[str], width: int = SNIPPET_CHARS) -> str | None:
+    """HTML-escaped window of `text` around the first matched term, matches wrapped in <mark>."""
+    if not text or not terms:
+        return None
+    pattern = re.compile(
+        r"\b(?:" + "|".join(map(re.escape, sorted(set(terms), key=len, reverse=True))) + r")\b",
+        re.IGNORECASE,
+    )
+    text = " ".join(text.split())
+    first = pattern.search(text)
+    if first is None:
+        return None
+    start = max(0, first.start() - width // 3)
+    if start:
+        space = text.find(" ", start)
+        start = space + 1 if 0 <= space < first.start() else start
+    window = text[start:start + width]
+
+    parts, pos = [], 0
+    for m in pattern.finditer(window):
+        parts.append(html.escape(window[pos:m.start()]))
+        parts.append(f"<mark>{html.escape(m.group())}</mark>")
+        pos = m.end()
+    parts.append(html.escape(window[pos:]))
+    prefix = "…" if start else ""
+    suffix = "…" if start + width < len(text) else ""
+    return prefix + "".join(parts) + suffix
@@ -0,0 +1,69 @@
+"""Token counting and spend budgets for enrichment. Uses tiktoken when installed, else ~4 characters per token."""
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Tokenizer of the gpt-4o model family
+ENCODING_NAME = "o200k_base"
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding, tiktoken
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding(ENCODING_NAME)
+        except Exception:
+            # The BPE file is downloaded on first use; offline, fall back to the heuristic
+            tiktoken = None
+    return _encoding
+
+
+def count_tokens(*texts: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return sum(len(encoding.encode(t, disallowed_special=())) for t in texts)
+    return sum(len(t) for t in texts) // CHARS_PER_TOKEN + 1
+
+
+def truncate_tokens(text: str, limit: int) -> str:
+    """The longest prefix of `text` with at most `limit` tokens."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:limit * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= limit else encoding.decode(tokens[:limit])
+
+
+class Budget:
+    """
+    Spend cap for one run, in USD and/or tokens (None = unlimited). Each call
+    reserves its estimate before it starts and settles the actual usage after,
+    so concurrent calls cannot overshoot together.
+    """
+
+    def __init__(self, max_cost: float | None = None, max_tokens: int | None = None):
+        self.max_cost = max_cost
+        self.max_tokens = max_tokens
+        self.cost = 0.0
+        self.tokens = 0
+
+    def fits(self, tokens: int, cost: float) -> bool:
+        return (self.max_cost is None or self.cost + cost <= self.max_cost) and (
+            self.max_tokens is None or self.tokens + tokens <= self.max_tokens
+        )
+
+    def reserve(self, tokens: int, cost: float) -> bool:
+        if not self.fits(tokens, cost):
+            return False
+        self.tokens += tokens
+        self.cost += cost
+        return True
+
+    def settle(self, reserved: tuple[int, float], actual: tuple[int, float]) -> None:
+        """Replace a reservation with what the call actually used (or (0, 0.0) if it failed)."""
+        self.tokens += actual[0] - reserved[0]
+        self.cost += actual[1] - reserved[1]
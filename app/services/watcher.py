@@ -0,0 +1,52 @@
+"""Watch /books and apply changes to the in-memory graph as they happen."""
+import asyncio
+from pathlib import Path
+
+from app.services.build_graph import BOOKS_DIR
+from app.services.graph_store import GraphStore
+
+# Quiet period (ms) after the last change before a batch is applied, and the
+# longest (ms) a continuous burst of changes may be grouped into one batch.
+STEP_MS = 50
+DEBOUNCE_MS = 1000
+
+
+def _book_id(path: str) -> str | None:
+    try:
+        parts = Path(path).relative_to(BOOKS_DIR).parts
+    except ValueError:
+        return None
+    return parts[0] if parts and not parts[0].startswith((".", "_")) else None
+
+
+def _is_source(change, path: str) -> bool:
+    """Ignore editor swap/backup files and hidden files (e.g. .obsidian/)."""
+    name = Path(path).name
+    return not (name.startswith(".") or name.endswith(("~", ".swp", ".tmp")))
+
+
+async def watch_books(store: GraphStore, stop_event: asyncio.Event | None = None) -> None:
+    try:
+        from watchfiles import awatch
+    except ImportError:
+        print("⚠️  watchfiles not installed — live graph updates disabled")
+        return
+
+    store.watching = True
+    try:
+        async for changes in awatch(
+            BOOKS_DIR,
+            watch_filter=_is_source,
+            debounce=DEBOUNCE_MS,
+            step=STEP_MS,
+            stop_event=stop_event,
+        ):
+            books = {b for _, path in changes if (b := _book_id(path))}
+            if not books:
+                continue
+            try:
+                await store.apply_changes(books)
+            except Exception as e:
+                print(f"⚠️  Graph update failed for {', '.join(sorted(books))}: {e}")
+    finally:
+        store.watching = False
@@ -0,0 +1,37 @@
+"""StaticFiles that serves the precompressed .br/.gz sidecars written by the build."""
+import os
+from mimetypes import guess_type
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.services.encoding import SIDECARS, negotiate_encoding
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """If `<file>.br` or `<file>.gz` exists and the client accepts it, send that with Content-Encoding."""
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        offered = [e for e, suffix in SIDECARS.items() if os.path.isfile(f"{full_path}{suffix}")]
+        if not offered:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding"), offered)
+        if encoding is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+        else:
+            sidecar = f"{full_path}{SIDECARS[encoding]}"
+            response = FileResponse(
+                sidecar,
+                status_code=status_code,
+                stat_result=os.stat(sidecar),
+                media_type=guess_type(str(full_path))[0] or "text/plain",
+                headers={"Content-Encoding": encoding},
+            )
+            if self.is_not_modified(response.headers, request_headers):
+                response = NotModifiedResponse(response.headers)
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
@@ -0,0 +1 @@
+"""Performance benchmarks (synthetic library, fake OpenAI server). Run with `readbrain bench`."""
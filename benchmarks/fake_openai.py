@@ -0,0 +1,216 @@
+"""
+Local OpenAI-compatible chat completions server for enrichment and scaffold benchmarks,
+with the Files and Batches endpoints batch enrichment uses and a stand-in for the Open
+Library search API.
+Usage: python -m benchmarks.fake_openai [--port 8799] [--latency 0.3] [--rate-429 0.05]
+then set OPENAI_BASE_URL=http://127.0.0.1:8799/v1 and any OPENAI_API_KEY (and
+READBRAIN_OPENLIBRARY_URL=http://127.0.0.1:8799 for scaffold).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from email.parser import BytesParser
+from email.policy import HTTP
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+
+
+def _record(prompt: str) -> dict:
+    """A plausible enrichment response, stable for a given prompt."""
+    words = [w.strip('".,:') for w in prompt.split() if len(w) > 3]
+    rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+    pick = lambda k: " ".join(rng.choices(words or ["note"], k=k))
+    return {
+        "summary": pick(40),
+        "keyInsights": [pick(12) for _ in range(4)],
+        "quotableIdeas": [pick(10) for _ in range(2)],
+        "concepts": [pick(2) for _ in range(5)],
+        "actionableItems": [pick(8) for _ in range(3)],
+        "connectedIdeas": [pick(3) for _ in range(3)],
+        "emotionalResonance": pick(12),
+    }
+
+
+def _reply(prompt: str) -> dict:
+    """Answer the scaffold prompts in their expected shape, anything else as an enrichment."""
+    rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+    if "list all chapters" in prompt:
+        return {"chapters": [{"chapter": i, "title": f"Part {i}"} for i in range(1, rng.randint(8, 20) + 1)]}
+    if "prompt to help the reader" in prompt:
+        return {"outlines": {str(i): f"What stood out in chapter {i}?" for i in range(1, 21)}}
+    if "Infer the most likely book title" in prompt:
+        query = prompt.split('"')[1] if '"' in prompt else "Unknown"
+        return {"title": query.title(), "author": "Unknown"}
+    return _record(prompt)
+
+
+def _completion(body: dict, request_id: str) -> dict:
+    """A chat.completion object answering a chat completions request body."""
+    prompt = "\n".join(m["content"] for m in body["messages"])
+    content = json.dumps(_reply(prompt))
+    usage = {"prompt_tokens": len(prompt) // 4 + 1, "completion_tokens": len(content) // 4 + 1}
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    return {
+        "id": f"chatcmpl-{request_id}",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body["model"],
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+
+def _form_parts(content_type: str, body: bytes) -> dict[str, bytes]:
+    """Fields of a multipart/form-data body (stdlib only; no python-multipart needed)."""
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    return {
+        part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+        for part in message.iter_parts()
+    }
+
+
+def create_app(latency: float = 0.3, jitter: float = 0.1, rate_429: float = 0.0, seed: int | None = None) -> FastAPI:
+    """
+    Each call sleeps latency ± jitter seconds; a `rate_429` share of calls is
+    rejected with 429 and a short retry-after. GET /search.json answers like Open
+    Library (after the same latency), treating the query as the title.
+    GET /stats reports the call counts.
+
+    Batches complete as soon as they are created, answering every request of the
+    input file like /v1/chat/completions. Uploaded and generated files are kept in
+    app.state.files (id -> {"filename", "purpose", "content"}), batches in
+    app.state.batches, so tests can tamper with a batch's output before collecting it.
+    """
+    app = FastAPI(title="Fake OpenAI")
+    rng = random.Random(seed)
+    stats = {
+        "requests": 0, "completed": 0, "rateLimited": 0, "promptTokens": 0, "completionTokens": 0, "searches": 0,
+    }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        if rng.random() < rate_429:
+            stats["rateLimited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after-ms": "200"},
+            )
+        await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+        completion = _completion(body, f"fake{stats['requests']}")
+        stats["completed"] += 1
+        stats["promptTokens"] += completion["usage"]["prompt_tokens"]
+        stats["completionTokens"] += completion["usage"]["completion_tokens"]
+        return completion
+
+    files: dict[str, dict] = {}
+    batches: dict[str, dict] = {}
+    app.state.files, app.state.batches = files, batches
+
+    def file_object(file_id: str) -> dict:
+        f = files[file_id]
+        return {
+            "id": file_id, "object": "file", "bytes": len(f["content"]), "created_at": 0,
+            "filename": f["filename"], "purpose": f["purpose"], "status": "processed",
+        }
+
+    def add_file(filename: str, purpose: str, content: bytes) -> str:
+        file_id = f"file-fake{len(files) + 1}"
+        files[file_id] = {"filename": filename, "purpose": purpose, "content": content}
+        return file_id
+
+    @app.post("/v1/files")
+    async def upload_file(request: Request):
+        parts = _form_parts(request.headers["content-type"], await request.body())
+        file_id = add_file("upload.jsonl", parts.get("purpose", b"batch").decode(), parts["file"])
+        return file_object(file_id)
+
+    @app.get("/v1/files/{file_id}")
+    async def get_file(file_id: str):
+        if file_id not in files:
+            raise HTTPException(status_code=404, detail="No such file")
+        return file_object(file_id)
+
+    @app.get("/v1/files/{file_id}/content")
+    async def file_content(file_id: str):
+        if file_id not in files:
+            raise HTTPException(status_code=404, detail="No such file")
+        return Response(content=files[file_id]["content"], media_type="application/octet-stream")
+
+    @app.post("/v1/batches")
+    async def create_batch(request: Request):
+        body = await request.json()
+        if body["input_file_id"] not in files:
+            raise HTTPException(status_code=400, detail="No such input file")
+        batch_id = f"batch_fake{len(batches) + 1}"
+        lines = []
+        for n, line in enumerate(files[body["input_file_id"]]["content"].decode().splitlines()):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            completion = _completion(row["body"], f"{batch_id}-{n}")
+            stats["completed"] += 1
+            lines.append(json.dumps({
+                "id": f"batch_req_{n}",
+                "custom_id": row["custom_id"],
+                "response": {"status_code": 200, "request_id": f"req_{n}", "body": completion},
+                "error": None,
+            }))
+        output_file_id = add_file(f"{batch_id}_output.jsonl", "batch_output", ("\n".join(lines) + "\n").encode())
+        batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "errors": None,
+            "input_file_id": body["input_file_id"],
+            "completion_window": body["completion_window"],
+            "status": "completed",
+            "output_file_id": output_file_id,
+            "error_file_id": None,
+            "created_at": 0,
+            "request_counts": {"total": len(lines), "completed": len(lines), "failed": 0},
+            "metadata": body.get("metadata"),
+        }
+        return batches[batch_id]
+
+    @app.get("/v1/batches/{batch_id}")
+    async def get_batch(batch_id: str):
+        if batch_id not in batches:
+            raise HTTPException(status_code=404, detail="No such batch")
+        return batches[batch_id]
+
+    @app.get("/search.json")
+    async def search(q: str, limit: int = 1):
+        stats["searches"] += 1
+        await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+        return {"numFound": 1, "docs": [{"title": q.title(), "author_name": ["Fake Author"], "cover_i": None}][:limit]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main() -> int:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server for benchmarks")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds per completion (default: 0.3)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="± seconds of random latency (default: 0.1)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of calls answered with 429 (default: 0)")
+    parser.add_argument("--seed", type=int, default=None)
+    ns = parser.parse_args()
+    app = create_app(latency=ns.latency, jitter=ns.jitter, rate_429=ns.rate_429, seed=ns.seed)
+    uvicorn.run(app, host="127.0.0.1", port=ns.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
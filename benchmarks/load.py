@@ -0,0 +1,114 @@
+"""
+Load test of /api/graph against a real server: requests per second from concurrent
+clients, for a full response, an If-None-Match revalidation (304) and a build per
+request (POST /api/rebuild: a warm build, roughly what every GET cost before the
+in-memory snapshot, minus rewriting graph-data.json).
+Usage: python -m benchmarks.load [--books 5] [--chapters 10] [--clients 16] [--seconds 5]
+"""
+import argparse
+import asyncio
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.run import PROJECT_ROOT, _API_SERVER, _free_port, _latency, _log
+from benchmarks.synth import LibrarySpec, generate_library
+
+# name -> (method, path, send the ETag of the first response as If-None-Match)
+SCENARIOS = {
+    "rebuild": ("POST", "/api/rebuild", False),
+    "graph": ("GET", "/api/graph", False),
+    "not_modified": ("GET", "/api/graph", True),
+}
+
+
+async def _scenario(base_url: str, method: str, path: str, revalidate: bool, clients: int, seconds: float) -> dict:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        headers = {}
+        if revalidate:
+            headers["If-None-Match"] = (await client.get(path)).headers["ETag"]
+        samples, statuses = [], {}
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.request(method, path, headers=headers)
+                samples.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+    return {
+        **_latency(samples),
+        # Throughput of the whole run (per_s above is per client)
+        "requests_per_s": round(len(samples) / elapsed, 1),
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+def run_load(books: Path, work: Path, clients: int, seconds: float, scenarios: list[str]) -> dict:
+    """Serve `books` from a fresh server process and run each scenario against it."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-c", _API_SERVER, str(books), str(work), str(port)],
+        cwd=PROJECT_ROOT, stdout=subprocess.PIPE, text=True,
+    )
+    results = {}
+    try:
+        if process.stdout.readline().strip() != "ready":
+            raise RuntimeError("load test server exited")
+        base_url = f"http://127.0.0.1:{port}"
+        for name in scenarios:
+            method, path, revalidate = SCENARIOS[name]
+            results[name] = asyncio.run(_scenario(base_url, method, path, revalidate, clients, seconds))
+            _log(f"  {name}: {results[name]['requests_per_s']} req/s, p50 {results[name]['p50_ms']}ms,"
+                 f" statuses {results[name]['statuses']}")
+    finally:
+        process.terminate()
+        process.wait()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test /api/graph with concurrent clients")
+    parser.add_argument("--books", type=int, default=5)
+    parser.add_argument("--chapters", type=int, default=10)
+    parser.add_argument("--library", type=Path, help="Serve a copy of this books/ directory instead of a synthetic one")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients (default: 16)")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each scenario (default: 5)")
+    parser.add_argument("--only", metavar="NAMES", help=f"Comma-separated subset: {','.join(SCENARIOS)}")
+    parser.add_argument("-o", "--output", type=Path, help="Write the results as JSON")
+    ns = parser.parse_args()
+    scenarios = ns.only.split(",") if ns.only else list(SCENARIOS)
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        print(f"Error: unknown scenario {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    with tempfile.TemporaryDirectory(prefix="readbrain-load-") as tmp:
+        work = Path(tmp)
+        books = work / "books"
+        if ns.library:
+            shutil.copytree(ns.library, books)
+        else:
+            generate_library(books, LibrarySpec(books=ns.books, chapters=ns.chapters))
+        _log(f"🌐 /api/graph load test, {ns.clients} clients, {ns.seconds:g}s per scenario")
+        results = run_load(books, work, ns.clients, ns.seconds, scenarios)
+    report = {"clients": ns.clients, "seconds": ns.seconds, "results": results}
+    if ns.output:
+        ns.output.write_text(json.dumps(report, indent=2) + "\n")
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,717 @@
+"""
+Benchmarks for the build, API, search, related-chapters, enrichment and scaffold paths, run against a synthetic
+library in a scratch directory. Results are JSON so runs can be compared across commits:
+
+    readbrain bench --output before.json
+    git checkout other-branch
+    readbrain bench --compare before.json
+"""
+import asyncio
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.synth import LibrarySpec, generate_library
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_VERSION = 1
+BENCHMARKS = ("cold_build", "warm_build", "edit_build", "api_graph", "api_stream", "rebuild_burst", "search", "neighbors", "related", "startup", "enrich", "scaffold")
+# Library sizes of the startup benchmark, as multiples of the generated library's book count
+STARTUP_SCALES = (0.1, 1, 5)
+
+
+def _log(message: str) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+
+def _git_commit() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "app"))}
+
+
+def _latency(samples: list[float]) -> dict:
+    """Milliseconds: p50/p95/p99/max, plus operations per second."""
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        "n": len(ordered),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "per_s": round(len(ordered) / sum(ordered), 1) if sum(ordered) else None,
+    }
+
+
+def _runs(samples: list[float]) -> dict:
+    return {
+        "seconds": round(min(samples), 4),
+        "median_s": round(statistics.median(samples), 4),
+        "runs": [round(s, 4) for s in samples],
+    }
+
+
+@contextlib.contextmanager
+def use_library(books: Path, work: Path):
+    """Point the build, graph store, change sets, enrichment and scaffold at `books`, with outputs and caches under `work`."""
+    from app.services import (
+        batch, build_cache, build_graph, changeset, enrich, enrich_cache, graph_store, library_index,
+        lookup_cache, related, scaffold, search_index,
+    )
+
+    output = work / "public" / "graph-data.json"
+    with contextlib.ExitStack() as stack:
+        for module, name, value in [
+            (build_graph, "BOOKS_DIR", books),
+            (build_graph, "OUTPUT_FILE", output),
+            (build_graph, "SKELETON_FILE", output.with_name("graph-skeleton.json")),
+            (build_graph, "CHAPTERS_DIR", output.with_name("chapters")),
+            (graph_store, "BOOKS_DIR", books),
+            (enrich, "BOOKS_DIR", books),
+            (batch, "BOOKS_DIR", books),
+            (batch, "BATCH_DIR", work / "batches"),
+            (batch, "STATE_FILE", work / "batches" / "state.json"),
+            (changeset, "BOOKS_DIR", books),
+            (scaffold, "BOOKS_DIR", books),
+            # Caches and indexes opened with their default paths (e.g. by a build after a scaffold)
+            (build_cache, "CACHE_FILE", work / "build-cache.json"),
+            (search_index, "INDEX_FILE", work / "search-index.json"),
+            (related, "RELATED_FILE", work / "related.json"),
+            (library_index, "INDEX_FILE", work / "library.sqlite"),
+            (enrich_cache, "CACHE_FILE", work / "enrich-cache.sqlite"),
+            (lookup_cache, "CACHE_FILE", work / "lookup-cache.sqlite"),
+        ]:
+            stack.enter_context(mock.patch.object(module, name, value))
+        yield
+
+
+async def _build(work: Path, cache, **kwargs) -> tuple[float, dict]:
+    from app.services.build_graph import build_graph
+    from app.services.related import RelatedIndex
+    from app.services.search_index import SearchIndex
+
+    search = SearchIndex.load(work / "search-index.json")
+    related = RelatedIndex.load(work / "related.json")
+    start = time.perf_counter()
+    data = await build_graph(cache=cache, search=search, related=related, **kwargs)
+    return time.perf_counter() - start, data
+
+
+async def bench_builds(books: Path, work: Path, repeat: int, only: set[str]) -> dict:
+    from app.services.build_cache import BuildCache
+
+    cache_file = work / "build-cache.json"
+    results = {}
+    cold = []
+    for _ in range(repeat if "cold_build" in only else 1):
+        cache_file.unlink(missing_ok=True)
+        (work / "search-index.json").unlink(missing_ok=True)
+        (work / "related.json").unlink(missing_ok=True)
+        shutil.rmtree(work / "public", ignore_errors=True)
+        seconds, data = await _build(work, BuildCache(cache_file))
+        cold.append(seconds)
+    if "cold_build" in only:
+        results["cold_build"] = {**_runs(cold), "stats": data["stats"]}
+        _log(f"  cold build: {min(cold):.3f}s")
+
+    if "warm_build" in only:
+        warm = []
+        for _ in range(repeat):
+            cache = BuildCache.load(cache_file)
+            seconds, _ = await _build(work, cache)
+            warm.append(seconds)
+        results["warm_build"] = {**_runs(warm), "reused": cache.reused, "reparsed": cache.reparsed}
+        _log(f"  warm build: {min(warm):.3f}s")
+
+    if "edit_build" in only:
+        edits = []
+        notes = sorted(books.glob("*/ch*.md"))
+        for i in range(repeat):
+            note = notes[(i * 7919) % len(notes)]
+            with open(note, "a") as f:
+                f.write(f"\nEdited for benchmark run {i}.\n")
+            cache = BuildCache.load(cache_file)
+            seconds, _ = await _build(work, cache, changed_books={note.parent.name})
+            edits.append(seconds)
+        results["edit_build"] = {**_runs(edits), "reparsed": cache.reparsed}
+        _log(f"  one-chapter edit: {min(edits):.3f}s")
+    return results
+
+
+def _queries(chapters: list[dict], n: int, rng: random.Random) -> list[str]:
+    """1-3 words from real notes; the last word is cut to a prefix 30% of the time."""
+    from app.services.search_index import tokenize
+
+    words = [w for c in rng.sample(chapters, min(len(chapters), 200)) for w in tokenize(c.get("rawNotes") or "")]
+    queries = []
+    for _ in range(n):
+        picked = rng.choices(words, k=rng.choice([1, 2, 3]))
+        if rng.random() < 0.3 and len(picked[-1]) > 3:
+            picked[-1] = picked[-1][:3]
+        queries.append(" ".join(picked))
+    return queries
+
+
+async def bench_api(work: Path, requests: int, rng: random.Random) -> dict:
+    """GET /api/graph variants, /api/chapters, /api/neighbors and /api/search through the ASGI app (no network)."""
+    from httpx import ASGITransport, AsyncClient
+
+    from app.main import app
+    from app.routes import (
+        chapters as chapters_routes, graph as graph_routes, neighbors as neighbors_routes, search as search_routes,
+    )
+    from app.services.build_cache import BuildCache
+    from app.services.graph_store import GraphStore
+    from app.services.related import RelatedIndex
+    from app.services.search_index import SearchIndex
+
+    store = GraphStore(
+        cache=BuildCache.load(work / "build-cache.json"),
+        search=SearchIndex.load(work / "search-index.json"),
+        related=RelatedIndex.load(work / "related.json"),
+    )
+    store.watching = True
+    snapshot = await store.rebuild()
+    ids = list(snapshot.chapters)
+    queries = _queries(list(snapshot.chapters.values()), requests, rng)
+
+    variants = {
+        "graph_json": lambda i: ("/api/graph", {}),
+        "graph_gzip": lambda i: ("/api/graph", {"Accept-Encoding": "gzip"}),
+        "graph_skeleton": lambda i: ("/api/graph?view=skeleton", {"Accept-Encoding": "gzip"}),
+        "graph_not_modified": lambda i: ("/api/graph", {"If-None-Match": snapshot.etag}),
+        "chapters_10": lambda i: ("/api/chapters?ids=" + ",".join(rng.sample(ids, min(10, len(ids)))), {}),
+        "neighbors": lambda i: (f"/api/neighbors/{rng.choice(ids)}?depth=2", {}),
+        "search": lambda i: (f"/api/search?q={queries[i]}", {}),
+    }
+    results = {}
+    with contextlib.ExitStack() as stack:
+        for module in (chapters_routes, graph_routes, neighbors_routes, search_routes):
+            stack.enter_context(mock.patch.object(module, "graph_store", store))
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            for name, request in variants.items():
+                samples, size = [], 0
+                for i in range(requests + 1):
+                    url, headers = request(i % requests)
+                    start = time.perf_counter()
+                    response = await client.get(url, headers=headers)
+                    samples.append(time.perf_counter() - start)
+                    assert response.status_code in (200, 304), (url, response.status_code)
+                    size = len(response.content)
+                # The first request also pays for serializing the snapshot
+                results[name] = {"first_ms": round(samples[0] * 1000, 3), **_latency(samples[1:]), "bytes": size}
+                _log(f"  {name}: p50 {results[name]['p50_ms']}ms, {results[name]['per_s']}/s")
+    return results
+
+
+async def bench_rebuild_burst(books: Path, work: Path, requests: int, rng: random.Random) -> dict:
+    """`requests` concurrent rebuilds and incremental updates after an edit; the store should coalesce them."""
+    from app.services.build_cache import BuildCache
+    from app.services.graph_store import GraphStore
+    from app.services.related import RelatedIndex
+    from app.services.search_index import SearchIndex
+
+    store = GraphStore(
+        cache=BuildCache.load(work / "build-cache.json"),
+        search=SearchIndex.load(work / "search-index.json"),
+        related=RelatedIndex.load(work / "related.json"),
+    )
+    await store.rebuild()
+    store.builds = 0
+    book_ids = sorted(p.name for p in books.iterdir() if p.is_dir())
+    note = rng.choice(sorted(books.glob("*/ch*.md")))
+    with open(note, "a") as f:
+        f.write("\nEdited for the rebuild burst.\n")
+    start = time.perf_counter()
+    snapshots = await asyncio.gather(*(
+        store.rebuild() if i % 4 == 0 else store.apply_changes({rng.choice(book_ids)})
+        for i in range(requests)
+    ))
+    seconds = time.perf_counter() - start
+    result = {
+        "requests": requests,
+        "builds": store.builds,
+        "versions": len({s.version for s in snapshots}),
+        "seconds": round(seconds, 4),
+    }
+    _log(f"  {requests} concurrent rebuilds: {store.builds} builds, {seconds:.3f}s")
+    return result
+
+
+def bench_search(work: Path, queries: int, rng: random.Random) -> dict:
+    from app.services.search_index import SearchIndex
+
+    index = SearchIndex.load(work / "search-index.json")
+    graph = json.loads((work / "public" / "graph-data.json").read_bytes())
+    chapters = [c for b in graph["books"] for c in b["chapters"]]
+    samples = []
+    for query in _queries(chapters, queries, rng):
+        start = time.perf_counter()
+        index.search(query, 10)
+        samples.append(time.perf_counter() - start)
+    result = {**_latency(samples), "documents": len(index.docs), "terms": len(index.postings)}
+    _log(f"  search: p50 {result['p50_ms']}ms, p99 {result['p99_ms']}ms")
+    return result
+
+
+def bench_neighbors(work: Path, queries: int, rng: random.Random) -> dict:
+    """Building the adjacency index, then depth-2 neighbourhoods of random chapters and concepts."""
+    from app.services.neighbors import AdjacencyIndex
+
+    graph = json.loads((work / "public" / "graph-data.json").read_bytes())
+    start = time.perf_counter()
+    index = AdjacencyIndex(graph)
+    seconds = time.perf_counter() - start
+    chapter_ids = [c["id"] for c in index.chapters]
+    concepts = list(index.concepts)
+    result = {
+        "index": {"seconds": round(seconds, 4)},
+        "chapters": len(chapter_ids),
+        "concepts": len(concepts),
+        "edges": len(graph["conceptGraph"]["edges"]),
+    }
+    for name, keys in (("chapter", chapter_ids), ("concept", concepts)):
+        samples = []
+        for key in (rng.choice(keys) for _ in range(queries if keys else 0)):
+            start = time.perf_counter()
+            index.neighbourhood(key, depth=2, limit=50)
+            samples.append(time.perf_counter() - start)
+        if samples:
+            result[name] = _latency(samples)
+            _log(f"  {name} neighbourhood: p50 {result[name]['p50_ms']}ms, p99 {result[name]['p99_ms']}ms")
+    _log(f"  adjacency index: {seconds:.3f}s for {len(chapter_ids)} chapters, {result['edges']} edges")
+    return result
+
+
+def bench_related(work: Path, repeat: int) -> dict:
+    """
+    A full related-chapters pass over the library, then a one-chapter edit as a build
+    and as a server delta (incremental), with peak memory.
+    """
+    import tracemalloc
+
+    from app.services import related
+
+    graph = json.loads((work / "public" / "graph-data.json").read_bytes())
+    chapters = [c for b in graph["books"] for c in b["chapters"]]
+    full, edits, deltas = [], [], []
+    for i in range(repeat):
+        index = related.RelatedIndex(path=None)
+        start = time.perf_counter()
+        index.update(chapters)
+        full.append(time.perf_counter() - start)
+        edited = dict(chapters[(i * 7919) % len(chapters)])
+        edited["rawNotes"] = (edited.get("rawNotes") or "") + f"\nEdited for benchmark run {i}.\n"
+        start = time.perf_counter()
+        index.update([edited if c["id"] == edited["id"] else c for c in chapters])
+        edits.append(time.perf_counter() - start)
+        edited["rawNotes"] += "Edited again.\n"
+        start = time.perf_counter()
+        index.update([edited if c["id"] == edited["id"] else c for c in chapters], incremental=True)
+        deltas.append(time.perf_counter() - start)
+    # Separate pass: tracing allocations slows Python code down severalfold
+    tracemalloc.start()
+    related.RelatedIndex(path=None).update(chapters)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result = {
+        "full": _runs(full),
+        "edit": _runs(edits),
+        "delta": _runs(deltas),
+        "peak_bytes": peak,
+        "backend": "scipy" if related.HAVE_SCIPY else "python",
+        "chapters": len(chapters),
+    }
+    _log(f"  related ({result['backend']}): full {min(full):.3f}s, one-chapter edit {min(edits):.3f}s"
+         f" (delta {min(deltas):.3f}s),"
+         f" peak {peak / 2**20:.1f} MiB")
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# A server process for the startup benchmark: prints its import time, then serves
+# the library in argv[1] with outputs and caches under argv[2] on port argv[3].
+_STARTUP_SERVER = """
+import sys, time
+start = time.perf_counter()
+import app.main
+print(time.perf_counter() - start, flush=True)
+from pathlib import Path
+import uvicorn
+from benchmarks.run import use_library
+with use_library(Path(sys.argv[1]), Path(sys.argv[2])):
+    uvicorn.run(app.main.app, host="127.0.0.1", port=int(sys.argv[3]), log_level="warning")
+"""
+
+
+# A server process for the api_stream benchmark: builds the library in argv[1] (outputs
+# and caches under argv[2]), prints "ready", then serves it on port argv[3].
+_API_SERVER = """
+import asyncio, sys
+from pathlib import Path
+import uvicorn
+from benchmarks.run import use_library
+
+async def main():
+    from app.main import app
+    from app.services.graph_store import graph_store
+
+    await graph_store.rebuild()
+    print("ready", flush=True)
+    config = uvicorn.Config(app, host="127.0.0.1", port=int(sys.argv[3]), lifespan="off", log_level="warning")
+    await uvicorn.Server(config).serve()
+
+with use_library(Path(sys.argv[1]), Path(sys.argv[2])):
+    asyncio.run(main())
+"""
+# /api/graph variants of the api_stream benchmark: (Accept, Accept-Encoding)
+STREAM_VARIANTS = {
+    "json": ("application/json", "identity"),
+    "json_gzip": ("application/json", "gzip"),
+    "ndjson": ("application/x-ndjson", "identity"),
+    "ndjson_gzip": ("application/x-ndjson", "gzip"),
+}
+
+
+def _memory(pid: int) -> dict[str, int]:
+    """Current (VmRSS) and peak (VmHWM) resident memory of a process, in bytes (Linux only)."""
+    with open(f"/proc/{pid}/status") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return {name: int(fields[name].split()[0]) * 1024 for name in ("VmRSS", "VmHWM")}
+
+
+def bench_api_stream(books: Path, work: Path) -> dict:
+    """
+    The full /api/graph, buffered (one body) and streamed (NDJSON), each from a fresh
+    server process: time to the first byte, total time, and how far resident memory
+    rose above its level before the request.
+    """
+    import httpx
+
+    results = {}
+    for name, (accept, accept_encoding) in STREAM_VARIANTS.items():
+        port = _free_port()
+        process = subprocess.Popen(
+            [sys.executable, "-c", _API_SERVER, str(books), str(work), str(port)],
+            cwd=PROJECT_ROOT, stdout=subprocess.PIPE, text=True,
+        )
+        try:
+            if process.stdout.readline().strip() != "ready":
+                raise RuntimeError("benchmark server exited")
+            with httpx.Client(timeout=600) as client:
+                for _ in range(500):
+                    try:
+                        client.get(f"http://127.0.0.1:{port}/api/search?q=x")
+                        break
+                    except httpx.TransportError:
+                        time.sleep(0.02)
+                # Reset the peak to the current level (Linux >= 4.0), so VmHWM covers the request only
+                with open(f"/proc/{process.pid}/clear_refs", "w") as f:
+                    f.write("5")
+                before = _memory(process.pid)["VmRSS"]
+                start = time.perf_counter()
+                first, size = None, 0
+                headers = {"Accept": accept, "Accept-Encoding": accept_encoding}
+                with client.stream("GET", f"http://127.0.0.1:{port}/api/graph", headers=headers) as response:
+                    for chunk in response.iter_raw():
+                        first = first if first is not None else time.perf_counter() - start
+                        size += len(chunk)
+                seconds = time.perf_counter() - start
+                peak = _memory(process.pid)["VmHWM"]
+        finally:
+            process.terminate()
+            process.wait()
+        results[name] = {
+            "first_ms": round(first * 1000, 3),
+            "seconds": round(seconds, 4),
+            "peak_rss_bytes": peak - before,
+            "bytes": size,
+        }
+        _log(f"  {name}: first byte {first * 1000:.1f}ms, total {seconds:.3f}s,"
+             f" peak RSS +{(peak - before) / 2**20:.1f} MiB, {size / 2**20:.1f} MiB")
+    return results
+
+
+def _first_response(books: Path, work: Path) -> tuple[float, float]:
+    """Start a server process; returns (seconds to import app.main, seconds from spawn to the first 200)."""
+    import httpx
+
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", _STARTUP_SERVER, str(books), str(work), str(port)],
+        cwd=PROJECT_ROOT, stdout=subprocess.PIPE, text=True, env={**os.environ, "READBRAIN_WATCH": "0"},
+    )
+    try:
+        with httpx.Client(timeout=600) as client:
+            while True:
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/api/graph?view=skeleton").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if process.poll() is not None:
+                    raise RuntimeError("benchmark server exited")
+                # Not too often: the poller shares the CPU with the server it waits for
+                time.sleep(0.05)
+        first = time.perf_counter() - start
+    finally:
+        process.terminate()
+        imported = float(process.communicate()[0].split()[0])
+    return imported, first
+
+
+def bench_startup(spec: LibrarySpec, work: Path, repeat: int, library: Path | None) -> dict:
+    """
+    Fresh server processes at several library sizes: import time, and time to the first
+    200 from /api/graph with no graph on disk yet (cold, waits for a build) and with the
+    one that build wrote (warm, served while the background build runs).
+    """
+    results = {}
+    if library:
+        sizes = [(library, None)]
+    else:
+        sizes = [(None, max(1, round(spec.books * scale))) for scale in STARTUP_SCALES]
+    for books, n_books in sizes:
+        root = work / "startup" / str(n_books or "library")
+        if books is None:
+            books = root / "books"
+            generate_library(books, dataclasses.replace(spec, books=n_books))
+        chapters = sum(1 for _ in books.glob("*/ch*.md"))
+        imports, cold, warm = [], [], []
+        for _ in range(repeat):
+            state = root / "state"
+            shutil.rmtree(state, ignore_errors=True)
+            state.mkdir(parents=True)
+            imported, seconds = _first_response(books, state)
+            imports.append(imported)
+            cold.append(seconds)
+            imported, seconds = _first_response(books, state)
+            imports.append(imported)
+            warm.append(seconds)
+        results[f"chapters_{chapters}"] = {"import": _runs(imports), "cold": _runs(cold), "warm": _runs(warm)}
+        _log(f"  {chapters} chapters: import {min(imports):.3f}s, first 200 cold {min(cold):.3f}s,"
+             f" warm {min(warm):.3f}s")
+    return results
+
+
+@contextlib.contextmanager
+def fake_openai(latency: float, rate_429: float):
+    """Run benchmarks.fake_openai in a subprocess; yields its base URL."""
+    import httpx
+
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openai", "--port", str(port),
+         "--latency", str(latency), "--rate-429", str(rate_429), "--seed", "1"],
+        cwd=PROJECT_ROOT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{base_url}/stats", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("fake OpenAI server did not start")
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def bench_enrich(work: Path, chapters: int, concurrency: int, latency: float, rate_429: float) -> dict:
+    """Enrich `chapters` new chapters against the fake server (a separate library, so builds are unaffected)."""
+    import httpx
+
+    from app.services import enrich
+
+    books = work / "enrich-books"
+    shutil.rmtree(books, ignore_errors=True)
+    per_book = 10
+    generate_library(books, LibrarySpec(books=-(-chapters // per_book), chapters=per_book, enriched=0.0, seed=2))
+    with fake_openai(latency, rate_429) as base_url, mock.patch.object(enrich, "BOOKS_DIR", books), \
+            mock.patch.dict(os.environ, {"OPENAI_API_KEY": "bench", "OPENAI_BASE_URL": f"{base_url}/v1"}):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = await enrich.enrich_new_chapters(concurrency=concurrency, rpm=None, tpm=None)
+        seconds = time.perf_counter() - start
+        server = httpx.get(f"{base_url}/stats").json()
+    done = results["enriched"] + results["cached"]
+    result = {
+        "seconds": round(seconds, 3),
+        "chapters_per_s": round(done / seconds, 2),
+        "concurrency": concurrency,
+        "latency_s": latency,
+        "rate_429": rate_429,
+        "results": results,
+        "server": server,
+    }
+    _log(f"  enrich: {done} chapters in {seconds:.2f}s ({result['chapters_per_s']}/s)")
+    return result
+
+
+async def bench_scaffold(work: Path, books: int, concurrency: int, latency: float, rate_429: float) -> dict:
+    """Bulk-scaffold `books` new books into the library against the fake Open Library and OpenAI."""
+    import httpx
+
+    from app.services import scaffold
+
+    entries = [(f"Bench Reading List {i:04d}", None) for i in range(books)]
+    progress = work / "scaffold-progress.json"
+    with fake_openai(latency, rate_429) as base_url, \
+            mock.patch.object(scaffold, "OPEN_LIBRARY_SEARCH", f"{base_url}/search.json"), \
+            mock.patch.dict(os.environ, {"OPENAI_API_KEY": "bench", "OPENAI_BASE_URL": f"{base_url}/v1"}):
+        start = time.perf_counter()
+        results = await scaffold.scaffold_books(entries, concurrency=concurrency, progress_file=progress)
+        seconds = time.perf_counter() - start
+        server = httpx.get(f"{base_url}/stats").json()
+    result = {
+        "seconds": round(seconds, 3),
+        "books_per_s": round(len(results["created"]) / seconds, 2),
+        "concurrency": concurrency,
+        "latency_s": latency,
+        "created": len(results["created"]),
+        "failed": len(results["failed"]),
+        "server": server,
+    }
+    _log(f"  scaffold: {len(results['created'])} books in {seconds:.2f}s ({result['books_per_s']}/s)")
+    return result
+
+
+async def run_benchmarks(
+    spec: LibrarySpec,
+    only: list[str] | None = None,
+    repeat: int = 3,
+    requests: int = 200,
+    queries: int = 500,
+    enrich_chapters: int = 50,
+    scaffold_books: int = 20,
+    concurrency: int = 8,
+    latency: float = 0.3,
+    rate_429: float = 0.0,
+    library: Path | None = None,
+) -> dict:
+    """Run the selected benchmarks (all by default) and return the results document."""
+    only = set(only or BENCHMARKS)
+    rng = random.Random(spec.seed)
+    report = {
+        "version": RESULTS_VERSION,
+        **_git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="readbrain-bench-") as tmp:
+        work = Path(tmp)
+        books = work / "books"
+        if library:
+            shutil.copytree(library, books)
+            report["library"] = {"path": str(library)}
+        else:
+            _log(f"📚 Generating {spec.books} books × {spec.chapters} chapters...")
+            report["library"] = generate_library(books, spec)
+
+        results = report["results"]
+        with use_library(books, work):
+            # Every other benchmark reads the output of a cold build
+            if only - {"startup", "enrich", "scaffold"}:
+                _log("🔨 Builds")
+                results.update(await bench_builds(books, work, repeat, only))
+            if "api_graph" in only:
+                _log("🌐 API")
+                results["api_graph"] = await bench_api(work, requests, rng)
+            if "api_stream" in only:
+                _log("🌊 Streamed /api/graph")
+                results["api_stream"] = bench_api_stream(books, work)
+            if "rebuild_burst" in only:
+                _log("🔁 Rebuild burst")
+                results["rebuild_burst"] = await bench_rebuild_burst(books, work, requests, rng)
+            if "search" in only:
+                _log("🔎 Search")
+                results["search"] = bench_search(work, queries, rng)
+            if "neighbors" in only:
+                _log("🕸️ Neighbourhoods")
+                results["neighbors"] = bench_neighbors(work, queries, rng)
+            if "related" in only:
+                _log("🧭 Related chapters")
+                results["related"] = bench_related(work, repeat)
+            if "startup" in only:
+                _log("🚀 Server startup")
+                results["startup"] = bench_startup(spec, work, repeat, library)
+            if "enrich" in only:
+                _log("🤖 Enrichment")
+                results["enrich"] = await bench_enrich(work, enrich_chapters, concurrency, latency, rate_429)
+            if "scaffold" in only:
+                # Last: it adds books to the library the other benchmarks read
+                _log("📚 Scaffold")
+                results["scaffold"] = await bench_scaffold(work, scaffold_books, concurrency, latency, rate_429)
+    return report
+
+
+# Metrics where bigger is better; everything else numeric is a time or a size.
+_HIGHER_IS_BETTER = ("per_s",)
+_COMPARED = ("seconds", "p50_ms", "p99_ms", "per_s", "first_ms", "bytes")
+
+
+def _metrics(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_metrics(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and key.endswith(_COMPARED):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict) -> list[dict]:
+    """Per-metric change from `baseline` to `current`; positive `change` means better."""
+    old, new = _metrics(baseline["results"]), _metrics(current["results"])
+    rows = []
+    for name in old.keys() & new.keys():
+        if not old[name] or new[name] is None:
+            continue
+        ratio = new[name] / old[name]
+        better = ratio - 1 if name.endswith(_HIGHER_IS_BETTER) else 1 - ratio
+        rows.append({"metric": name, "baseline": old[name], "current": new[name], "change": round(better, 4)})
+    return sorted(rows, key=lambda r: r["metric"])
+
+
+def format_comparison(rows: list[dict], threshold: float = 0.05) -> str:
+    lines = [f"{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}"]
+    for row in rows:
+        mark = "  ✅" if row["change"] > threshold else "  ⚠️" if row["change"] < -threshold else ""
+        lines.append(
+            f"{row['metric']:<40} {row['baseline']:>12} {row['current']:>12} {row['change']:>+8.1%}{mark}"
+        )
+    return "\n".join(lines)
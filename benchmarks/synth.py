@@ -0,0 +1,123 @@
+"""Write a synthetic books/ tree. Usage: python -m benchmarks.synth OUT_DIR [--books N ...]"""
+import argparse
+import json
+import random
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from itertools import accumulate
+from pathlib import Path
+
+COLORS = ["#E76F51", "#2A9D8F", "#E9C46A", "#264653", "#F4A261", "#8AB17D"]
+SYLLABLES = ["ka", "lo", "mi", "ren", "tu", "sa", "vel", "or", "ni", "pe", "dra", "sun", "ta", "ex", "qui"]
+
+
+@dataclass
+class LibrarySpec:
+    books: int = 20
+    chapters: int = 10
+    # Words of raw notes per chapter
+    note_words: int = 300
+    # Concepts per enriched chapter, drawn from a pool of `concept_pool` names
+    concepts: int = 6
+    concept_pool: int = 500
+    # Zipf exponent of concept popularity: 0 = uniform (little overlap between
+    # chapters), higher = a few concepts shared by many chapters
+    concept_skew: float = 1.0
+    # Share of chapters that have an _enriched.json
+    enriched: float = 1.0
+    seed: int = 1
+
+    @property
+    def total_chapters(self) -> int:
+        return self.books * self.chapters
+
+
+def _vocabulary(rng: random.Random, size: int) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(1, 4))))
+    return sorted(words)
+
+
+def _zipf_weights(n: int, skew: float) -> list[float]:
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(n)))
+
+
+def _sample(rng: random.Random, population: list[str], cum_weights: list[float], k: int) -> list[str]:
+    """k distinct items, drawn by weight."""
+    k = min(k, len(population))
+    picked: dict[str, None] = {}
+    while len(picked) < k:
+        picked.update(dict.fromkeys(rng.choices(population, cum_weights=cum_weights, k=k - len(picked))))
+    return list(picked)
+
+
+def generate_library(root: Path, spec: LibrarySpec = LibrarySpec()) -> dict:
+    """Create root/<book>/meta.yaml and chapter notes (+ _enriched.json). Returns a summary."""
+    rng = random.Random(spec.seed)
+    vocab = _vocabulary(rng, 5000)
+    word_weights = _zipf_weights(len(vocab), 1.0)
+    concepts = [f"{a} {b}" for a, b in zip(_vocabulary(rng, spec.concept_pool), rng.sample(vocab, spec.concept_pool))]
+    concept_weights = _zipf_weights(len(concepts), spec.concept_skew)
+    start = date(2024, 1, 1)
+
+    def words(k: int) -> str:
+        return " ".join(rng.choices(vocab, cum_weights=word_weights, k=k))
+
+    files = 0
+    root.mkdir(parents=True, exist_ok=True)
+    for b in range(spec.books):
+        book_dir = root / f"book-{b:05d}"
+        book_dir.mkdir(exist_ok=True)
+        (book_dir / "meta.yaml").write_text(
+            f'title: "{words(3).title()}"\n'
+            f'author: "{words(2).title()}"\n'
+            f'color: "{COLORS[b % len(COLORS)]}"\n'
+            f"rating: {rng.randint(1, 5)}\n"
+            f"status: finished\n"
+            f"totalChapters: {spec.chapters}\n"
+        )
+        files += 1
+        for c in range(1, spec.chapters + 1):
+            themes = _sample(rng, concepts, concept_weights, 3)
+            note = book_dir / f"ch{c}-{'-'.join(words(2).split())}.md"
+            paragraphs = [words(min(60, spec.note_words - i)) for i in range(0, spec.note_words, 60)]
+            note.write_text(
+                "---\n"
+                f"chapter: {c}\n"
+                f'title: "{words(4).title()}"\n'
+                f'dateNoted: "{start + timedelta(days=rng.randrange(700))}"\n'
+                f"keyThemes: [{', '.join(themes)}]\n"
+                "---\n\n" + "\n\n".join(paragraphs) + "\n"
+            )
+            files += 1
+            if rng.random() < spec.enriched:
+                enriched = {
+                    "summary": words(45),
+                    "keyInsights": [words(15) for _ in range(4)],
+                    "quotableIdeas": [words(12) for _ in range(2)],
+                    "concepts": _sample(rng, concepts, concept_weights, spec.concepts),
+                    "actionableItems": [words(10) for _ in range(3)],
+                    "connectedIdeas": [words(3) for _ in range(3)],
+                    "emotionalResonance": words(15),
+                    "model": "synthetic",
+                }
+                (note.parent / f"{note.stem}_enriched.json").write_text(json.dumps(enriched, indent=2))
+                files += 1
+    return {**asdict(spec), "files": files}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Write a synthetic books/ tree for benchmarks")
+    parser.add_argument("out", type=Path, help="Directory to create the books in")
+    defaults = LibrarySpec()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    ns = parser.parse_args()
+    spec = LibrarySpec(**{name: getattr(ns, name) for name in asdict(defaults)})
+    print(json.dumps(generate_library(ns.out, spec), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,6 +5,7 @@ Usage:
   python scripts/enrich.py                    # enrich un-enriched chapters only
   python scripts/enrich.py --force             # re-enrich everything
   python scripts/enrich.py --chapter BOOK-ch1  # enrich only one chapter
+  python scripts/enrich.py --concurrency 8     # up to 8 API calls in flight
 """
 import asyncio
 import argparse
@@ -22,6 +23,7 @@ async def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--force", action="store_true", help="Re-enrich all chapters")
     parser.add_argument("--chapter", metavar="ID", help="Enrich only this chapter (e.g. atomic-habits-ch1)")
+    parser.add_argument("-j", "--concurrency", type=int, default=4, help="Parallel API calls (default: 4)")
     args = parser.parse_args()
     chapter = args.chapter
     force = args.force
@@ -29,12 +31,12 @@ async def main():
         print(f"🤖 Starting enrichment for chapter: {chapter}...")
     else:
         print(f"🤖 Starting enrichment (force={force})...")
-    results = await enrich_new_chapters(force=force, chapter_id=chapter)
+    results = await enrich_new_chapters(force=force, chapter_id=chapter, concurrency=args.concurrency)
     print(
-        f"\n✅ Done! Enriched: {results['enriched']} | Skipped: {results['skipped']} | "
+        f"\n✅ Done! Enriched: {results['enriched']} | From cache: {results['cached']} | Skipped: {results['skipped']} | "
         f"Failed: {results['failed']}"
     )
-    print(f"   Estimated cost: ${results['cost_estimate']:.4f}")
+    print(f"   Tokens: {results['prompt_tokens']:,} in / {results['completion_tokens']:,} out | Cost: ${results['cost']:.4f}")
 
 
 if __name__ == "__main__":
@@ -4,24 +4,240 @@
  */
 
 const API_GRAPH = "/api/graph";
+const API_GRAPH_EVENTS = "/api/graph/events";
+const API_CHAPTERS = "/api/chapters";
+const API_NEIGHBORS = "/api/neighbors";
+const FALLBACK_SKELETON = "public/graph-skeleton.json";
 const FALLBACK_GRAPH = "public/graph-data.json";
+const FALLBACK_CHAPTERS = "public/chapters";
+// Set by `readbrain export`: the static data manifest, read instead of the API
+const STATIC_MANIFEST = document.querySelector('meta[name="readbrain-manifest"]')?.content || null;
 
 let graphData = null;
+let staticManifest = null;
+let graphEtag = null;
 let onChapterSelect = null;
 
+function staticUrl(path) {
+  return new URL(path, new URL(STATIC_MANIFEST, location.href)).href;
+}
+
+/**
+ * Skeleton graph from an exported site: the manifest is revalidated on every load,
+ * the content-hashed book and concept shards come from the HTTP cache unless they changed.
+ */
+async function fetchStaticGraph() {
+  const res = await fetch(STATIC_MANIFEST, { cache: "no-cache" });
+  if (!res.ok) throw new Error("Failed to load graph data");
+  staticManifest = await res.json();
+  const load = async (path) => {
+    const shard = await fetch(staticUrl(path));
+    if (!shard.ok) throw new Error(`Failed to load ${path}`);
+    return shard.json();
+  };
+  const [conceptGraph, ...books] = await Promise.all([
+    load(staticManifest.conceptGraph),
+    ...staticManifest.books.map((b) => load(b.shard)),
+  ]);
+  return { generated: staticManifest.generated, stats: staticManifest.stats, books, conceptGraph };
+}
+
+/**
+ * Searchable text of every chapter of an exported site (for the in-browser search).
+ */
+async function loadSearchDocuments() {
+  const shards = await Promise.all(
+    staticManifest.books.map((b) =>
+      fetch(staticUrl(b.search))
+        .then((res) => (res.ok ? res.json() : []))
+        .catch(() => [])
+    )
+  );
+  return shards.flat();
+}
+
+/**
+ * Read a streamed graph (NDJSON records, see build_graph.graph_records), calling
+ * onBook(graphSoFar) as each book arrives.
+ */
+async function readGraphStream(res, onBook) {
+  const graph = { books: [], conceptGraph: { nodes: [], edges: [] } };
+  const take = (line) => {
+    if (!line) return;
+    const record = JSON.parse(line);
+    if (record.meta) {
+      Object.assign(graph, record.meta);
+    } else if (record.book) {
+      graph.books.push(record.book);
+      onBook?.(graph);
+    } else if (record.nodes) {
+      graph.conceptGraph.nodes.push(...record.nodes);
+    } else if (record.edges) {
+      graph.conceptGraph.edges.push(...record.edges);
+    }
+  };
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffered += decoder.decode(value, { stream: !done });
+    const lines = buffered.split("\n");
+    buffered = lines.pop();
+    lines.forEach(take);
+    if (done) break;
+  }
+  take(buffered);
+  return graph;
+}
+
 /**
- * Fetch graph data. Tries API first, falls back to static JSON.
+ * Fetch the skeleton graph (no chapter details). Reads an exported site's manifest
+ * if there is one; otherwise tries the API first (streamed, calling onBook as books
+ * arrive), falls back to the static split export, then to the full static JSON.
  */
-async function fetchGraph() {
+async function fetchGraph(onBook = null) {
+  if (STATIC_MANIFEST) return fetchStaticGraph();
   try {
-    const res = await fetch(API_GRAPH);
-    if (res.ok) return await res.json();
+    const res = await fetch(`${API_GRAPH}?view=skeleton`, {
+      headers: { Accept: "application/x-ndjson, application/json;q=0.9" },
+    });
+    if (res.ok) {
+      // Compressed responses carry the same tag as a weak ETag
+      graphEtag = res.headers.get("ETag")?.replace(/^W\//, "") || null;
+      const streamed = res.body && res.headers.get("Content-Type")?.startsWith("application/x-ndjson");
+      return await (streamed ? readGraphStream(res, onBook) : res.json());
+    }
   } catch (_) {
     /* API unavailable, try static */
   }
-  const res = await fetch(FALLBACK_GRAPH);
-  if (!res.ok) throw new Error("Failed to load graph data");
-  return res.json();
+  for (const url of [FALLBACK_SKELETON, FALLBACK_GRAPH]) {
+    const res = await fetch(url).catch(() => null);
+    if (res?.ok) return res.json();
+  }
+  throw new Error("Failed to load graph data");
+}
+
+/**
+ * Subgraph around a chapter or concept from the API; null on an exported site or if
+ * the API is unavailable.
+ */
+async function fetchNeighborhood(id, depth = 2, limit = 150) {
+  if (STATIC_MANIFEST) return null;
+  const res = await fetch(`${API_NEIGHBORS}/${encodeURIComponent(id)}?depth=${depth}&limit=${limit}`).catch(() => null);
+  return res?.ok ? res.json() : null;
+}
+
+function findChapterRecord(chapterId) {
+  for (const book of graphData?.books || []) {
+    const ch = (book.chapters || []).find((c) => c.id === chapterId);
+    if (ch) return ch;
+  }
+  return null;
+}
+
+/**
+ * Merge full chapter records (notes, AI fields) into the skeleton graph for the
+ * given ids. Chapters that already have details are skipped.
+ */
+async function loadChapterDetails(chapterIds) {
+  const missing = chapterIds.filter((id) => {
+    const ch = findChapterRecord(id);
+    return ch && !("rawNotes" in ch);
+  });
+  if (!missing.length) return;
+
+  let records = null;
+  if (!STATIC_MANIFEST) {
+    try {
+      const res = await fetch(`${API_CHAPTERS}?ids=${missing.map(encodeURIComponent).join(",")}`);
+      if (res.ok) records = (await res.json()).chapters;
+    } catch (_) {
+      /* API unavailable, try static */
+    }
+  }
+  if (!records) {
+    // Exported detail files keep their names, so they are revalidated rather than cached
+    const url = (id) =>
+      STATIC_MANIFEST
+        ? [staticUrl(`${staticManifest.chapters}${encodeURIComponent(id)}.json`), { cache: "no-cache" }]
+        : [`${FALLBACK_CHAPTERS}/${encodeURIComponent(id)}.json`];
+    const fetched = await Promise.all(
+      missing.map((id) =>
+        fetch(...url(id))
+          .then((res) => (res.ok ? res.json() : null))
+          .catch(() => null)
+      )
+    );
+    records = fetched.filter(Boolean);
+  }
+  records.forEach((record) => {
+    const ch = findChapterRecord(record.id);
+    if (ch) Object.assign(ch, record);
+  });
+}
+
+/**
+ * Apply a server-sent graph delta (see GraphStore.graph_delta) to graphData in place.
+ */
+function applyGraphDelta(data, delta) {
+  const chapters = new Map();
+  data.books.forEach((b) => (b.chapters || []).forEach((c) => chapters.set(c.id, c)));
+  (delta.chapters?.removed || []).forEach((id) => chapters.delete(id));
+  (delta.chapters?.upserted || []).forEach((c) => chapters.set(c.id, c));
+
+  const books = new Map(data.books.map((b) => [b.id, b]));
+  (delta.books?.upserted || []).forEach((b) => books.set(b.id, b));
+
+  data.books = (delta.bookIds || []).map((id) => {
+    const book = books.get(id);
+    const { chapterIds, ...meta } = book;
+    const ids = chapterIds || (book.chapters || []).map((c) => c.id);
+    return { ...meta, chapters: ids.map((cid) => chapters.get(cid)).filter(Boolean) };
+  });
+  data.stats = delta.stats;
+  data.generated = delta.generated;
+  if (delta.version !== undefined) data.version = delta.version;
+  if (delta.conceptGraph) data.conceptGraph = delta.conceptGraph;
+}
+
+/**
+ * Subscribe to live graph deltas. Calls onUpdate(changedChapterIds) after each patch;
+ * refetches the whole graph when a delta was missed.
+ */
+function subscribeGraphEvents(onUpdate) {
+  if (!graphEtag || typeof EventSource === "undefined") return;
+  const source = new EventSource(API_GRAPH_EVENTS);
+  let version = null;
+
+  const resync = async () => {
+    graphData = await fetchGraph();
+    onUpdate(null);
+  };
+
+  source.addEventListener("hello", (e) => {
+    const hello = JSON.parse(e.data);
+    // A streamed graph's ETag is not the skeleton's; graphs carry their version
+    const stale =
+      graphData?.version !== undefined ? hello.version !== graphData.version : hello.skeletonEtag !== graphEtag;
+    version = hello.version;
+    if (stale) resync();
+  });
+  source.addEventListener("delta", (e) => {
+    const delta = JSON.parse(e.data);
+    if (version !== null && delta.baseVersion !== version) {
+      version = delta.version;
+      resync();
+      return;
+    }
+    version = delta.version;
+    applyGraphDelta(graphData, delta);
+    onUpdate(new Set((delta.chapters?.upserted || []).map((c) => c.id)));
+  });
+  source.addEventListener("resync", () => {
+    version = null;
+    resync();
+  });
 }
 
 /**
@@ -133,7 +349,16 @@ async function init() {
   const notesPanel = document.getElementById("notesPanel");
   const panelClose = document.getElementById("panelClose");
 
-  graphData = await fetchGraph();
+  // Books are listed as they stream in (at most once per frame)
+  let sidebarFrame = null;
+  graphData = await fetchGraph((partial) => {
+    sidebarFrame ??= requestAnimationFrame(() => {
+      sidebarFrame = null;
+      renderHeaderStats(partial.stats);
+      renderSidebar(partial.books);
+    });
+  });
+  if (sidebarFrame !== null) cancelAnimationFrame(sidebarFrame);
   renderHeaderStats(graphData.stats);
   renderSidebar(graphData.books);
 
@@ -154,6 +379,7 @@ async function init() {
   }
 
   let conceptFilter = null;
+  let conceptNeighborhood = null;
   let currentChapterId = null;
 
   const onBookFocus = (bookId) => {
@@ -162,18 +388,34 @@ async function init() {
     }
   };
 
-  const onConceptFilter = (concept) => {
+  const onConceptFilter = async (concept) => {
     conceptFilter = conceptFilter === concept ? null : concept;
+    conceptNeighborhood = null;
     renderMindmap();
+    if (!conceptFilter) return;
+    const wanted = conceptFilter;
+    const neighborhood = await fetchNeighborhood(wanted);
+    if (neighborhood && wanted === conceptFilter) {
+      conceptNeighborhood = neighborhood;
+      if (conceptsVisible) renderMindmap();
+    }
+  };
+
+  const showChapter = async (chapterId) => {
+    await loadChapterDetails([chapterId]);
+    if (chapterId !== currentChapterId) return;
+    if (typeof window.renderNotesPanel === "function") {
+      window.renderNotesPanel(chapterId, graphData, { onBookFocus, onConceptFilter });
+    }
+    const { prev, next } = getPrevNextChapter();
+    loadChapterDetails([prev, next].filter(Boolean));
   };
 
   onChapterSelect = (chapterId) => {
     currentChapterId = chapterId;
     notesPanel?.classList.add("open");
     window.onChapterSelect = onChapterSelect;
-    if (typeof window.renderNotesPanel === "function") {
-      window.renderNotesPanel(chapterId, graphData, { onBookFocus, onConceptFilter });
-    }
+    showChapter(chapterId);
   };
   window.onChapterSelect = onChapterSelect;
 
@@ -215,6 +457,7 @@ async function init() {
     if (typeof window.initMindmap === "function") {
       window.initMindmap(graphData, onChapterSelect, conceptsVisible, {
         conceptFilter,
+        neighborhood: conceptNeighborhood,
         onConceptFilter: (concept) => onConceptFilter(concept),
       });
     }
@@ -230,8 +473,22 @@ async function init() {
 
   // Initialize search
   if (typeof window.initSearch === "function") {
-    window.initSearch(graphData, onChapterSelect);
+    window.initSearch(graphData, onChapterSelect, {
+      loadDocuments: STATIC_MANIFEST ? loadSearchDocuments : null,
+    });
   }
+
+  // Live updates: patch sidebar, mindmap, search and the open chapter in place
+  subscribeGraphEvents((changedChapterIds) => {
+    renderHeaderStats(graphData.stats);
+    renderSidebar(graphData.books);
+    if (typeof window.patchMindmap === "function") window.patchMindmap(graphData);
+    if (typeof window.updateSearch === "function") window.updateSearch(graphData);
+    const panelOpen = notesPanel?.classList.contains("open");
+    if (panelOpen && currentChapterId && (!changedChapterIds || changedChapterIds.has(currentChapterId))) {
+      showChapter(currentChapterId);
+    }
+  });
 }
 
 // Load mindmap, search, reader, shortcuts as modules
@@ -239,9 +496,11 @@ Promise.all([
   import("./mindmap.js").then((m) => {
     window.initMindmap = m.initMindmap;
     window.focusBookInMindmap = m.focusBookInMindmap;
+    window.patchMindmap = m.patchMindmap;
   }),
   import("./search.js").then((m) => {
     window.initSearch = m.initSearch;
+    window.updateSearch = m.updateSearch;
   }),
   import("./reader.js").then((m) => {
     window.renderNotesPanel = m.renderChapter;
@@ -31,7 +31,9 @@ function chapterHasConcept(chapter, filter) {
 export function initMindmap(graphData, onChapterSelect, conceptsVisible = false, options = {}) {
   lastMindmapOptions = options;
   lastOnChapterSelect = onChapterSelect;
-  const { conceptFilter, onConceptFilter, focusBookId } = options;
+  const { conceptFilter, onConceptFilter, focusBookId, preservePositions, neighborhood } = options;
+  const previousNodes = new Map((lastSimulation?.nodes() || []).map((n) => [n.id, n]));
+  lastSimulation?.stop();
   lastGraphData = graphData;
   showConcepts = conceptsVisible;
   const svg = document.getElementById("mindmapSvg");
@@ -81,7 +83,34 @@ export function initMindmap(graphData, onChapterSelect, conceptsVisible = false,
     }
   });
 
-  if (showConcepts && graphData.conceptGraph) {
+  if (showConcepts && neighborhood) {
+    // Only the filtered concept's neighbourhood (from /api/neighbors), not the whole concept graph
+    const conceptId = (id) => `concept-${id}`;
+    const nodeIds = new Set(nodes.map((n) => n.id));
+    neighborhood.nodes
+      .filter((c) => c.type === "concept")
+      .forEach((c) => {
+        nodes.push({
+          id: conceptId(c.id),
+          type: "concept",
+          label: c.label || c.id,
+          conceptId: c.id,
+          weight: c.weight,
+          color: "#E6A817",
+          radius: 8,
+          highlighted: true,
+          tooltip: `${c.label || c.id} (${c.weight} chapters)`,
+        });
+        nodeIds.add(conceptId(c.id));
+      });
+    const concepts = new Set(neighborhood.nodes.filter((c) => c.type === "concept").map((c) => c.id));
+    neighborhood.links.forEach((l) => {
+      const source = concepts.has(l.source) ? conceptId(l.source) : l.source;
+      if (nodeIds.has(source) && nodeIds.has(l.target)) {
+        links.push({ source, target: l.target, isConceptLink: true, weight: l.weight || 1 });
+      }
+    });
+  } else if (showConcepts && graphData.conceptGraph) {
     (graphData.conceptGraph.nodes || []).forEach((c) => {
       const weight = c.weight ?? (c.chapters || []).length;
       const isFilterMatch = conceptFilter && conceptMatches(conceptFilter, c.id);
@@ -101,7 +130,14 @@ export function initMindmap(graphData, onChapterSelect, conceptsVisible = false,
       });
     });
     (graphData.conceptGraph.edges || []).forEach((e) => {
-      links.push({ source: e.source, target: e.target, isConceptLink: true });
+      links.push({ source: e.source, target: e.target, isConceptLink: true, weight: e.weight || 1 });
+    });
+  }
+
+  if (preservePositions) {
+    nodes.forEach((n) => {
+      const prev = previousNodes.get(n.id);
+      if (prev) Object.assign(n, { x: prev.x, y: prev.y, vx: prev.vx, vy: prev.vy, preserved: true });
     });
   }
 
@@ -111,6 +147,7 @@ export function initMindmap(graphData, onChapterSelect, conceptsVisible = false,
     .force("charge", d3.forceManyBody().strength(-200))
     .force("center", d3.forceCenter(width / 2, height / 2))
     .force("collide", d3.forceCollide().radius((d) => (d.radius || 16) + 8));
+  if (preservePositions) lastSimulation.alpha(0.3);
 
   const g = d3.select(svg).append("g");
 
@@ -130,7 +167,7 @@ export function initMindmap(graphData, onChapterSelect, conceptsVisible = false,
     .data(links)
     .join("line")
     .attr("stroke", (d) => (isConceptLink(d) ? "rgba(230, 168, 23, 0.4)" : "rgba(255,255,255,0.06)"))
-    .attr("stroke-width", (d) => (isConceptLink(d) ? 1.5 : 1))
+    .attr("stroke-width", (d) => (isConceptLink(d) ? Math.min(1 + (d.weight || 1) * 0.5, 4) : 1))
     .style("opacity", (d) => (linkHighlighted(d) ? 1 : 0.15));
 
   const node = g
@@ -139,7 +176,7 @@ export function initMindmap(graphData, onChapterSelect, conceptsVisible = false,
     .data(nodes)
     .join("g")
     .attr("cursor", "pointer")
-    .style("opacity", 0)
+    .style("opacity", (d) => (d.preserved ? 1 : 0))
     .call(
       d3
         .drag()
@@ -240,6 +277,15 @@ function desaturate(hex) {
   return `rgb(${Math.round(nr * 255)},${Math.round(ng * 255)},${Math.round(nb * 255)})`;
 }
 
+/**
+ * Re-render with patched graph data, keeping existing nodes where they are.
+ */
+export function patchMindmap(graphData) {
+  if (!graphData || !lastOnChapterSelect) return;
+  const { focusBookId, ...opts } = lastMindmapOptions;
+  initMindmap(graphData, lastOnChapterSelect, showConcepts, { ...opts, preservePositions: true });
+}
+
 /**
  * Focus the mindmap on a book. Expands it, re-renders, and pans/zooms to center it.
  */
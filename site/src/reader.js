@@ -73,6 +73,24 @@ export function renderChapter(chapterId, graphData, callbacks = {}) {
     `;
   }
 
+  const related = (chapter.relatedChapters || [])
+    .map((r) => ({ ...r, chapter: findChapter(r.id, graphData) }))
+    .filter((r) => r.chapter);
+  if (related.length) {
+    html += `
+      <h3>Related chapters</h3>
+      <ul class="related-list">
+        ${related.map((r) => {
+          const relatedBook = graphData.books.find((b) => b.id === r.chapter.bookId);
+          return `<li><button type="button" class="related-chapter" data-chapter-id="${escapeHtml(r.id)}" title="Similarity ${r.score}">
+            <span class="related-title">${escapeHtml(r.chapter.title)}</span>
+            <span class="related-book">${escapeHtml(relatedBook?.title || r.chapter.bookId)}</span>
+          </button></li>`;
+        }).join("")}
+      </ul>
+    `;
+  }
+
   const tags = [...(chapter.keyThemes || []), ...(chapter.concepts || [])].filter(Boolean);
   const conceptIds = new Set((chapter.concepts || []).map((c) => normalizeConceptForId(c)));
   if (tags.length) {
@@ -93,8 +111,8 @@ export function renderChapter(chapterId, graphData, callbacks = {}) {
 
   el.innerHTML = html;
 
-  // Wire up chapter nav buttons
-  el.querySelectorAll(".chapter-nav-btn[data-chapter-id]").forEach((btn) => {
+  // Wire up chapter nav and related chapter buttons
+  el.querySelectorAll(".chapter-nav-btn[data-chapter-id], .related-chapter[data-chapter-id]").forEach((btn) => {
     btn.addEventListener("click", () => {
       const id = btn.dataset.chapterId;
       if (id && typeof window.onChapterSelect === "function") window.onChapterSelect(id);
@@ -1,11 +1,18 @@
 /**
- * Fuse.js fuzzy search over chapters.
+ * Chapter search. Queries the server-side index (/api/search); falls back to a
+ * Fuse.js fuzzy search in the browser when the API is unavailable (static site).
+ * An exported site searches its search shards in the browser from the start.
  */
-export function initSearch(graphData, onChapterSelect) {
-  const input = document.getElementById("searchInput");
-  const dropdown = document.getElementById("searchResults");
-  if (!input || !dropdown || !graphData) return;
+const API_SEARCH = "/api/search";
+const SEARCH_LIMIT = 10;
+const SEARCH_DEBOUNCE_MS = 120;
 
+let fuse = null;
+let currentGraph = null;
+let useApi = true;
+let loadDocuments = null;
+
+function searchableChapters(graphData) {
   const chapters = [];
   (graphData.books || []).forEach((book) => {
     (book.chapters || []).forEach((ch) => {
@@ -16,29 +23,75 @@ export function initSearch(graphData, onChapterSelect) {
       });
     });
   });
+  return chapters;
+}
 
-  const fuse = new Fuse(chapters, {
-    keys: ["title", "rawNotes", "summary", "keyThemes", "concepts"],
-    threshold: 0.4,
-  });
+/**
+ * Re-index after the graph was patched by a live update (only matters for the fallback).
+ */
+export function updateSearch(graphData) {
+  currentGraph = graphData;
+  if (fuse && graphData) fuse.setCollection(searchableChapters(graphData));
+}
 
-  input.addEventListener("input", () => {
-    const q = input.value.trim();
-    if (!q) {
-      dropdown.classList.add("hidden");
-      dropdown.innerHTML = "";
-      return;
+function bookTitle(bookId) {
+  return (currentGraph?.books || []).find((b) => b.id === bookId)?.title || bookId;
+}
+
+async function searchApi(q) {
+  const res = await fetch(`${API_SEARCH}?q=${encodeURIComponent(q)}&limit=${SEARCH_LIMIT}`);
+  if (!res.ok) throw new Error(`Search failed: ${res.status}`);
+  const { results } = await res.json();
+  return results.map((r) => ({ ...r, bookTitle: bookTitle(r.bookId) }));
+}
+
+async function searchLocal(q) {
+  if (!fuse) {
+    const chapters = loadDocuments
+      ? (await loadDocuments()).map((ch) => ({ ...ch, bookTitle: bookTitle(ch.bookId) }))
+      : searchableChapters(currentGraph);
+    if (fuse) return searchLocal(q);
+    fuse = new Fuse(chapters, {
+      keys: ["title", "rawNotes", "summary", "keyThemes", "concepts"],
+      threshold: 0.4,
+    });
+  }
+  return fuse.search(q).slice(0, SEARCH_LIMIT).map((r) => r.item);
+}
+
+async function runSearch(q) {
+  if (useApi) {
+    try {
+      return await searchApi(q);
+    } catch (_) {
+      useApi = false;
     }
-    const results = fuse.search(q).slice(0, 10);
+  }
+  return searchLocal(q);
+}
+
+export function initSearch(graphData, onChapterSelect, options = {}) {
+  const input = document.getElementById("searchInput");
+  const dropdown = document.getElementById("searchResults");
+  if (!input || !dropdown || !graphData) return;
+  currentGraph = graphData;
+  loadDocuments = options.loadDocuments || null;
+  if (loadDocuments) useApi = false;
+
+  let timer = null;
+  let latest = 0;
+
+  const render = (results) => {
     if (!results.length) {
       dropdown.innerHTML = "<div class='search-result-item'>No matches</div>";
     } else {
       dropdown.innerHTML = results
         .map(
           (r) => `
-        <div class="search-result-item" data-chapter-id="${r.item.id}">
-          <div class="search-result-book">${escapeHtml(r.item.bookTitle)}</div>
-          <div class="search-result-title">${escapeHtml(r.item.title)}</div>
+        <div class="search-result-item" data-chapter-id="${r.id}">
+          <div class="search-result-book">${escapeHtml(r.bookTitle)}</div>
+          <div class="search-result-title">${escapeHtml(r.title)}</div>
+          ${r.snippet ? `<div class="search-result-snippet">${r.snippet}</div>` : ""}
         </div>
       `
         )
@@ -53,6 +106,23 @@ export function initSearch(graphData, onChapterSelect) {
       });
     }
     dropdown.classList.remove("hidden");
+  };
+
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    const q = input.value.trim();
+    if (!q) {
+      latest++;
+      dropdown.classList.add("hidden");
+      dropdown.innerHTML = "";
+      return;
+    }
+    timer = setTimeout(async () => {
+      const request = ++latest;
+      const results = await runSearch(q);
+      // Drop responses that arrive after a newer query was sent
+      if (request === latest) render(results);
+    }, SEARCH_DEBOUNCE_MS);
   });
 
   input.addEventListener("blur", () => {
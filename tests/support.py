@@ -0,0 +1,47 @@
+"""Shared test fixtures: a small synthetic library, with every file the app reads or writes under a scratch directory."""
+import contextlib
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.synth import LibrarySpec, generate_library
+
+SMALL_LIBRARY = LibrarySpec(books=3, chapters=3, note_words=40, concept_pool=20)
+
+
+def _paths(books: Path, work: Path) -> dict[str, Path]:
+    """Module constant -> its scratch value."""
+    output = work / "public" / "graph-data.json"
+    return {
+        "app.services.build_graph.BOOKS_DIR": books,
+        "app.services.build_graph.OUTPUT_FILE": output,
+        "app.services.build_graph.SKELETON_FILE": output.with_name("graph-skeleton.json"),
+        "app.services.build_graph.CHAPTERS_DIR": output.with_name("chapters"),
+        "app.services.graph_store.BOOKS_DIR": books,
+        "app.services.watcher.BOOKS_DIR": books,
+        "app.services.changeset.BOOKS_DIR": books,
+        "app.services.enrich.BOOKS_DIR": books,
+        "app.services.batch.BOOKS_DIR": books,
+        "app.services.batch.BATCH_DIR": work / "batches",
+        "app.services.batch.STATE_FILE": work / "batches" / "state.json",
+        "app.services.scaffold.BOOKS_DIR": books,
+        "app.services.build_cache.CACHE_FILE": work / "build-cache.json",
+        "app.services.search_index.INDEX_FILE": work / "search-index.json",
+        "app.services.related.RELATED_FILE": work / "related.json",
+        "app.services.library_index.INDEX_FILE": work / "library.sqlite",
+        "app.services.enrich_cache.CACHE_FILE": work / "enrich-cache.sqlite",
+        "app.services.lookup_cache.CACHE_FILE": work / "lookup-cache.sqlite",
+    }
+
+
+@contextlib.contextmanager
+def scratch_library(spec: LibrarySpec = SMALL_LIBRARY):
+    """Yield (books dir, work dir) with the build, stores, caches and enrichment pointed at them."""
+    with tempfile.TemporaryDirectory(prefix="readbrain-test-") as tmp:
+        work = Path(tmp)
+        books = work / "books"
+        generate_library(books, spec)
+        with contextlib.ExitStack() as stack:
+            for target, value in _paths(books, work).items():
+                stack.enter_context(mock.patch(target, value))
+            yield books, work
@@ -0,0 +1,70 @@
+"""Batch enrichment: submit and collect against the fake OpenAI Files/Batches API."""
+import json
+import unittest
+from unittest import mock
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.services import batch
+from benchmarks.fake_openai import create_app
+from benchmarks.synth import LibrarySpec
+from tests.support import scratch_library
+
+
+class BatchRoundTripTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        spec = LibrarySpec(books=2, chapters=3, note_words=40, enriched=0.0)
+        self.books, self.work = self.enterContext(scratch_library(spec))
+        self.fake = create_app(latency=0, jitter=0)
+        self.enterContext(mock.patch.object(batch, "_client", self._client))
+
+    def _client(self) -> AsyncOpenAI:
+        transport = httpx.ASGITransport(app=self.fake)
+        return AsyncOpenAI(api_key="test", base_url="http://fake/v1", http_client=httpx.AsyncClient(transport=transport))
+
+    def _enriched(self) -> list:
+        return sorted(self.books.glob("*/ch*_enriched.json"))
+
+    def _state(self) -> dict:
+        return json.loads(batch.STATE_FILE.read_text())
+
+    async def test_submit_then_collect(self):
+        submitted = await batch.submit_batch()
+        self.assertEqual(submitted["submitted"], 6)
+        self.assertEqual(self._enriched(), [])
+
+        collected = await batch.collect_batches()
+        self.assertEqual((collected["collected"], collected["failed"]), (6, 0))
+        self.assertEqual(len(self._enriched()), 6)
+        record = json.loads(self._enriched()[0].read_text())
+        self.assertIn("summary", record)
+        self.assertIn("inputHash", record)
+        self.assertTrue(self._state()["batches"][submitted["batch_id"]]["collectedAt"])
+
+        # Collected once: nothing left to collect or submit
+        again = await batch.collect_batches()
+        self.assertEqual((again["collected"], again["failed"]), (0, 0))
+        self.assertEqual((await batch.submit_batch())["submitted"], 0)
+
+    async def test_malformed_rows_do_not_block_collection(self):
+        submitted = await batch.submit_batch()
+        output = self.fake.state.files[self.fake.state.batches[submitted["batch_id"]]["output_file_id"]]
+        rows = [json.loads(line) for line in output["content"].decode().splitlines()]
+        rows[0]["response"]["body"]["choices"][0]["message"]["content"] = '{"summary": "cut sho'
+        del rows[1]["response"]["body"]["choices"]
+        output["content"] = ("\n".join(json.dumps(row) for row in rows) + "\n{not json\n").encode()
+
+        collected = await batch.collect_batches()
+        self.assertEqual((collected["collected"], collected["failed"]), (4, 3))
+        self.assertEqual(len(self._enriched()), 4)
+        self.assertTrue(self._state()["batches"][submitted["batch_id"]]["collectedAt"])
+
+        again = await batch.collect_batches()
+        self.assertEqual((again["collected"], again["failed"]), (0, 0))
+        # The two chapters whose responses were unusable go into the next batch
+        self.assertEqual((await batch.submit_batch())["submitted"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
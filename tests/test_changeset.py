@@ -0,0 +1,103 @@
+"""Change sets from git history and from path lists (enrich --since / --stdin)."""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from app import cli
+from app.services.changeset import changed_since, from_paths
+from tests.support import scratch_library
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "Test", "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "Test", "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+class ChangeSetTest(unittest.TestCase):
+    def setUp(self):
+        self.books, self.work = self.enterContext(scratch_library())
+        self._git("init", "-q")
+        self._git("add", "books")
+        self._git("commit", "-q", "-m", "Library")
+        self.base = self._git("rev-parse", "HEAD").strip()
+
+    def _git(self, *args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=self.work, env={**os.environ, **GIT_ENV}, capture_output=True, text=True, check=True
+        ).stdout
+
+    def _note(self, book: str, n: int):
+        return sorted((self.books / book).glob(f"ch{n}-*.md"))[0]
+
+    def _cli(self, *argv: str, stdin: str = "") -> tuple[int, str]:
+        out = io.StringIO()
+        with mock.patch.object(sys, "argv", ["readbrain", *argv]), mock.patch.object(sys, "stdin", io.StringIO(stdin)), \
+                contextlib.redirect_stdout(out), contextlib.chdir(self.work):
+            code = cli.main()
+        return code, out.getvalue()
+
+    def test_nothing_changed(self):
+        self.assertEqual(changed_since(self.base), from_paths([]))
+
+    def test_renamed_deleted_and_added_notes(self):
+        renamed = self._note("book-00000", 1)
+        renamed.rename(renamed.with_name("ch1-renamed.md"))
+        self._note("book-00001", 2).unlink()
+        added = self.books / "book-00002" / "ch4-added.md"
+        added.write_text("---\nchapter: 4\ntitle: Added\n---\n\nNew notes.\n")
+
+        for changes in (changed_since(self.base), self._commit_and_diff()):
+            self.assertEqual(changes.books, {"book-00000", "book-00001", "book-00002"})
+            # The deleted note and the renamed note's old name only mark their books
+            self.assertEqual(changes.chapters, {renamed.with_name("ch1-renamed.md"), added})
+
+    def _commit_and_diff(self):
+        self._git("add", "-A", "books")
+        self._git("commit", "-q", "-m", "Edits")
+        return changed_since(self.base, "HEAD")
+
+    def test_meta_change_covers_the_whole_book(self):
+        meta = self.books / "book-00001" / "meta.yaml"
+        meta.write_text(meta.read_text().replace("title:", "title: Revised", 1))
+        changes = changed_since(self.base)
+        self.assertEqual(changes.books, {"book-00001"})
+        self.assertEqual(changes.chapters, set((self.books / "book-00001").glob("ch*.md")))
+        self.assertEqual(len(changes.chapters), 3)
+
+    def test_enriched_file_only_rebuilds(self):
+        enriched = self._note("book-00000", 2).with_name(self._note("book-00000", 2).stem + "_enriched.json")
+        enriched.write_text(enriched.read_text().replace("synthetic", "edited"))
+        changes = changed_since(self.base)
+        self.assertEqual((changes.books, changes.chapters), ({"book-00000"}, set()))
+
+    def test_stdin_paths_are_normalized(self):
+        note = self._note("book-00000", 1)
+        stdin = "\n".join([
+            f"books/book-00000/{note.name}",               # relative to the current directory
+            "./books/book-00002/../book-00001/meta.yaml",  # normalized to book-00001
+            str(self._note("book-00002", 3)),              # absolute
+            "README.md",                                   # outside books/
+            "books/_templates/ch1-template.md",            # ignored folder
+            "",
+        ])
+        code, out = self._cli("enrich", "--stale", "--force", "--stdin", stdin=stdin)
+        self.assertEqual(code, 0)
+        listed = {line.split()[0] for line in out.splitlines() if line.startswith("  book-")}
+        expected = {f"book-00000/{note.name}", f"book-00002/{self._note('book-00002', 3).name}"}
+        expected |= {f"book-00001/{p.name}" for p in (self.books / "book-00001").glob("ch*.md")}
+        self.assertEqual(listed, expected)
+
+    def test_unknown_since_ref(self):
+        with self.assertRaisesRegex(ValueError, "git diff failed"):
+            changed_since("no-such-ref")
+        code, out = self._cli("enrich", "--since", "no-such-ref")
+        self.assertEqual(code, 1)
+        self.assertIn("Error: git diff failed", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
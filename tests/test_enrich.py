@@ -0,0 +1,54 @@
+"""Enrichment: which chapters a run (re-)enriches."""
+import json
+import os
+import unittest
+from unittest import mock
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.services import enrich
+from benchmarks.fake_openai import create_app
+from tests.support import scratch_library
+
+
+class UnhashedEnrichmentTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Synthetic _enriched.json files carry no inputHash, like files enriched before hashes were kept
+        self.books, self.work = self.enterContext(scratch_library())
+        self.fake = create_app(latency=0, jitter=0)
+        self.enterContext(mock.patch.object(enrich, "AsyncOpenAI", self._client))
+        self.enterContext(mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test"}))
+
+    def _client(self, api_key: str, **kwargs) -> AsyncOpenAI:
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=self.fake))
+        return AsyncOpenAI(api_key=api_key, base_url="http://fake/v1", http_client=http, **kwargs)
+
+    def _enriched(self) -> list:
+        return sorted(self.books.glob("*/ch*_enriched.json"))
+
+    async def test_unhashed_enrichment_is_not_re_enriched(self):
+        before = [json.loads(path.read_text()) for path in self._enriched()]
+        self.assertEqual(enrich.find_stale_chapters(), [])
+
+        results = await enrich.enrich_new_chapters()
+        self.assertEqual((results["enriched"], results["cached"], results["skipped"]), (0, 0, 9))
+        after = [json.loads(path.read_text()) for path in self._enriched()]
+        # The run only recorded each note's current hash
+        self.assertTrue(all(record.pop("inputHash") for record in after))
+        self.assertEqual(after, before)
+
+    async def test_edit_after_the_hash_is_recorded_re_enriches(self):
+        await enrich.enrich_new_chapters()
+        note = sorted(self.books.glob("*/ch*.md"))[0]
+        note.write_text(note.read_text() + "\nA new paragraph.\n")
+        stale = enrich.find_stale_chapters()
+        self.assertEqual([(item["chapter"], item["reason"]) for item in stale],
+                         [(f"{note.parent.name}/{note.name}", "changed")])
+
+        results = await enrich.enrich_new_chapters()
+        self.assertEqual((results["enriched"], results["skipped"]), (1, 8))
+
+
+if __name__ == "__main__":
+    unittest.main()
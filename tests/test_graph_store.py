@@ -0,0 +1,111 @@
+"""GraphStore: single-flight builds and snapshot versions."""
+import asyncio
+import json
+import unittest
+
+from app.services import build_graph
+from app.services.build_cache import BuildCache
+from app.services.graph_store import GraphStore
+from tests.support import scratch_library
+
+
+class GraphStoreTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.books, self.work = self.enterContext(scratch_library())
+        self.store = GraphStore()
+
+    def _edit_title(self, title: str) -> str:
+        """Retitle the first chapter of the first book; returns the book id."""
+        note = sorted(self.books.glob("*/ch*.md"))[0]
+        text = note.read_text()
+        start = text.index("title: ")
+        note.write_text(text[:start] + f'title: "{title}"' + text[text.index("\n", start):])
+        return note.parent.name
+
+    def _titles(self) -> list[str]:
+        return [c["title"] for c in self.store.snapshot.chapters.values()]
+
+    async def test_concurrent_requests_share_two_builds(self):
+        await self.store.rebuild()
+        before = self.store.snapshot
+        self.store.builds = 0
+        deltas = self.store.events.subscribe()
+        book_id = self._edit_title("Edited Under Load")
+
+        calls = [self.store.rebuild() if i % 2 else self.store.apply_changes({book_id}) for i in range(200)]
+        results = await asyncio.gather(*calls)
+
+        self.assertLessEqual(self.store.builds, 2)
+        final = self.store.snapshot
+        self.assertGreater(final.version, before.version)
+        self.assertTrue(all(snapshot is final for snapshot in results))
+        self.assertIn("Edited Under Load", self._titles())
+        # One delta for the edit; the trailing build found nothing new
+        self.assertEqual(deltas.qsize(), 1)
+
+    async def test_close_finishes_the_builds_and_the_pending_write(self):
+        await self.store.rebuild()
+        book_id = self._edit_title("Edited Before Shutdown")
+        # Started, not awaited: close() must see the builds through and persist their graph
+        calls = [asyncio.ensure_future(self.store.apply_changes({book_id})) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        await self.store.close()
+        self.assertTrue(all(call.done() for call in calls))
+        self.assertTrue(self.store._build_task.done() and self.store._persist_task.done())
+        self.assertIsNone(self.store._running)
+        titles = [c["title"] for b in json.loads(build_graph.OUTPUT_FILE.read_text())["books"] for c in b["chapters"]]
+        self.assertIn("Edited Before Shutdown", titles)
+
+    async def test_new_graph_outranks_a_reset_cache(self):
+        # A cache starting over at version 0 (deleted .readbrain/, another process) must
+        # not reuse the version of the graph being served
+        served = await self.store.rebuild()
+        self.assertEqual(served.version, 1)
+
+        store = GraphStore(cache=BuildCache.disabled())
+        store._snapshot = served
+        deltas = store.events.subscribe()
+        self._edit_title("After The Reset")
+        snapshot = await store.rebuild()
+        self.assertGreater(snapshot.version, served.version)
+        self.assertIn("After The Reset", [c["title"] for c in snapshot.chapters.values()])
+        event, delta = deltas.get_nowait()
+        self.assertEqual((event, delta["baseVersion"], delta["version"]), ("delta", 1, snapshot.version))
+
+    async def test_first_build_after_load_persisted_is_served(self):
+        # graph-data.json built elsewhere (a CI run, with a cache of its own) at version 1,
+        # and a local cache whose first graph would also be version 1
+        await GraphStore(cache=BuildCache.disabled()).rebuild()
+        self._edit_title("Edited Since CI")
+
+        self.assertEqual((await self.store.load_persisted()).version, 1)
+        self.assertNotIn("Edited Since CI", self._titles())
+        snapshot = await self.store.rebuild()
+        self.assertGreater(snapshot.version, 1)
+        self.assertIn("Edited Since CI", self._titles())
+
+    async def test_persisted_graph_from_another_cache_is_replaced(self):
+        # The local cache is current, but graph-data.json was replaced by another build's
+        await self.store.rebuild()
+        data = json.loads(build_graph.OUTPUT_FILE.read_text())
+        data["generated"] = "2020-01-01T00:00:00+00:00"
+        data["books"][0]["chapters"][0]["title"] = "Only In The Other Build"
+        build_graph.OUTPUT_FILE.write_text(json.dumps(data))
+
+        store = GraphStore()
+        await store.load_persisted()
+        snapshot = await store.rebuild()
+        self.assertEqual(snapshot.version, 2)
+        self.assertNotIn("Only In The Other Build", [c["title"] for c in snapshot.chapters.values()])
+        self.assertEqual(json.loads(build_graph.OUTPUT_FILE.read_text())["version"], 2)
+
+    async def test_persisted_graph_from_this_cache_keeps_its_version(self):
+        await self.store.rebuild()
+        store = GraphStore()
+        persisted = await store.load_persisted()
+        self.assertIs(await store.rebuild(), persisted)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Library index (READBRAIN_INDEX=1): kept in sync by every build, and export() equals the build."""
+import asyncio
+import unittest
+from unittest import mock
+
+from app.services import library_index
+from app.services.build_graph import build_graph
+from app.services.library_index import LibraryIndex
+from tests.support import scratch_library
+
+
+class LibraryIndexSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.books, self.work = self.enterContext(scratch_library())
+        self.enterContext(mock.patch.object(library_index, "ENABLED", True))
+        self.book = sorted(p for p in self.books.iterdir() if p.is_dir())[0]
+
+    def _build(self) -> dict:
+        data = asyncio.run(build_graph())
+        with LibraryIndex() as index:
+            self.assertEqual(index.export(), data)
+        return data
+
+    def _chapter(self, data: dict, chapter_id: str) -> dict | None:
+        return next((c for b in data["books"] for c in b["chapters"] if c["id"] == chapter_id), None)
+
+    def test_export_equals_the_build(self):
+        data = self._build()
+        self.assertEqual(data["stats"]["totalChapters"], 9)
+        self.assertEqual(self._build(), data)
+
+    def test_add_edit_and_delete_a_chapter(self):
+        self._build()
+        chapter_id = f"{self.book.name}-ch4"
+
+        note = self.book / "ch4-added.md"
+        note.write_text("---\nchapter: 4\ntitle: Added Chapter\n---\n\nNotes on habit loops.\n")
+        data = self._build()
+        self.assertEqual(self._chapter(data, chapter_id)["title"], "Added Chapter")
+        with LibraryIndex() as index:
+            self.assertEqual(index.chapter_path(chapter_id), f"{self.book.name}/{note.name}")
+
+        note.write_text(note.read_text().replace("Added Chapter", "Edited Chapter Title"))
+        data = self._build()
+        self.assertEqual(self._chapter(data, chapter_id)["title"], "Edited Chapter Title")
+
+        note.unlink()
+        data = self._build()
+        self.assertIsNone(self._chapter(data, chapter_id))
+        with LibraryIndex() as index:
+            self.assertIsNone(index.chapter_path(chapter_id))
+
+    def test_removed_book_leaves_the_index(self):
+        self._build()
+        for path in sorted(self.book.iterdir()):
+            path.unlink()
+        self.book.rmdir()
+        data = self._build()
+        self.assertNotIn(self.book.name, [b["id"] for b in data["books"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Related chapters: incremental updates (the server's per-edit deltas) and full passes."""
+import asyncio
+import unittest
+from unittest import mock
+
+from app.services import related
+from app.services.build_graph import build_graph
+from benchmarks.synth import LibrarySpec
+from tests.support import scratch_library
+
+
+def _edit(chapters: list[dict], n: int) -> list[dict]:
+    edited = {**chapters[n], "rawNotes": chapters[n]["rawNotes"] + f"\nRevisited habit loops, edit {n}.\n"}
+    return [edited if c["id"] == edited["id"] else c for c in chapters]
+
+
+class IncrementalUpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.enterContext(scratch_library(LibrarySpec(books=10, chapters=5, note_words=60)))
+        data = asyncio.run(build_graph())
+        self.chapters = [c for b in data["books"] for c in b["chapters"]]
+        self.index = related.RelatedIndex(path=None)
+        self.index.update(self.chapters)
+
+    def assertSameLists(self, index: related.RelatedIndex, expected: related.RelatedIndex):
+        self.assertEqual(index.lists.keys(), expected.lists.keys())
+        for cid, pairs in expected.lists.items():
+            self.assertEqual([o for o, _ in index.lists[cid]], [o for o, _ in pairs], cid)
+            for (_, score), (_, want) in zip(index.lists[cid], pairs):
+                self.assertAlmostEqual(score, want, places=9)
+
+    def test_small_library_recomputes_in_full_by_default(self):
+        self.assertEqual(self.index.update(_edit(self.chapters, 0)), 1)
+        self.assertEqual(self.index.drift, 0)
+
+    def test_incremental_update_refreshes_affected_lists_only(self):
+        before = {cid: list(pairs) for cid, pairs in self.index.lists.items()}
+        chapters = _edit(self.chapters, 0)
+        with mock.patch.object(self.index, "_recompute", wraps=self.index._recompute) as recompute:
+            self.assertEqual(self.index.update(chapters, incremental=True), 1)
+        rows, spread = recompute.call_args.args
+        self.assertEqual(spread, {chapters[0]["id"]})
+        self.assertLess(len(rows), len(self.chapters))
+        self.assertEqual(self.index.drift, 1)
+        # Other lists keep their entries; the edited chapter may only have been merged in
+        edited = chapters[0]["id"]
+        for cid in before.keys() - rows:
+            kept = [pair for pair in self.index.lists[cid] if pair[0] != edited]
+            self.assertEqual(kept, before[cid][:len(kept)], cid)
+
+    def test_full_update_settles_incremental_drift(self):
+        chapters = self.chapters
+        for n in (0, 7, 19):
+            chapters = _edit(chapters, n)
+            self.index.update(chapters, incremental=True)
+        self.assertEqual(self.index.drift, 3)
+
+        self.index.update(chapters)
+        self.assertEqual(self.index.drift, 0)
+        fresh = related.RelatedIndex(path=None)
+        fresh.update(chapters)
+        self.assertSameLists(self.index, fresh)
+        self.assertEqual(self.index.update(chapters), 0)
+
+    def test_incremental_updates_refit_past_the_ratio(self):
+        chapters = self.chapters
+        for n in range(int(related.REFIT_RATIO * len(chapters)) + 1):
+            chapters = _edit(chapters, n)
+            self.index.update(chapters, incremental=True)
+        self.assertEqual(self.index.drift, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
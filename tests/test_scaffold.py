@@ -0,0 +1,88 @@
+"""Bulk scaffold: an interrupted reading-list import resumes from its progress file."""
+import asyncio
+import json
+import os
+import unittest
+from unittest import mock
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.services import scaffold
+from benchmarks.fake_openai import create_app
+from tests.support import scratch_library
+
+ENTRIES = [(f"Test Reading List {i}", None) for i in range(5)]
+
+
+class BulkResumeTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.books, self.work = self.enterContext(scratch_library())
+        self.progress = self.work / "scaffold-progress.json"
+        self.fake = create_app(latency=0, jitter=0)
+        self.enterContext(mock.patch.object(scaffold, "_open_clients", self._open_clients))
+        self.enterContext(mock.patch.object(scaffold, "OPEN_LIBRARY_SEARCH", "http://fake/search.json"))
+        self.enterContext(mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test"}))
+
+    def _open_clients(self, api_key: str, connections: int = 10) -> tuple[httpx.AsyncClient, AsyncOpenAI]:
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=self.fake))
+        return http, AsyncOpenAI(api_key=api_key, base_url="http://fake/v1", http_client=http)
+
+    async def _stats(self) -> dict:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=self.fake)) as http:
+            return (await http.get("http://fake/stats")).json()
+
+    def _entries(self) -> dict:
+        return json.loads(self.progress.read_text())["entries"]
+
+    async def _interrupted_run(self, after: int) -> None:
+        """Run the import and cancel it (as Ctrl-C would) once `after` entries have finished."""
+        finished = []
+
+        def on_result(title, author, outcome):
+            finished.append(title)
+            if len(finished) == after:
+                task.cancel()
+
+        task = asyncio.create_task(
+            scaffold.scaffold_books(ENTRIES, concurrency=1, progress_file=self.progress, on_result=on_result)
+        )
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    async def test_resume_skips_completed_entries(self):
+        await self._interrupted_run(after=2)
+        done = self._entries()
+        self.assertEqual(len(done), 2)
+        self.assertEqual({o["status"] for o in done.values()}, {"created"})
+        calls_before = (await self._stats())["requests"]
+
+        results = await scaffold.scaffold_books(ENTRIES, concurrency=1, progress_file=self.progress)
+        self.assertEqual(results["resumed"], 2)
+        self.assertEqual(len(results["created"]), 3)
+        self.assertFalse({o["title"] for o in results["created"]} & {o["title"] for o in done.values()})
+        self.assertEqual(len(self._entries()), 5)
+        # Two model calls (chapters and outlines) per remaining book, none for resumed ones
+        self.assertEqual((await self._stats())["requests"] - calls_before, 3 * 2)
+
+        # The graph update skipped by the interruption covers the earlier books too
+        graph = json.loads((self.work / "public" / "graph-data.json").read_text())
+        graph_books = {book["id"] for book in graph["books"]}
+        self.assertLessEqual({o["bookId"] for o in self._entries().values()}, graph_books)
+
+        again = await scaffold.scaffold_books(ENTRIES, concurrency=1, progress_file=self.progress)
+        self.assertEqual((again["resumed"], again["created"], again["failed"]), (5, [], []))
+
+    async def test_failed_entries_are_retried(self):
+        title, author = ENTRIES[0]
+        key = scaffold._entry_key(title, author)
+        self.progress.write_text(json.dumps({"entries": {
+            key: {"title": title, "author": author, "status": "failed", "error": "ReadTimeout: "},
+        }}))
+        results = await scaffold.scaffold_books(ENTRIES[:1], progress_file=self.progress)
+        self.assertEqual((results["resumed"], len(results["created"])), (0, 1))
+        self.assertEqual(self._entries()[key]["status"], "created")
+
+
+if __name__ == "__main__":
+    unittest.main()